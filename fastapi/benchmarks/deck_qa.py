@@ -0,0 +1,124 @@
+"""
+발표 Q&A 프롬프트 구성 벤치마크 (50장 합성 발표자료)
+
+기존 방식(전체 문서 + 모든 슬라이드 대본을 system prompt에 넣음)과
+DeckIndex 방식(문서 개요 + 질문 관련 슬라이드 top-k만 넣음)의 프롬프트 토큰 수를 비교한다.
+기본은 오프라인 해시 임베딩으로 인덱스 생성/검색 시간만 재고,
+--live 를 주면 OpenAI 임베딩 + ChatOpenAI로 질문당 답변 시간까지 잰다 (OPENAI_API_KEY 필요).
+
+실행 (fastapi 디렉터리에서):
+    python benchmarks/deck_qa.py --slides 50
+    python benchmarks/deck_qa.py --slides 50 --live
+"""
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import hashlib
+import time
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from core.deck_index import DeckIndex
+from core.chatbot_qa import DECK_OVERVIEW_TOKENS
+from core.token_budget import count_tokens, truncate_to_tokens
+
+TOPICS = ["데이터 수집", "전처리", "임베딩", "벡터 검색", "프롬프트 설계", "모델 평가", "배포", "모니터링", "비용 최적화", "보안"]
+
+
+class HashEmbeddings(Embeddings):
+    """단어 해시 기반 bag-of-words 임베딩 (네트워크 없이 검색 동작 확인용)"""
+    def __init__(self, dim: int = 256):
+        self.dim = dim
+
+    def _embed(self, text: str):
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for word in text.split():
+            vector[int(hashlib.md5(word.encode("utf-8")).hexdigest(), 16) % self.dim] += 1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts):
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._embed(text)
+
+
+def make_deck(slides: int):
+    """합성 발표자료 → (스토리 문서, script_data)"""
+    script_data, story = [], []
+    for page in range(slides):
+        topic = TOPICS[page % len(TOPICS)]
+        text = f"{topic} 단계 {page + 1}: 핵심 지표와 체크리스트"
+        script = (f"이번 슬라이드에서는 {topic} 과정의 {page + 1}번째 내용을 설명합니다. "
+                  f"{topic} 작업에서 자주 발생하는 문제와 해결 방법, 그리고 팀에서 사용한 도구를 소개합니다. " * 3)
+        script_data.append({"page": page, "script": script, "text": text})
+        story.append(f"{page + 1}. {topic}: {script}")
+    return "\n".join(story), script_data
+
+
+def legacy_context(full_document: str, script_data) -> str:
+    """변경 전 update_context의 system context (전체 문서 + 모든 슬라이드 대본)"""
+    page_contexts = [f"[슬라이드 {item['page'] + 1}]: {item['script']}" for item in script_data]
+    return full_document.strip() + "\n\n" + "\n".join(page_contexts)
+
+
+def deck_context(deck: DeckIndex, full_document: str, question: str) -> str:
+    """DeckIndex 방식의 프롬프트 context (개요 + 관련 슬라이드)"""
+    return truncate_to_tokens(full_document.strip(), DECK_OVERVIEW_TOKENS) + "\n\n" + deck.format_context(question)
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--slides", type=int, default=50)
+    parser.add_argument("--live", action="store_true", help="OpenAI 임베딩/LLM으로 실제 답변 시간 측정")
+    parser.add_argument("--model", default="gpt-4o-mini")
+    args = parser.parse_args()
+
+    full_document, script_data = make_deck(args.slides)
+    questions = [f"{topic} 단계에서 자주 발생하는 문제는?" for topic in TOPICS[:5]]
+
+    if args.live:
+        from langchain.embeddings import OpenAIEmbeddings
+        from dotenv import load_dotenv
+        load_dotenv(os.path.join(os.path.dirname(__file__), "../../.env"))
+        embeddings = OpenAIEmbeddings()
+    else:
+        embeddings = HashEmbeddings()
+
+    build_time, deck = timed(lambda: DeckIndex(embeddings, full_document, script_data))
+    legacy = legacy_context(full_document, script_data)
+    retrieval_times, deck_tokens, contexts = [], [], []
+    for question in questions:
+        elapsed, context = timed(lambda: deck_context(deck, full_document, question))
+        retrieval_times.append(elapsed)
+        deck_tokens.append(count_tokens(context))
+        contexts.append(context)
+
+    print(f"슬라이드 {args.slides}장, 질문 {len(questions)}개 ({'OpenAI' if args.live else '해시'} 임베딩)")
+    print(f"  기존 system context:     {count_tokens(legacy):8d} 토큰 (질문과 무관하게 고정)")
+    print(f"  deck 검색 context (평균): {sum(deck_tokens) / len(deck_tokens):8.0f} 토큰")
+    print(f"  deck 인덱스 생성:         {build_time * 1000:8.1f} ms (deck당 1회)")
+    print(f"  질문당 검색 (평균):       {sum(retrieval_times) / len(retrieval_times) * 1000:8.1f} ms")
+
+    if args.live:
+        from langchain_openai import ChatOpenAI
+        llm = ChatOpenAI(model=args.model, temperature=0)
+        legacy_times, deck_times = [], []
+        for question, context in zip(questions, contexts):
+            legacy_times.append(timed(lambda: llm.invoke([("system", legacy), ("human", question)]))[0])
+            deck_times.append(timed(lambda: llm.invoke([("system", context), ("human", question)]))[0])
+        print(f"  답변 시간 기존 (평균):    {sum(legacy_times) / len(legacy_times):8.2f} 초")
+        print(f"  답변 시간 deck (평균):    {sum(deck_times) / len(deck_times):8.2f} 초 (검색 시간 제외)")
+    deck.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+TTSEngine.get_top_keywords 키워드 순위 계산 마이크로벤치마크
+
+기존 방식(단어×키워드 쌍마다 cosine_similarity 호출)과
+utils.top_k_similar(정규화 행렬 곱 1회 + argpartition)를 합성 어휘로 비교한다.
+
+실행 (fastapi 디렉터리에서):
+    python benchmarks/keyword_ranking.py --words 3000 --keywords 10
+"""
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import time
+import numpy as np
+from sklearn.metrics.pairwise import cosine_similarity
+from utils import top_k_similar
+
+
+def legacy_top_keywords(words, word_embeddings, keyword_embeddings, top_k):
+    """변경 전 get_top_keywords의 순위 계산 부분"""
+    word_sims = {
+        word: max([cosine_similarity([w_emb], [k_emb])[0][0] for k_emb in keyword_embeddings])
+        for word, w_emb in zip(words, word_embeddings)
+    }
+    top_words = sorted(word_sims.items(), key=lambda x: x[1], reverse=True)[:top_k]
+    return [word for word, _ in top_words]
+
+
+def timed(fn, repeat):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--words", type=int, default=3000)
+    parser.add_argument("--keywords", type=int, default=10)
+    parser.add_argument("--dim", type=int, default=1536)   # text-embedding-ada-002 차원
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    words = [f"word{i:05d}" for i in range(args.words)]
+    word_embeddings = rng.standard_normal((args.words, args.dim)).tolist()
+    keyword_embeddings = rng.standard_normal((args.keywords, args.dim)).tolist()
+
+    legacy_time, legacy_result = timed(
+        lambda: legacy_top_keywords(words, word_embeddings, keyword_embeddings, args.top_k), 1
+    )
+    vector_time, vector_result = timed(
+        lambda: top_k_similar(words, word_embeddings, keyword_embeddings, args.top_k), args.repeat
+    )
+
+    print(f"어휘 {args.words}개 × 키워드 {args.keywords}개 (dim={args.dim}, top_k={args.top_k})")
+    print(f"  기존 (쌍별 cosine_similarity): {legacy_time * 1000:10.1f} ms")
+    print(f"  벡터화 (행렬 곱 + argpartition): {vector_time * 1000:10.1f} ms")
+    print(f"  속도 향상: {legacy_time / vector_time:.1f}x")
+    print(f"  결과 일치: {legacy_result == vector_result}")
+
+
+if __name__ == "__main__":
+    main()
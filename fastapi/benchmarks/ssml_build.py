@@ -0,0 +1,89 @@
+"""
+TTSEngine.build_ssml SSML 변환 마이크로벤치마크
+
+기존 방식(토큰마다 강조 단어/대문자 단어 리스트에 `in` 검사)과
+core.ssml(단어 단위 trie + 한 번의 순회)을 긴 합성 대본으로 비교한다.
+단일 단어 키워드에서는 두 결과가 같아야 하고, 여러 단어 구문은 새 방식만 강조한다.
+
+실행 (fastapi 디렉터리에서):
+    python benchmarks/ssml_build.py --sentences 2000 --keywords 300
+"""
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import random
+import re
+import time
+from core.ssml import PhraseMatcher, build_ssml, EMPHASIS_SSML
+
+
+def legacy_build_ssml(text, emphasized_words):
+    """변경 전 TTSEngine.build_ssml + apply_ssml_transformations"""
+    special_tokens = sorted(set(re.findall(r'\b[A-Z]{2,}\b', text)))
+
+    def transform(word):
+        if word in special_tokens:
+            return f'<say-as interpret-as="characters">{word}</say-as>'
+        elif word in emphasized_words:
+            return f'<break time="300ms"/><prosody pitch="+15%" rate="-5%" volume="+3dB"><emphasis level="moderate">{word}</emphasis></prosody>'
+        return word
+
+    words = re.split(r'(\W+)', text)
+    return f"<speak>{''.join(transform(w) for w in words).strip()}</speak>"
+
+
+def make_script(sentences, vocab, acronyms, rng):
+    lines = []
+    for _ in range(sentences):
+        words = rng.choices(vocab, k=rng.randint(6, 14))
+        if rng.random() < 0.3:
+            words.insert(rng.randrange(len(words)), rng.choice(acronyms))
+        lines.append(" ".join(words) + ".")
+    return " ".join(lines)
+
+
+def timed(fn, repeat):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sentences", type=int, default=2000)
+    parser.add_argument("--vocab", type=int, default=3000)
+    parser.add_argument("--keywords", type=int, default=300)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    vocab = [f"단어{i:04d}" for i in range(args.vocab)]
+    acronyms = ["API", "HTML", "PDF", "TTS", "LLM", "GPU"]
+    script = make_script(args.sentences, vocab, acronyms, rng)
+    keywords = rng.sample(vocab, args.keywords)
+
+    legacy_time, legacy_result = timed(lambda: legacy_build_ssml(script, keywords), args.repeat)
+    trie_time, trie_result = timed(lambda: build_ssml(script, PhraseMatcher(keywords)), args.repeat)
+
+    # 여러 단어 구문: 대본에 실제로 나오는 두 단어 조합을 키워드로 추가
+    words = script.split()
+    phrases = [f"{words[i]} {words[i + 1]}".rstrip(".") for i in range(0, len(words) - 1, 97)]
+    phrase_result = build_ssml(script, PhraseMatcher(keywords + phrases))
+    phrase_hits = sum(EMPHASIS_SSML.format(phrase) in phrase_result for phrase in phrases)
+
+    print(f"대본 {len(script):,}자 ({args.sentences}문장), 강조 키워드 {args.keywords}개")
+    print(f"  기존 (토큰마다 리스트 검사): {legacy_time * 1000:10.1f} ms")
+    print(f"  trie (한 번 순회):          {trie_time * 1000:10.1f} ms")
+    print(f"  속도 향상: {legacy_time / trie_time:.1f}x")
+    print(f"  단일 단어 결과 일치: {legacy_result == trie_result}")
+    print(f"  여러 단어 구문 강조: {phrase_hits}/{len(phrases)} (기존 방식은 0)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,82 +1,285 @@
 from pathlib import Path
-from models import MAN_TTS, WOMAN_TTS
-from sklearn.metrics.pairwise import cosine_similarity
+from contextlib import closing
+from utils import top_k_similar, hash_content, concat_audio, AUDIO_FORMATS
+from core.embedding_store import get_embedding_store
+from core.audio_cache import get_audio_cache
+from core.ssml import PhraseMatcher, build_ssml
+from core.tts_backends import get_tts_backend
 from langchain.embeddings import OpenAIEmbeddings
 import re
-import base64
 import os
 
+TTS_MAX_WORKERS = 8             # 동시에 합성할 조각(요청) 수 (Zonos는 ZONOS_MAX_INFLIGHT 사용)
+SENTENCE_END = re.compile(r"[.!?。…]$")
+TAG_NAME = re.compile(r"<([\w:-]+)")
+
 class TTSEngine:
     """TTS 엔진 클래스"""
-    def __init__(self, audio_dir: str = "../data/audio", gender: str = "MAN"):
+    def __init__(self, audio_dir: str = "../data/audio", gender: str = "MAN", max_workers: int = TTS_MAX_WORKERS,
+                 audio_encoding: str = "LINEAR16"):
         self.audio_dir = Path(audio_dir)
         self.audio_dir.mkdir(parents=True, exist_ok=True)
-        
-        # 성별에 따른 TTS 모델 선택
-        self.tts_model = MAN_TTS if gender.upper() == "MAN" else WOMAN_TTS
+
+        # 음성 파라미터에 따른 TTS 백엔드 선택 (MAN / WOMAN → Google, ZONOS → 자체 호스팅 Zonos)
+        self.backend = get_tts_backend(gender)
+        if audio_encoding not in AUDIO_FORMATS or audio_encoding not in self.backend.supported_encodings:
+            raise ValueError(
+                f"{self.backend.name} 백엔드가 지원하지 않는 오디오 인코딩입니다: {audio_encoding} "
+                f"(가능: {', '.join(self.backend.supported_encodings)})"
+            )
+        # 출력 인코딩 (LINEAR16=WAV, MP3, OGG_OPUS) → 파일 확장자 / MIME 타입
+        self.audio_encoding = audio_encoding
+        self.extension, self.mime_type = AUDIO_FORMATS[audio_encoding]
+        self.max_workers = max_workers
         self.embedder = OpenAIEmbeddings()
+        # 단어 임베딩은 (모델, 단어) 단위로 디스크에 캐시해 두고 새 단어만 요청
+        self.embedding_store = get_embedding_store(self.embedder.model)
+        # 최종 SSML이 같은 페이지는 다시 합성하지 않고 캐시된 오디오를 사용
+        self.audio_cache = get_audio_cache()
 
     def get_top_keywords(self, script: str, input_keywords: list[str], top_k: int = 10) -> list[str]:
         """키워드 추출"""
         words = sorted(set(re.findall(r'\w+', script)))
-        word_embeddings = self.embedder.embed_documents(words)
-        keyword_embeddings = [self.embedder.embed_query(k) for k in input_keywords]
+        if not words or not input_keywords:
+            return []
+        word_embeddings = self.embedding_store.embed(words, self.embedder.embed_documents)
+        keyword_embeddings = self.embedding_store.embed(input_keywords, self.embedder.embed_documents)
+        print(f"🔎 임베딩 캐시: {self.embedding_store.stats()}")
 
-        word_sims = {
-            word: max([cosine_similarity([w_emb], [k_emb])[0][0] for k_emb in keyword_embeddings])
-            for word, w_emb in zip(words, word_embeddings)
-        }
-        top_words = sorted(word_sims.items(), key=lambda x: x[1], reverse=True)[:top_k]
-        return [word for word, _ in top_words]
-
-    def apply_ssml_transformations(self, word: str, emphasized_words: list[str], special_tokens: list[str]) -> str:
-        """SSML 변환 적용"""
-        # 대문자 단어 처리 (예: API, HTML)
-        if word in special_tokens:
-            return f'<say-as interpret-as="characters">{word}</say-as>'
-        # 강조 키워드 처리
-        elif word in emphasized_words:
-            return f'<break time="300ms"/><prosody pitch="+15%" rate="-5%" volume="+3dB"><emphasis level="moderate">{word}</emphasis></prosody>'
-        return word
-
-    def build_ssml(self, text: str, emphasized_words: list[str]) -> str:
-        """SSML 빌드"""
-        # 대문자 단어 자동 탐지 (2자 이상)
-        special_tokens = sorted(set(re.findall(r'\b[A-Z]{2,}\b', text)))
-        print(f"🔎 철자 읽기 대상 대문자 단어: {special_tokens}")
-
-        words = re.split(r'(\W+)', text)  # 단어 + 구두점 분리
-        processed = [
-            self.apply_ssml_transformations(w, emphasized_words, special_tokens)
-            for w in words
-        ]
-        return f"<speak>{''.join(processed).strip()}</speak>"
-
-    def synthesize_pages(self, pages: dict[str, str], keywords: list[str]) -> dict[str, str]:
-        """페이지 음성 생성"""
-        print("🛠️ synthesize_speech_from_pages 시작")
+        return top_k_similar(words, word_embeddings, keyword_embeddings, top_k)
+
+    def build_ssml(self, text: str, matcher: PhraseMatcher) -> str:
+        """SSML 빌드 (강조 구문 + 대문자 약어 철자 읽기)"""
+        return build_ssml(text, matcher)
+
+    def split_ssml(self, ssml: str, max_bytes: int = None) -> list[str]:
+        """
+        SSML을 max_bytes 이하의 <speak> 조각들로 분할
+        - 최상위(태그 밖)의 문장 끝 / <break> 위치에서 우선 자르고, 한 문장이 너무 길면 공백에서 자름
+        - 열린 태그 안에서는 자르지 않음 (공백 없이 제한을 넘는 단어만 글자 경계에서 자르고 태그를 닫았다가 다시 엶)
+        """
+        max_bytes = max_bytes or self.backend.max_input_bytes
+        if len(ssml.encode("utf-8")) <= max_bytes:
+            return [ssml]
+        body = ssml.strip()
+        body = body[len("<speak>"):] if body.startswith("<speak>") else body
+        body = body[:-len("</speak>")] if body.endswith("</speak>") else body
+
+        # 1) 문장(단어 목록) 단위로 분해
+        sentences, word, depth = [[]], "", 0
+
+        def end_word():
+            nonlocal word
+            if word:
+                sentences[-1].append(word)
+                word = ""
+
+        def end_sentence():
+            end_word()
+            if sentences[-1]:
+                sentences.append([])
+
+        for token in re.split(r"(<[^>]+>)", body):
+            if not token:
+                continue
+            if token.startswith("<"):
+                word += token
+                if token.startswith("</"):
+                    depth -= 1
+                elif not token.endswith("/>"):
+                    depth += 1
+                elif depth == 0 and token.startswith("<break"):
+                    end_sentence()
+                continue
+            if depth > 0:
+                word += token
+                continue
+            for piece in re.split(r"(\s+)", token):
+                if not piece:
+                    continue
+                word += piece
+                if piece.isspace():
+                    if SENTENCE_END.search(word.rstrip()):
+                        end_sentence()
+                    else:
+                        end_word()
+        end_word()
+
+        # 2) 제한 안에서 최대한 길게 묶기
+        def fits(text):
+            return len(f"<speak>{text}</speak>".encode("utf-8")) <= max_bytes
+
+        chunks, current = [], ""
+
+        def flush():
+            nonlocal current
+            if current.strip():
+                chunks.append(f"<speak>{current.strip()}</speak>")
+            current = ""
+
+        for sentence in sentences:
+            text = "".join(sentence)
+            if fits(current + text):
+                current += text
+                continue
+            flush()
+            if fits(text):
+                current = text
+                continue
+            for piece in sentence:  # 문장 하나가 제한을 넘으면 단어 단위로 묶음
+                for part in ([piece] if fits(piece) else self._hard_split(piece, fits)):
+                    if not fits(current + part):
+                        flush()
+                    current += part
+        flush()
+        return chunks
+
+    @staticmethod
+    def _hard_split(word: str, fits) -> list[str]:
+        """
+        공백 없이 제한을 넘는 단어를 글자 경계에서 자름
+        - 태그 / 엔티티(&amp; 등)는 쪼개지 않고, 열린 태그는 조각 끝에서 닫았다가 다음 조각 앞에서 다시 엶
+        """
+        parts, current, has_text, open_tags = [], "", False, []
+
+        def closing(tags):
+            return "".join(f"</{TAG_NAME.match(tag).group(1)}>" for tag in reversed(tags))
+
+        for unit in re.findall(r"<[^>]+>|&[^;\s]+;|.", word, re.S):
+            tags = open_tags
+            if unit.startswith("</"):
+                tags = open_tags[:-1]
+            elif unit.startswith("<") and not unit.endswith("/>"):
+                tags = open_tags + [unit]
+            if has_text and not fits(current + unit + closing(tags)):
+                parts.append(current + closing(open_tags))
+                current, has_text = "".join(open_tags), False
+            current += unit
+            has_text = has_text or not unit.startswith("<")
+            open_tags = tags
+        if current:
+            parts.append(current)
+        return parts
+
+    def synthesize_pages(self, pages: dict[str, str], keywords: list[str], progress_callback=None) -> dict:
+        """
+        페이지 음성 생성 (progress_callback(done, total)은 페이지가 끝날 때마다 호출)
+        - 캐시에 없는 페이지의 SSML 조각을 모두 모아 백엔드에 한 번에 요청하고, 끝나는 대로 페이지별로 조립
+        반환: {"audios": {page: {"key", "url", "size", "mime_type"}}, "failed": {page: 오류 메시지}} (입력 페이지 순서 유지)
+        """
+        print(f"🛠️ synthesize_speech_from_pages 시작 ({self.backend.name})")
+        self.remove_stale_pages(pages)
         full_text = " ".join(pages.values())
+        # 대본에서 찾은 유사 단어 + 입력 키워드(여러 단어 구문 포함)를 요청마다 한 번 컴파일
         emphasized = self.get_top_keywords(full_text, keywords)
+        matcher = PhraseMatcher(dict.fromkeys(emphasized + list(keywords)))
+        print(f"🔎 강조 구문 {matcher.size}개")
+
+        audios, failed = {}, {}
+        finished = 0
 
-        results = {}
+        def finish(page, error=None):
+            nonlocal finished
+            if error is None:
+                print(f"✅ 페이지 {page} 음성 생성 완료")
+            else:
+                failed[page] = str(error)
+                # 이전 대본의 음성이 남아 있으면 내보내기(PPTX/ZIP)에 잘못 들어가므로 삭제
+                self._discard_page(page)
+                print(f"❌ 페이지 {page} TTS 생성 실패: {error}")
+            finished += 1
+            if progress_callback:
+                progress_callback(finished, len(pages))
+
+        # 1) SSML 생성 + 캐시 조회, 캐시에 없는 페이지는 조각으로 나눠 요청 목록에 추가
+        pending = {}            # page → {"key", "parts", "remaining"}
+        inputs, owners = [], []  # 요청 조각, 조각별 (page, 조각 순번)
         for page, script in pages.items():
-            print(f"🎙️ 페이지 {page} 음성 생성 시작")
             try:
-                ssml = self.build_ssml(script, emphasized)
-                # 선택된 TTS 모델로 음성 생성
-                response = self.tts_model._response(ssml)
-                wav_path = self.audio_dir / f"page_{page}.wav"
-                with open(wav_path, "wb") as f:
-                    f.write(response.audio_content)
-
-                results[page] = base64.b64encode(response.audio_content).decode("utf-8")
-                print(f"✅ 페이지 {page} 음성 생성 완료")
+                ssml = self.build_ssml(script, matcher)
+                cache_key = f"{hash_content(ssml, self.backend.config_signature(self.audio_encoding))}.{self.extension}"
+                audio = self.audio_cache.get(cache_key)
+                if audio is not None:
+                    print(f"♻️ 페이지 {page} 캐시된 음성 재사용")
+                    audios[page] = self._save_page(page, cache_key, audio)
+                else:
+                    chunks = self.split_ssml(ssml)
             except Exception as e:
-                print(f"❌ TTS 생성 중 예외 발생: {e}")
-        return results
+                finish(page, e)
+                continue
+            if audio is not None:
+                finish(page)  # try 밖에서 호출 (progress_callback의 JobCancelled가 실패로 기록되지 않도록)
+                continue
+            if len(chunks) > 1:
+                print(f"✂️ 페이지 {page} SSML {len(chunks)}개 조각으로 분할")
+            pending[page] = {"key": cache_key, "parts": [None] * len(chunks), "remaining": len(chunks)}
+            for part, chunk in enumerate(chunks):
+                inputs.append(chunk)
+                owners.append((page, part))
+
+        # 2) 모든 조각을 한 번에 요청, 페이지의 조각이 모두 도착하면 이어 붙여 저장
+        if inputs:
+            print(f"🎙️ 페이지 {len(pending)}개 / 조각 {len(inputs)}개 합성 요청")
+        # 작업이 취소되면(progress_callback → JobCancelled) 제너레이터를 바로 닫아 남은 조각 요청을 취소
+        with closing(self.backend.iter_synthesize(inputs, self.audio_encoding, self.max_workers)) as results:
+            for index, result in results:
+                page, part = owners[index]
+                if page in failed:
+                    continue
+                if isinstance(result, Exception):
+                    finish(page, result)
+                    continue
+                job = pending[page]
+                job["parts"][part] = result
+                job["remaining"] -= 1
+                if job["remaining"] == 0:
+                    try:
+                        audio = concat_audio(job["parts"], self.audio_encoding)
+                        self.audio_cache.set(job["key"], audio)
+                        audios[page] = self._save_page(page, job["key"], audio)
+                    except Exception as e:
+                        finish(page, e)
+                    else:
+                        finish(page)
+
+        print(f"🔁 오디오 캐시: {self.audio_cache.stats()}")
+        # 반환하는 핸들의 key는 클라이언트가 나중에 /audio/{key}로 가져가므로 gc에서 보호
+        self.audio_cache.pin(handle["key"] for handle in audios.values())
+        self.audio_cache.gc()
+        return {
+            "audios": {page: audios[page] for page in pages if page in audios},
+            "failed": {page: failed[page] for page in pages if page in failed},
+        }
+
+    def _save_page(self, page: str, cache_key: str, audio: bytes) -> dict:
+        """page_{n}.<확장자>로 저장 (PPTX/ZIP 내보내기용) 후 핸들 반환"""
+        audio_path = self.audio_dir / f"page_{page}.{self.extension}"
+        # 새 음성을 다 쓴 뒤에만 교체 (쓰는 도중 실패해도 반쯤 쓴 파일이 남지 않도록)
+        tmp_path = audio_path.with_name(audio_path.name + ".tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(audio)
+        os.replace(tmp_path, audio_path)
+
+        # 오디오 본문 대신 캐시 키(내용 해시) 핸들만 반환 → GET /audio/{key}로 필요할 때 조회
+        return {"key": cache_key, "url": f"/audio/{cache_key}", "size": len(audio), "mime_type": self.mime_type}
+
+    def _discard_page(self, page: str):
+        """page_{n}.* 삭제 (합성에 실패한 페이지)"""
+        for f in self.audio_dir.glob(f"page_{page}.*"):
+            f.unlink(missing_ok=True)
+
+    def remove_stale_pages(self, pages: dict[str, str]):
+        """
+        이번 요청에 없는 페이지 / 다른 인코딩의 페이지 음성 제거
+        - 남은 페이지 파일은 새 결과로 덮어쓰고, 합성에 실패한 페이지는 finish()에서 삭제
+        """
+        keep = {f"page_{page}.{self.extension}" for page in pages}
+        for f in self.audio_dir.glob("page_*.*"):
+            if f.name not in keep:
+                f.unlink()
 
     def clear_audio_dir(self):
-        """이전 WAV 파일 제거"""
-        for f in self.audio_dir.glob("*.wav"):
+        """이전 음성 파일 제거"""
+        for f in self.audio_dir.glob("page_*.*"):
             f.unlink()
         print("🧹 기존 오디오 파일 제거 완료")
\ No newline at end of file
@@ -0,0 +1,92 @@
+import os
+import threading
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))  # 같은 질문으로 볼 코사인 유사도
+ANSWER_CACHE_MAX_ENTRIES = 512                                                # deck당 최대 항목 수 (넘으면 오래된 항목부터 교체)
+
+
+class SemanticAnswerCache:
+    """
+    발표자료(deck) 단위 의미 기반 답변 캐시
+    - 질문 임베딩을 정규화해서 (max_entries × dim) 행렬에 저장, 조회는 행렬-벡터 곱 1회
+    - 가장 비슷한 이전 질문의 유사도가 threshold 이상이면 그 답변을 바로 반환
+    - deck이 바뀌면 clear()로 전체 무효화
+    """
+    def __init__(self, embeddings, threshold: float = ANSWER_CACHE_THRESHOLD, max_entries: int = ANSWER_CACHE_MAX_ENTRIES):
+        self.embeddings = embeddings
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self, deck_id: str = ""):
+        with self._lock:
+            self.deck_id = deck_id
+            self._vectors: Optional[np.ndarray] = None   # 첫 저장 시 임베딩 차원에 맞춰 할당
+            self._questions: List[str] = []
+            self._answers: List[str] = []
+            self._latencies: List[float] = []            # 원래 답변 생성에 걸린 시간(초)
+            self._next = 0                               # 다음에 쓸 행 (가득 차면 가장 오래된 행부터 덮어씀)
+            self.lookups = 0
+            self.hits = 0
+            self.saved_seconds = 0.0
+            self.lookup_seconds = 0.0
+
+    @staticmethod
+    def _normalize(vector) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        return vector / (np.linalg.norm(vector) + 1e-12)
+
+    async def aembed(self, question: str) -> np.ndarray:
+        return self._normalize(await self.embeddings.aembed_query(question))
+
+    def lookup(self, vector: np.ndarray) -> Optional[Tuple[str, float, float]]:
+        """정규화된 질문 벡터 → (캐시된 답변, 유사도, 원래 생성 시간) 또는 None"""
+        with self._lock:
+            self.lookups += 1
+            size = len(self._answers)
+            if not size:
+                return None
+            scores = self._vectors[:size] @ vector
+            best = int(np.argmax(scores))
+            score = float(scores[best])
+            if score < self.threshold:
+                return None
+            self.hits += 1
+            return self._answers[best], score, self._latencies[best]
+
+    def store(self, question: str, vector: np.ndarray, answer: str, latency: float):
+        with self._lock:
+            if self._vectors is None:
+                self._vectors = np.zeros((self.max_entries, vector.shape[0]), dtype=np.float32)
+            row = self._next % self.max_entries
+            self._vectors[row] = vector
+            if row < len(self._answers):
+                self._questions[row], self._answers[row], self._latencies[row] = question, answer, latency
+            else:
+                self._questions.append(question)
+                self._answers.append(answer)
+                self._latencies.append(latency)
+            self._next += 1
+
+    def record_lookup(self, seconds: float, saved: float = 0.0):
+        """질문 임베딩 + 조회에 걸린 시간, 히트로 절약한 시간(원래 생성 시간 - 조회 시간) 누적"""
+        with self._lock:
+            self.lookup_seconds += seconds
+            self.saved_seconds += max(saved, 0.0)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "deck_id": self.deck_id,
+                "entries": len(self._answers),
+                "threshold": self.threshold,
+                "lookups": self.lookups,
+                "hits": self.hits,
+                "hit_rate": round(self.hits / self.lookups, 3) if self.lookups else 0.0,
+                "saved_seconds": round(self.saved_seconds, 3),
+                "avg_lookup_ms": round(self.lookup_seconds / self.lookups * 1000, 1) if self.lookups else 0.0,
+            }
@@ -0,0 +1,124 @@
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+from core.cache import CACHE_DIR
+
+AUDIO_CACHE_DIR = CACHE_DIR / "audio"
+AUDIO_CACHE_MAX_AGE = 7 * 24 * 60 * 60      # 마지막 사용 후 보관 기간(초)
+AUDIO_CACHE_MAX_BYTES = 1024 * 1024 * 1024   # 캐시 디렉터리 최대 크기 (1GB)
+AUDIO_CACHE_GC_INTERVAL = 10 * 60            # 정리 작업 최소 간격(초)
+AUDIO_PIN_TTL = 24 * 60 * 60                 # /generate-audio가 반환한 핸들을 gc에서 보호할 시간(초)
+
+
+class AudioCache:
+    """
+    SSML + 음성 + 오디오 설정 해시 → 합성된 오디오 파일 캐시
+    - 항목 이름은 "<해시>.<확장자>" (wav/mp3/ogg)
+    - 파일 수정 시각을 마지막 사용 시각으로 사용 (조회 시 갱신)
+    - 오래된 파일과 크기 초과분은 gc()에서 오래 사용하지 않은 순서로 삭제
+    - pin()한 항목(클라이언트에 핸들로 내려준 음성)은 AUDIO_PIN_TTL 동안 삭제하지 않음 (/audio/{key} 404 방지)
+    """
+    def __init__(self, directory: Path = AUDIO_CACHE_DIR, max_age: float = AUDIO_CACHE_MAX_AGE,
+                 max_bytes: int = AUDIO_CACHE_MAX_BYTES):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._last_gc = 0.0
+        self._pinned = {}   # 항목 이름 → 보호 만료 시각
+
+    def path(self, name: str) -> Path:
+        return self.directory / name
+
+    def get(self, name: str) -> Optional[bytes]:
+        path = self.path(name)
+        try:
+            data = path.read_bytes()
+            os.utime(path)   # 최근 사용 시각 갱신
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return data
+
+    def set(self, name: str, data: bytes):
+        """임시 파일에 쓴 뒤 교체 (동시에 같은 키를 써도 깨진 파일이 남지 않음)"""
+        path = self.path(name)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def pin(self, names, ttl: float = AUDIO_PIN_TTL):
+        """핸들로 내려준 항목을 ttl초 동안 gc 대상에서 제외"""
+        until = time.time() + ttl
+        with self._lock:
+            for name in names:
+                self._pinned[name] = max(self._pinned.get(name, 0.0), until)
+
+    def gc(self, force: bool = False) -> int:
+        """보관 기간이 지난 파일 삭제 후, 전체 크기가 max_bytes를 넘으면 오래된 파일부터 삭제 (pin된 항목 제외)"""
+        with self._lock:
+            now = time.time()
+            if not force and now - self._last_gc < AUDIO_CACHE_GC_INTERVAL:
+                return 0
+            self._last_gc = now
+            self._pinned = {name: until for name, until in self._pinned.items() if until > now}
+            pinned = set(self._pinned)
+
+        entries = []
+        for path in self.directory.iterdir():
+            if path.suffix == ".tmp":
+                continue
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        entries.sort()
+
+        removed = 0
+        total = sum(size for _, size, _ in entries)
+        for mtime, size, path in entries:
+            if now - mtime <= self.max_age and total <= self.max_bytes:
+                break
+            if path.name in pinned:
+                continue
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+        if removed:
+            print(f"🧹 오디오 캐시 정리: {removed}개 삭제 (남은 크기 {total / 1024 / 1024:.1f}MB)")
+        return removed
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+        }
+
+
+_audio_cache = None
+_audio_cache_lock = threading.Lock()
+
+
+def get_audio_cache() -> AudioCache:
+    """프로세스 안에서 하나의 캐시 인스턴스를 공유 (히트율 통계 누적)"""
+    global _audio_cache
+    with _audio_cache_lock:
+        if _audio_cache is None:
+            _audio_cache = AudioCache()
+        return _audio_cache
@@ -1,30 +1,56 @@
 import os
+import asyncio
+import time
 from dotenv import load_dotenv
 load_dotenv(os.path.join(os.path.dirname(__file__), '../../.env'))
-from typing import List, Dict
+from typing import List, Dict, Optional, AsyncIterator
 from langchain_core.chat_history import BaseChatMessageHistory
 from langchain_core.output_parsers import StrOutputParser
 from pydantic import BaseModel, Field
-from models import CHATBOT_LLM, PresentationState, ChatRequest, ChatResponse
+from models import get_model, PresentationState, ChatRequest, ChatResponse
+from core.token_budget import truncate_to_tokens
+from core.deck_index import DeckIndex
+from core.answer_cache import SemanticAnswerCache
+
+# system prompt에는 발표 자료의 앞부분 개요만 넣고, 나머지는 질문마다 관련 슬라이드를 검색해서 넣음
+DECK_OVERVIEW_TOKENS = 300
+# 질문 하나의 답변 생성 제한 시간(초) - 검색 + 웹 검색 + LLM 호출 전체
+CHAT_TIMEOUT_SECONDS = float(os.getenv("CHAT_TIMEOUT_SECONDS", "30"))
+CHAT_TIMEOUT_MESSAGE = "답변 생성 시간이 초과되었습니다. 잠시 후 다시 질문해주세요."
 
 
 class ChatbotService:
     def __init__(self):
-        self.chatbot = CHATBOT_LLM
         self.state = PresentationState(is_completed=False, chat_enabled=False)
         self.context_loaded = False
+        self.deck_index = None
+        self.answer_cache: Optional[SemanticAnswerCache] = None   # deck 단위 의미 기반 답변 캐시
 
-    def update_context(self, context_text: str, script_data: List[Dict[str, str]]):
-        """system_prompt 및 발표 대본 context 설정 및 체인 생성"""
-        # 페이지별 대본 정보를 문자열로 통합
-        page_contexts = [f"[슬라이드 {item['page'] + 1}]: {item['script']}" for item in script_data if 'page' in item and 'script' in item]
-        script_context_text = "\n".join(page_contexts)
+    @property
+    def chatbot(self):
+        """Chroma 검색기 + LLM은 처음 사용할 때 생성"""
+        return get_model("CHATBOT_LLM")
 
-        # 전체 system context 구성
-        combined_context = context_text.strip() + "\n\n" + script_context_text.strip()
+    def update_context(self, context_text: str, script_data: List[Dict[str, str]]):
+        """
+        발표 자료(deck) 검색 인덱스 생성 + system_prompt 설정 및 체인 생성
+        - 슬라이드별 대본/텍스트와 스토리 문서를 deck 전용 벡터 컬렉션에 임베딩
+        - 질문마다 관련 슬라이드 top-k만 프롬프트에 들어가므로 슬라이드 수가 늘어도 프롬프트 크기는 일정
+        - deck 내용이 바뀌면 이전 deck의 캐시된 답변은 모두 무효화
+        """
+        if self.answer_cache is None:
+            self.answer_cache = SemanticAnswerCache(self.chatbot.embeddings)
+        deck_id = DeckIndex.compute_deck_id(context_text, script_data)
+        if self.deck_index is None or self.deck_index.deck_id != deck_id:
+            if self.deck_index is not None:
+                self.deck_index.close()
+            self.deck_index = DeckIndex(self.chatbot.embeddings, context_text, script_data)
+            self.answer_cache.clear(deck_id)
+        self.chatbot.deck_index = self.deck_index
 
-        # 프롬프트 및 체인 설정
-        self.chatbot.get_template(system_context=combined_context)
+        # 프롬프트 및 체인 설정 (system context는 발표 자료 개요만)
+        overview = truncate_to_tokens(context_text.strip(), DECK_OVERVIEW_TOKENS)
+        self.chatbot.get_template(system_context=overview)
         self.chatbot._make_chain()
         self.context_loaded = True
         self.state.chat_enabled = True
@@ -41,15 +67,121 @@ class ChatbotService:
         """현재 챗봇 상태 반환"""
         return self.state.dict()
 
-    async def process_qa_request(self, question: str, session_id: str) -> str:
-        """질문에 대한 답변 생성"""
+    async def process_qa_request(self, question: str, session_id: str, timeout: Optional[float] = None, use_cache: bool = True) -> str:
+        """질문에 대한 답변 생성 (이벤트 루프를 막지 않는 ainvoke + 요청별 제한 시간)"""
         if not self.state.chat_enabled:
             return "프레젠테이션이 완료된 후에 질문해주세요."
 
         if not self.context_loaded:
             return "챗봇이 아직 초기화되지 않았습니다. 배경 정보를 먼저 등록해주세요."
 
-        return self.chatbot.invoke(question, session_id)
+        timeout = timeout or CHAT_TIMEOUT_SECONDS
+        try:
+            return await asyncio.wait_for(self._answer(question, session_id, use_cache), timeout=timeout)
+        except asyncio.TimeoutError:
+            print(f"⏰ 답변 생성 시간 초과 ({timeout:.0f}초): session={session_id}")
+            return CHAT_TIMEOUT_MESSAGE
+        except Exception as e:
+            return f"오류 발생: {str(e)}"
+
+    async def _answer(self, question: str, session_id: str, use_cache: bool = True) -> str:
+        """답변 캐시 조회 → 미스면 체인 실행 후 (오류가 아닌) 답변만 캐시에 저장"""
+        cached, vector = await self._lookup_cached_answer(question, session_id, use_cache)
+        if cached is not None:
+            return cached
+        start = time.perf_counter()
+        answer = await self.chatbot.ainvoke(question, session_id, raise_errors=True)
+        if vector is not None and answer.strip():
+            self.answer_cache.store(question, vector, answer, time.perf_counter() - start)
+        return answer
+
+    async def _lookup_cached_answer(self, question: str, session_id: str, use_cache: bool = True):
+        """
+        의미가 거의 같은 이전 질문의 답변 조회 → (캐시된 답변 또는 None, 질문 벡터)
+        - 히트하면 체인을 거치지 않으므로 대화 기록에 직접 (질문, 답변) 추가
+        - 임베딩에 실패하면 캐시 없이 진행 (벡터 None)
+        - 답변이 대화 기록에도 의존하므로 이전 대화가 있는 세션은 조회/저장하지 않음 (벡터 None)
+          ("더 자세히 알려주세요" 같은 후속 질문이 다른 세션의 답변을 받지 않도록)
+        - use_cache=False면 조회/저장하지 않음 (벡터 None)
+        """
+        if not use_cache:
+            return None, None
+        history = self.get_chat_history(session_id)
+        if history.messages:
+            return None, None
+
+        start = time.perf_counter()
+        try:
+            vector = await self.answer_cache.aembed(question)
+        except Exception as e:
+            print(f"⚠️ 답변 캐시 임베딩 실패: {e}")
+            return None, None
+        hit = self.answer_cache.lookup(vector)
+        elapsed = time.perf_counter() - start
+        self.answer_cache.record_lookup(elapsed, saved=hit[2] - elapsed if hit else 0.0)
+        if hit is None:
+            return None, vector
+
+        answer, score, _ = hit
+        print(f"💾 답변 캐시 히트 (유사도 {score:.3f}, {elapsed * 1000:.0f}ms): {question}")
+        history.add_user_message(question)
+        history.add_ai_message(answer)
+        return answer, vector
+
+    async def stream_qa_request(self, question: str, session_id: str, timeout: Optional[float] = None, use_cache: bool = True) -> AsyncIterator[str]:
+        """답변을 토큰 단위로 스트리밍 (제한 시간은 스트림 전체 기준)"""
+        if not self.state.chat_enabled:
+            yield "프레젠테이션이 완료된 후에 질문해주세요."
+            return
+
+        if not self.context_loaded:
+            yield "챗봇이 아직 초기화되지 않았습니다. 배경 정보를 먼저 등록해주세요."
+            return
+
+        timeout = timeout or CHAT_TIMEOUT_SECONDS
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+
+        def remaining() -> float:
+            """남은 제한 시간 (yield로 멈춰 있던 시간도 포함해 마감 시각 기준으로 계산, 지났으면 바로 시간 초과)"""
+            left = deadline - loop.time()
+            if left <= 0:
+                raise asyncio.TimeoutError()
+            return left
+
+        tokens = None
+        try:
+            cached, vector = await asyncio.wait_for(self._lookup_cached_answer(question, session_id, use_cache), timeout=remaining())
+            if cached is not None:
+                yield cached
+                return
+
+            start = time.perf_counter()
+            chunks = []
+            tokens = self.chatbot.astream(question, session_id)
+            while True:
+                try:
+                    token = await asyncio.wait_for(tokens.__anext__(), timeout=remaining())
+                except StopAsyncIteration:
+                    # 스트림이 끝까지 완료된 답변만 캐시에 저장
+                    answer = "".join(chunks)
+                    if vector is not None and answer.strip():
+                        self.answer_cache.store(question, vector, answer, time.perf_counter() - start)
+                    return
+                chunks.append(token)
+                yield token
+        except asyncio.TimeoutError:
+            print(f"⏰ 답변 스트리밍 시간 초과 ({timeout:.0f}초): session={session_id}")
+            raise
+        finally:
+            if tokens is not None:
+                await tokens.aclose()
+
+    def get_cache_stats(self) -> dict:
+        """답변 캐시 히트율 / 절약한 시간"""
+        if self.answer_cache is None:
+            return {"entries": 0, "lookups": 0, "hits": 0, "hit_rate": 0.0, "saved_seconds": 0.0}
+        return self.answer_cache.stats()
 
     def get_chat_history(self, session_id: str) -> BaseChatMessageHistory:
         """세션별 대화 기록 조회"""
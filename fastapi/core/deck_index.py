@@ -0,0 +1,91 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from langchain.vectorstores import Chroma
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_core.documents import Document
+from utils import hash_content
+from typing import Dict, List
+import time
+
+DECK_TOP_K = 4                  # 질문마다 프롬프트에 넣을 슬라이드/문서 청크 수
+DOCUMENT_CHUNK_SIZE = 500       # 스토리 문서(full_document) 청크 크기
+DOCUMENT_CHUNK_OVERLAP = 100
+
+
+class DeckIndex:
+    """
+    발표자료 한 개(deck)에 대한 벡터 컬렉션
+    - 슬라이드마다 (대본 + 슬라이드 텍스트) 1개 문서, 스토리 문서는 청크 단위로 임베딩
+    - 질문과 관련된 상위 k개만 "[슬라이드 N]" 번호를 붙여 프롬프트에 넣음
+    """
+    def __init__(self, embeddings, full_document: str, script_data: List[Dict], top_k: int = DECK_TOP_K):
+        self.top_k = top_k
+        self.deck_id = self.compute_deck_id(full_document, script_data)
+        start = time.perf_counter()
+        documents = self._make_documents(full_document, script_data)
+        self.vectorstore = Chroma(
+            collection_name=f"deck_{self.deck_id[:32]}",
+            embedding_function=embeddings
+        )
+        if documents:
+            # 한 번의 배치 임베딩 요청으로 저장
+            self.vectorstore.add_texts(
+                texts=[doc.page_content for doc in documents],
+                metadatas=[doc.metadata for doc in documents],
+                ids=[hash_content(doc.page_content, str(doc.metadata)) for doc in documents]
+            )
+        self.size = len(documents)
+        print(f"📚 deck 인덱스 생성: 문서 {self.size}개 ({time.perf_counter() - start:.2f}초)")
+
+    @staticmethod
+    def compute_deck_id(full_document: str, script_data: List[Dict]) -> str:
+        """문서 + 슬라이드별 대본/텍스트 내용 해시 (내용이 같으면 인덱스 재사용)"""
+        return hash_content(full_document, *(
+            f"{item.get('page')}|{item.get('script', '')}|{item.get('text') or ''}" for item in script_data
+        ))
+
+    def close(self):
+        """deck이 바뀌면 이전 컬렉션 삭제 (메모리 해제)"""
+        try:
+            self.vectorstore.delete_collection()
+        except Exception as e:
+            print(f"⚠️ deck 컬렉션 삭제 실패: {e}")
+
+    @staticmethod
+    def _make_documents(full_document: str, script_data: List[Dict]) -> List[Document]:
+        documents = []
+        for item in script_data:
+            if "page" not in item:
+                continue
+            slide_no = item["page"] + 1
+            parts = [f"[슬라이드 {slide_no}]"]
+            if item.get("text"):
+                parts.append(f"슬라이드 내용: {item['text']}")
+            if item.get("script"):
+                parts.append(f"발표 대본: {item['script']}")
+            documents.append(Document(page_content="\n".join(parts), metadata={"kind": "slide", "slide": slide_no}))
+
+        splitter = RecursiveCharacterTextSplitter(chunk_size=DOCUMENT_CHUNK_SIZE, chunk_overlap=DOCUMENT_CHUNK_OVERLAP)
+        for i, chunk in enumerate(splitter.split_text(full_document or "")):
+            documents.append(Document(page_content=f"[발표 자료 문서 #{i + 1}]\n{chunk}", metadata={"kind": "document", "chunk": i}))
+        return documents
+
+    def search(self, question: str, top_k: int = None) -> List[Document]:
+        return self.vectorstore.similarity_search(question, k=min(top_k or self.top_k, self.size)) if self.size else []
+
+    async def asearch(self, question: str, top_k: int = None) -> List[Document]:
+        return await self.vectorstore.asimilarity_search(question, k=min(top_k or self.top_k, self.size)) if self.size else []
+
+    def format_context(self, question: str) -> str:
+        return self._format(self.search(question))
+
+    async def aformat_context(self, question: str) -> str:
+        return self._format(await self.asearch(question))
+
+    @staticmethod
+    def _format(documents: List[Document]) -> str:
+        """관련 슬라이드/문서 청크를 슬라이드 순서대로 정리 (슬라이드 번호는 인용 표시에 사용)"""
+        documents.sort(key=lambda doc: (doc.metadata.get("kind") != "slide", doc.metadata.get("slide", 0), doc.metadata.get("chunk", 0)))
+        return "\n\n".join(doc.page_content for doc in documents)
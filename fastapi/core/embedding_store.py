@@ -0,0 +1,174 @@
+import heapq
+import json
+import os
+import re
+import threading
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from core.cache import CACHE_DIR
+
+EMBEDDING_DIR = CACHE_DIR / "embeddings"
+EMBEDDING_MAX_ENTRIES = 50000   # 모델별 최대 저장 단어 수 (초과 시 가장 오래 사용하지 않은 단어부터 교체)
+
+
+class EmbeddingStore:
+    """
+    (모델, 토큰) → 임베딩 영구 캐시
+    - 벡터: max_entries × dim float32 memmap 파일 (필요한 행만 읽음, 반환 값은 복사본이라 이후 행 교체와 무관)
+    - 인덱스: 토큰 → [행 번호, 마지막 사용 순번] JSON 파일
+    """
+    def __init__(self, model: str, directory: Path = EMBEDDING_DIR, max_entries: int = EMBEDDING_MAX_ENTRIES):
+        self.model = model
+        self.max_entries = max_entries
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        safe_name = re.sub(r"[^\w.-]", "_", model)
+        self.matrix_path = self.directory / f"{safe_name}.f32"
+        self.index_path = self.directory / f"{safe_name}.index.json"
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._dim: Optional[int] = None
+        self._rows: Dict[str, list] = {}   # token → [row, last_used]
+        self._next_row = 0                  # 아직 한 번도 쓰지 않은 첫 행 (이후 행은 교체로만 재사용)
+        self._clock = 0
+        self._matrix = None
+        self._load()
+
+    def _load(self):
+        if not self.index_path.exists() or not self.matrix_path.exists():
+            return
+        with open(self.index_path, "r", encoding="utf-8") as f:
+            index = json.load(f)
+        if index.get("max_entries") != self.max_entries:
+            print(f"[EMBED] 저장소 크기 설정이 바뀌어 캐시를 새로 만듭니다: {self.model}")
+            return
+        self._dim = index["dim"]
+        self._rows = index["rows"]
+        self._next_row = max((row for row, _ in self._rows.values()), default=-1) + 1
+        self._clock = index.get("clock", 0)
+        self._matrix = np.memmap(self.matrix_path, dtype=np.float32, mode="r+", shape=(self.max_entries, self._dim))
+        print(f"[EMBED] 임베딩 캐시 로드: {self.model} ({len(self._rows)}개)")
+
+    def _create(self, dim: int):
+        self._dim = dim
+        self._rows = {}
+        self._next_row = 0
+        self._matrix = np.memmap(self.matrix_path, dtype=np.float32, mode="w+", shape=(self.max_entries, dim))
+
+    def _save_index(self):
+        self._matrix.flush()
+        tmp_path = self.index_path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "model": self.model,
+                "dim": self._dim,
+                "max_entries": self.max_entries,
+                "clock": self._clock,
+                "rows": self._rows,
+            }, f, ensure_ascii=False)
+        os.replace(tmp_path, self.index_path)
+
+    def get(self, token: str):
+        """저장된 벡터의 복사본 (없으면 None)"""
+        with self._lock:
+            entry = self._rows.get(token)
+            if entry is None:
+                return None
+            self._clock += 1
+            entry[1] = self._clock
+            return np.array(self._matrix[entry[0]])
+
+    def embed(self, tokens: List[str], embed_fn: Callable[[List[str]], List[List[float]]]) -> np.ndarray:
+        """tokens 순서대로 임베딩 행렬 반환 (캐시에 없는 토큰만 embed_fn으로 한 번에 요청)"""
+        unique = list(dict.fromkeys(tokens))
+        with self._lock:
+            self._clock += 1
+            hit_positions, hit_rows, miss_positions, misses = [], [], [], []
+            for position, token in enumerate(unique):
+                entry = self._rows.get(token)
+                if entry is None:
+                    miss_positions.append(position)
+                    misses.append(token)
+                else:
+                    entry[1] = self._clock   # 이번 요청에 쓰이는 단어가 먼저 교체되지 않도록 갱신
+                    hit_positions.append(position)
+                    hit_rows.append(entry[0])
+            # 아래에서 새 벡터를 넣으며 행이 교체되거나 다른 thread가 교체해도 영향이 없도록 lock 안에서 복사
+            hit_vectors = self._matrix[hit_rows] if hit_rows else None
+            self.hits += len(hit_rows)          # 히트/미스 모두 중복 제거한 토큰 기준
+            self.misses += len(misses)
+
+        miss_vectors = None
+        if misses:
+            miss_vectors = np.asarray(embed_fn(misses), dtype=np.float32)
+            with self._lock:
+                if self._matrix is None or self._dim != miss_vectors.shape[1]:
+                    self._create(miss_vectors.shape[1])
+                self._insert_many(dict(zip(misses, miss_vectors)))
+                self._save_index()
+
+        dim = (miss_vectors if miss_vectors is not None else hit_vectors).shape[1] if unique else (self._dim or 0)
+        unique_matrix = np.empty((len(unique), dim), dtype=np.float32)
+        if hit_rows:
+            unique_matrix[hit_positions] = hit_vectors
+        if misses:
+            unique_matrix[miss_positions] = miss_vectors
+        index = {token: position for position, token in enumerate(unique)}
+        return unique_matrix[[index[token] for token in tokens]]
+
+    def _insert_many(self, fresh: Dict[str, np.ndarray]):
+        """새 벡터 저장 (공간이 부족하면 가장 오래 사용하지 않은 토큰의 행을 재사용)"""
+        self._clock += 1
+        # 다른 thread가 같은 토큰을 동시에 미스로 보고 먼저 저장했으면 그 행을 그대로 사용
+        # (다시 저장하면 먼저 받은 행이 어느 토큰에도 속하지 않은 채 남음)
+        for token in [token for token in fresh if token in self._rows]:
+            self._rows[token][1] = self._clock
+            del fresh[token]
+
+        overflow = len(fresh) - (self.max_entries - self._next_row)
+        free_rows = []
+        if overflow > 0:
+            victims = heapq.nsmallest(overflow, self._rows, key=lambda token: self._rows[token][1])
+            free_rows = [self._rows.pop(token)[0] for token in victims]
+            self.evictions += len(victims)
+
+        for token, vector in fresh.items():
+            if free_rows:
+                row = free_rows.pop()
+            elif self._next_row < self.max_entries:
+                row = self._next_row
+                self._next_row += 1
+            else:
+                break   # 한 번에 max_entries보다 많은 토큰이 들어온 경우 나머지는 저장하지 않음
+            self._matrix[row] = vector
+            self._rows[token] = [row, self._clock]
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "model": self.model,
+            "entries": len(self._rows),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+        }
+
+
+_stores: Dict[str, EmbeddingStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_embedding_store(model: str) -> EmbeddingStore:
+    """모델별 저장소는 프로세스 안에서 하나만 연다"""
+    with _stores_lock:
+        if model not in _stores:
+            _stores[model] = EmbeddingStore(model)
+        return _stores[model]
@@ -0,0 +1,59 @@
+"""
+이미지/해시 보조 함수 (무거운 의존성 없음)
+- rasterizer의 spawn worker 프로세스가 import하므로 PIL, fitz, 표준 라이브러리만 사용
+  (utils는 langchain, sklearn, google-cloud, python-pptx까지 불러와 worker마다 시작 비용과 메모리가 큼)
+"""
+from io import BytesIO
+from PIL import Image, ImageStat
+import hashlib
+import fitz
+
+
+def optimize_image(image_bytes: bytes, max_size: int = 800, quality: int = 50) -> bytes:
+    """
+    이미지 크기 리사이즈 + JPEG 압축
+    """
+    img = Image.open(BytesIO(image_bytes)).convert("RGB")
+    if img.width > max_size or img.height > max_size:
+        ratio = max_size / max(img.width, img.height)
+        new_size = (int(img.width * ratio), int(img.height * ratio))
+        img = img.resize(new_size, Image.Resampling.LANCZOS)
+    
+    output = BytesIO()
+    img.save(output, format="JPEG", quality=quality, optimize=True)
+    return output.getvalue(), img.size
+
+
+def extract_raw_image_bytes(doc, xref) -> bytes:
+    """
+    PDF에서 디코딩된 이미지 바이트 데이터(PNG)를 추출
+    """
+    pix = fitz.Pixmap(doc, xref)
+    if pix.n > 4:  # CMYK → RGB 변환
+        pix = fitz.Pixmap(fitz.csRGB, pix)
+    return pix.tobytes()
+
+
+def hash_content(*parts) -> str:
+    """
+    bytes/str 조각들을 이어 붙인 내용의 SHA-256 해시
+    """
+    digest = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, str):
+            part = part.encode("utf-8")
+        digest.update(part)
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+
+def image_pixel_stats(image_bytes: bytes, sample_size: int = 64) -> dict:
+    """
+    원본 크기와 축소 이미지의 밝기 표준편차 계산
+    """
+    img = Image.open(BytesIO(image_bytes))
+    width, height = img.size
+    img = img.convert("L")
+    img.thumbnail((sample_size, sample_size))
+
+    return {"width": width, "height": height, "stddev": ImageStat.Stat(img).stddev[0]}
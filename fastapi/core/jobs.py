@@ -0,0 +1,155 @@
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional
+
+JOB_MAX_WORKERS = 2     # 동시에 실행할 생성 작업 수
+JOB_MAX_QUEUED = 8      # 실행 대기열 최대 길이 (초과 시 접수 거절)
+JOB_TTL = 60 * 60       # 완료된 작업 결과 보관 시간(초)
+
+
+@contextmanager
+def cancelling_executor(max_workers: int):
+    """
+    with 블록을 벗어날 때 대기 중인 작업은 취소하고 실행 중인 작업은 기다리지 않는 ThreadPoolExecutor
+    (기본 __exit__은 남은 작업이 모두 끝날 때까지 기다리므로, 시간 초과/취소된 작업이 작업 슬롯을 붙잡음)
+    """
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        yield executor
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+class JobQueueFull(Exception):
+    """작업 대기열이 가득 찬 경우"""
+
+
+class JobCancelled(Exception):
+    """실행 중인 작업이 취소된 경우"""
+
+
+class Job:
+    """백그라운드 작업 상태"""
+    def __init__(self, kind: str):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.status = "queued"   # queued → running → completed / failed / cancelled
+        self.done = 0
+        self.total = 0
+        self.message = ""
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.exception: Optional[BaseException] = None   # 실패 원인 (작업 결과를 기다리는 동기 경로에서 다시 발생)
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.future = None
+        self._cancel_event = threading.Event()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("completed", "failed", "cancelled")
+
+    def update_progress(self, done: int, total: int, message: str = ""):
+        """진행률 갱신 + 취소 요청 확인 (작업 함수가 단계마다 호출)"""
+        self.done = done
+        self.total = total
+        self.message = message
+        self.check_cancelled()
+
+    def check_cancelled(self):
+        if self._cancel_event.is_set():
+            raise JobCancelled(f"작업 {self.id}이(가) 취소되었습니다.")
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "progress": {"done": self.done, "total": self.total, "message": self.message},
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class JobManager:
+    """제한된 worker pool에서 오래 걸리는 생성 작업을 이벤트 루프 밖에서 실행"""
+    def __init__(self, max_workers: int = JOB_MAX_WORKERS, max_queued: int = JOB_MAX_QUEUED, ttl: float = JOB_TTL):
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+        self.ttl = ttl
+        self.jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+
+    def submit(self, kind: str, fn: Callable[[Job], Any]) -> Job:
+        """작업 접수 (fn은 Job을 인자로 받아 결과를 반환). 수용량 초과 시 JobQueueFull"""
+        with self._lock:
+            self._prune()
+            active = sum(1 for job in self.jobs.values() if not job.finished)
+            if active >= self.max_workers + self.max_queued:
+                raise JobQueueFull(f"처리 가능한 작업 수({self.max_workers + self.max_queued})를 초과했습니다.")
+
+            job = Job(kind)
+            self.jobs[job.id] = job
+            job.future = self._executor.submit(self._run, job, fn)
+        print(f"📥 작업 접수: {kind} ({job.id})")
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self.jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        """대기 중인 작업은 즉시 취소, 실행 중인 작업은 다음 단계에서 중단"""
+        job = self.jobs.get(job_id)
+        if job is None or job.finished:
+            return job
+        job._cancel_event.set()
+        if job.future.cancel():
+            self._finish(job, "cancelled")
+        print(f"🛑 작업 취소 요청: {job.kind} ({job.id})")
+        return job
+
+    def stats(self) -> dict:
+        with self._lock:
+            statuses = [job.status for job in self.jobs.values()]
+        return {
+            "max_workers": self.max_workers,
+            "max_queued": self.max_queued,
+            "queued": statuses.count("queued"),
+            "running": statuses.count("running"),
+        }
+
+    def _run(self, job: Job, fn: Callable[[Job], Any]):
+        if job._cancel_event.is_set():
+            self._finish(job, "cancelled")
+            return
+        job.status = "running"
+        job.started_at = time.time()
+        try:
+            job.result = fn(job)
+            self._finish(job, "completed")
+        except JobCancelled:
+            self._finish(job, "cancelled")
+        except Exception as e:
+            job.error = str(e)
+            job.exception = e
+            self._finish(job, "failed")
+            print(f"❌ 작업 실패: {job.kind} ({job.id}) → {e}")
+
+    def _finish(self, job: Job, status: str):
+        job.status = status
+        job.finished_at = time.time()
+        print(f"✅ 작업 종료: {job.kind} ({job.id}) → {status}")
+
+    def _prune(self):
+        """보관 시간이 지난 완료 작업 제거"""
+        now = time.time()
+        expired = [job_id for job_id, job in self.jobs.items() if job.finished and now - job.finished_at > self.ttl]
+        for job_id in expired:
+            del self.jobs[job_id]
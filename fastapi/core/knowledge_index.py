@@ -0,0 +1,182 @@
+"""
+Q&A 검색용 배경 지식 인덱스 (오프라인 빌드 + 서버에서는 열기만)
+
+- 원본 텍스트를 부모 청크(500자) / 자식 청크(300자)로 분할
+- 자식 청크만 큰 배치로 임베딩해서 Chroma에 저장, 부모 청크는 디스크 docstore(LocalFileStore)에 저장
+- 청크 ID는 내용 해시라서 다시 빌드하면 새로 생기거나 바뀐 청크만 임베딩하고, 사라진 청크는 삭제
+
+실행 (fastapi 디렉터리에서):
+    python core/knowledge_index.py --source ../data/txt/wikidocs_01.txt ../data/txt/wikidocs_02.txt
+    python core/knowledge_index.py --rebuild          # 기존 인덱스를 지우고 처음부터
+"""
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from langchain.vectorstores import Chroma
+from langchain.storage import LocalFileStore, create_kv_docstore
+from langchain.retrievers import ParentDocumentRetriever
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from utils import hash_content
+from pathlib import Path
+from typing import List, Optional
+import argparse
+import shutil
+import json
+import time
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+KNOWLEDGE_INDEX_DIR = BASE_DIR / "../data/db/knowledge_index"
+KNOWLEDGE_COLLECTION = "knowledge"
+KNOWLEDGE_SOURCES = [
+    BASE_DIR / "../data/txt/wikidocs_01.txt",
+    BASE_DIR / "../data/txt/wikidocs_02.txt",
+    BASE_DIR / "../data/txt/wikidocs_03.txt",
+]
+EMBED_BATCH_SIZE = 512      # 한 번의 임베딩 요청에 넣을 자식 청크 수
+RETRIEVER_TOP_K = 5
+ID_KEY = "doc_id"           # 자식 청크 metadata에서 부모 청크 ID를 가리키는 키
+
+
+def make_parent_splitter():
+    return RecursiveCharacterTextSplitter(
+        chunk_size=500,
+        chunk_overlap=250,
+        separators=['==================================================', '---.*?---', '===.*?===']
+    )
+
+
+def make_child_splitter():
+    return RecursiveCharacterTextSplitter(
+        chunk_size=300,
+        chunk_overlap=100
+    )
+
+
+def _open_stores(embeddings, index_dir: Path):
+    index_dir = Path(index_dir)
+    index_dir.mkdir(parents=True, exist_ok=True)
+    vectorstore = Chroma(
+        collection_name=KNOWLEDGE_COLLECTION,
+        persist_directory=str(index_dir / "chroma"),
+        embedding_function=embeddings
+    )
+    docstore = create_kv_docstore(LocalFileStore(str(index_dir / "docstore")))
+    return vectorstore, docstore
+
+
+def split_sources(source_paths: List[Path]):
+    """원본 텍스트 → (부모 ID → 부모 Document, 자식 ID → 자식 Document)"""
+    parent_splitter = make_parent_splitter()
+    child_splitter = make_child_splitter()
+    parents, children = {}, {}
+    for path in source_paths:
+        path = Path(path)
+        if not path.exists():
+            print(f"⚠️ 원본 텍스트 없음 → {path}")
+            continue
+        text = path.read_text(encoding="utf-8")
+        for parent in parent_splitter.create_documents([text], metadatas=[{"source": path.name}]):
+            parent_id = hash_content(parent.page_content)
+            parents[parent_id] = parent
+            for child in child_splitter.split_documents([parent]):
+                child.metadata[ID_KEY] = parent_id
+                children[hash_content(parent_id, child.page_content)] = child
+    return parents, children
+
+
+def build_index(embeddings, source_paths: Optional[List[Path]] = None, index_dir: Path = KNOWLEDGE_INDEX_DIR,
+                batch_size: int = EMBED_BATCH_SIZE, rebuild: bool = False) -> dict:
+    """인덱스 생성/갱신 (내용 해시 기준 upsert) → 통계"""
+    start = time.perf_counter()
+    index_dir = Path(index_dir)
+    if rebuild and index_dir.exists():
+        shutil.rmtree(index_dir)
+    source_paths = [Path(path) for path in (source_paths or KNOWLEDGE_SOURCES)]
+    vectorstore, docstore = _open_stores(embeddings, index_dir)
+
+    parents, children = split_sources(source_paths)
+    existing_children = set(vectorstore.get(include=[])["ids"])
+    existing_parents = set(docstore.yield_keys())
+
+    # 1) 사라진(또는 내용이 바뀐) 청크 삭제
+    stale_children = list(existing_children - children.keys())
+    stale_parents = list(existing_parents - parents.keys())
+    if stale_children:
+        vectorstore.delete(ids=stale_children)
+    if stale_parents:
+        docstore.mdelete(stale_parents)
+
+    # 2) 새 부모 청크 저장
+    new_parents = [(parent_id, doc) for parent_id, doc in parents.items() if parent_id not in existing_parents]
+    if new_parents:
+        docstore.mset(new_parents)
+
+    # 3) 새 자식 청크만 배치 단위로 임베딩 후 저장
+    new_children = [(child_id, doc) for child_id, doc in children.items() if child_id not in existing_children]
+    for i in range(0, len(new_children), batch_size):
+        batch = new_children[i:i + batch_size]
+        vectorstore.add_texts(
+            texts=[doc.page_content for _, doc in batch],
+            metadatas=[doc.metadata for _, doc in batch],
+            ids=[child_id for child_id, _ in batch]
+        )
+        print(f"🧮 임베딩 {min(i + batch_size, len(new_children))}/{len(new_children)}")
+    if hasattr(vectorstore, "persist"):
+        vectorstore.persist()
+
+    stats = {
+        "sources": [str(path) for path in source_paths],
+        "parents": len(parents),
+        "children": len(children),
+        "embedded": len(new_children),
+        "deleted": len(stale_children),
+        "embedding_model": getattr(embeddings, "model", ""),
+        "built_at": time.time(),
+        "seconds": round(time.perf_counter() - start, 2),
+    }
+    with open(index_dir / "manifest.json", "w", encoding="utf-8") as f:
+        json.dump(stats, f, ensure_ascii=False, indent=2)
+    print(f"✅ 지식 인덱스 빌드 완료: {stats}")
+    return stats
+
+
+def open_knowledge_retriever(embeddings, index_dir: Path = KNOWLEDGE_INDEX_DIR, top_k: int = RETRIEVER_TOP_K):
+    """미리 만든 인덱스를 여는 ParentDocumentRetriever (분할/임베딩은 하지 않음)"""
+    index_dir = Path(index_dir)
+    if not (index_dir / "manifest.json").exists():
+        print(f"⚠️ 지식 인덱스가 없습니다 → {index_dir} (python core/knowledge_index.py 로 먼저 생성하세요)")
+    vectorstore, docstore = _open_stores(embeddings, index_dir)
+    return ParentDocumentRetriever(
+        vectorstore=vectorstore,
+        docstore=docstore,
+        child_splitter=make_child_splitter(),
+        parent_splitter=make_parent_splitter(),
+        id_key=ID_KEY,
+        search_kwargs={"k": top_k}
+    )
+
+
+def main():
+    from langchain.embeddings import OpenAIEmbeddings
+    from dotenv import load_dotenv
+    load_dotenv(BASE_DIR / "../.env")
+
+    parser = argparse.ArgumentParser(description="Q&A 배경 지식 인덱스 빌드")
+    parser.add_argument("--source", nargs="+", help="원본 텍스트 파일 (기본: data/txt/wikidocs_*.txt)")
+    parser.add_argument("--index-dir", default=str(KNOWLEDGE_INDEX_DIR))
+    parser.add_argument("--batch-size", type=int, default=EMBED_BATCH_SIZE)
+    parser.add_argument("--rebuild", action="store_true", help="기존 인덱스를 지우고 처음부터 빌드")
+    args = parser.parse_args()
+
+    build_index(
+        OpenAIEmbeddings(),
+        source_paths=args.source,
+        index_dir=Path(args.index_dir),
+        batch_size=args.batch_size,
+        rebuild=args.rebuild
+    )
+
+
+if __name__ == "__main__":
+    main()
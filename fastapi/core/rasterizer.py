@@ -0,0 +1,151 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from core.image_ops import optimize_image, image_pixel_stats, hash_content, extract_raw_image_bytes
+from concurrent.futures import ProcessPoolExecutor
+from collections import OrderedDict
+from pathlib import Path
+import multiprocessing
+import threading
+import hashlib
+import time
+import fitz
+
+RASTER_DIR = Path("../data/cache/raster_pdf")
+# 렌더링/인코딩 worker 프로세스 수 (프로세스마다 import 비용과 메모리가 들므로 코어 수와 무관하게 상한을 둠)
+RASTER_MAX_WORKERS = int(os.getenv("RASTER_MAX_WORKERS", str(min(4, os.cpu_count() or 1))))
+WORKER_MAX_DOCS = 4                        # worker 프로세스마다 열어 둘 PDF 수
+RASTER_MAX_AGE = 6 * 60 * 60               # close()되지 않고 남은 PDF 사본 보관 기간(초) (요청이 비정상 종료된 경우)
+
+# ---------------------------------------------------------------------------
+# worker 프로세스 측 함수 (pickle 가능하도록 모듈 최상위에 정의)
+# ---------------------------------------------------------------------------
+
+_worker_docs = OrderedDict()  # doc_id → fitz.Document (프로세스마다 문서를 한 번만 연다)
+
+
+def _get_doc(doc_id: str, pdf_path: str):
+    doc = _worker_docs.get(doc_id)
+    if doc is None:
+        with open(pdf_path, "rb") as f:
+            doc = fitz.open(stream=f.read(), filetype="pdf")
+        _worker_docs[doc_id] = doc
+        while len(_worker_docs) > WORKER_MAX_DOCS:
+            _, old_doc = _worker_docs.popitem(last=False)
+            old_doc.close()
+    else:
+        _worker_docs.move_to_end(doc_id)
+    return doc
+
+
+def _inspect_image(doc_id, pdf_path, xref, salt):
+    """이미지 내용 해시 + 픽셀 통계 (원본 바이트는 프로세스 밖으로 보내지 않음)"""
+    raw_bytes = extract_raw_image_bytes(_get_doc(doc_id, pdf_path), xref)
+    stats = image_pixel_stats(raw_bytes)
+    stats["key"] = hash_content(raw_bytes, salt)
+    return stats
+
+
+def _encode_image(doc_id, pdf_path, xref, max_size, quality):
+    raw_bytes = extract_raw_image_bytes(_get_doc(doc_id, pdf_path), xref)
+    return optimize_image(raw_bytes, max_size=max_size, quality=quality)
+
+
+def _render_page(doc_id, pdf_path, page_idx, zoom, max_size):
+    page = _get_doc(doc_id, pdf_path).load_page(page_idx)
+    pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom))
+    page_bytes = pix.tobytes("png")
+    if max_size:
+        return optimize_image(page_bytes, max_size=max_size)
+    return page_bytes, (pix.width, pix.height)
+
+# ---------------------------------------------------------------------------
+# 호출 측 API
+# ---------------------------------------------------------------------------
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_raster_executor() -> ProcessPoolExecutor:
+    """모든 문서가 공유하는 프로세스 풀 (첫 사용 시 생성)"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # uvicorn 프로세스는 여러 thread를 쓰므로 fork 대신 spawn (fork 시점에 잡힌 lock이 자식에 복사되는 문제 방지)
+            _executor = ProcessPoolExecutor(max_workers=RASTER_MAX_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+            print(f"[RASTER] 프로세스 풀 시작 ({RASTER_MAX_WORKERS} workers)")
+    return _executor
+
+
+_files_lock = threading.Lock()
+_file_refs = {}   # doc_id → 이 PDF 사본을 사용 중인 RasterService 수
+
+
+def _gc_raster_dir():
+    """사용 중이 아닌 오래된 PDF 사본 삭제 (_files_lock 안에서 호출)"""
+    cutoff = time.time() - RASTER_MAX_AGE
+    for path in RASTER_DIR.glob("*.pdf"):
+        try:
+            if path.stem not in _file_refs and path.stat().st_mtime < cutoff:
+                path.unlink()
+        except FileNotFoundError:
+            pass
+
+
+class RasterService:
+    """
+    PDF 한 개에 대한 렌더링/이미지 인코딩 작업을 프로세스 풀에 제출
+    - worker가 경로로 문서를 열 수 있도록 임시 사본을 저장하고, 마지막 사용자가 close()하면 삭제
+    """
+    def __init__(self, pdf_bytes: bytes):
+        self.doc_id = hashlib.sha256(pdf_bytes).hexdigest()
+        # 내용 해시 이름으로 저장 (같은 이름의 업로드끼리 덮어쓰지 않고, 같은 PDF의 동시 요청은 사본 하나를 공유)
+        RASTER_DIR.mkdir(parents=True, exist_ok=True)
+        self.pdf_path = str((RASTER_DIR / f"{self.doc_id}.pdf").resolve())
+        with _files_lock:
+            _gc_raster_dir()
+            if not os.path.exists(self.pdf_path):
+                tmp_path = f"{self.pdf_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+                with open(tmp_path, "wb") as f:
+                    f.write(pdf_bytes)
+                os.replace(tmp_path, self.pdf_path)
+            _file_refs[self.doc_id] = _file_refs.get(self.doc_id, 0) + 1
+        self._closed = False
+        self.executor = get_raster_executor()
+
+    def close(self):
+        """요청이 끝나면 호출 (이 PDF를 쓰는 다른 요청이 없으면 사본 삭제)"""
+        if self._closed:
+            return
+        self._closed = True
+        with _files_lock:
+            _file_refs[self.doc_id] -= 1
+            if _file_refs[self.doc_id] == 0:
+                del _file_refs[self.doc_id]
+                Path(self.pdf_path).unlink(missing_ok=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def submit_inspect_image(self, xref, salt=""):
+        """→ Future[{"key", "width", "height", "stddev"}]"""
+        return self.executor.submit(_inspect_image, self.doc_id, self.pdf_path, xref, salt)
+
+    def encode_image(self, xref, max_size: int = 800, quality: int = 50):
+        """→ (JPEG bytes, (width, height))"""
+        return self.executor.submit(_encode_image, self.doc_id, self.pdf_path, xref, max_size, quality).result()
+
+    def render_pages(self, zoom: float = 2, max_size=None):
+        """모든 페이지를 병렬 렌더링 → [(PNG/JPEG bytes, (width, height)), ...] (페이지 순서)"""
+        with fitz.open(self.pdf_path) as doc:
+            page_count = len(doc)
+        futures = [
+            self.executor.submit(_render_page, self.doc_id, self.pdf_path, page_idx, zoom, max_size)
+            for page_idx in range(page_count)
+        ]
+        return [future.result() for future in futures]
@@ -0,0 +1,56 @@
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+
+class LazyRegistry:
+    """
+    이름 → 생성 함수 등록 후, 처음 사용할 때 한 번만 생성하는 지연 로딩 레지스트리
+    - 이름마다 lock을 따로 두어 서로 다른 모델은 동시에 생성 가능 (같은 모델은 한 번만 생성)
+    - 생성에 실패하면 저장하지 않으므로 다음 호출에서 다시 시도
+    """
+    def __init__(self, label: str = "REGISTRY"):
+        self.label = label
+        self._factories: Dict[str, Callable[[], Any]] = {}
+        self._instances: Dict[str, Any] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self.load_times: Dict[str, float] = {}
+
+    def register(self, name: str, factory: Callable[[], Any]):
+        self._factories[name] = factory
+        self._locks[name] = threading.Lock()
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._factories
+
+    def get(self, name: str) -> Any:
+        if name in self._instances:
+            return self._instances[name]
+        if name not in self._factories:
+            raise KeyError(f"등록되지 않은 모델입니다: {name}")
+        with self._locks[name]:
+            if name not in self._instances:
+                start = time.perf_counter()
+                instance = self._factories[name]()
+                self.load_times[name] = time.perf_counter() - start
+                self._instances[name] = instance
+                print(f"[{self.label}] {name} 로드 완료 ({self.load_times[name]:.2f}초)")
+        return self._instances[name]
+
+    def warmup(self, names: Optional[List[str]] = None) -> dict:
+        """지정한(없으면 전체) 모델을 미리 생성 → {"loaded": {이름: 초}, "failed": {이름: 오류}}"""
+        loaded, failed = {}, {}
+        for name in names or list(self._factories):
+            try:
+                self.get(name)
+                loaded[name] = round(self.load_times.get(name, 0.0), 3)
+            except Exception as e:
+                failed[name] = str(e)
+                print(f"[{self.label}] {name} 로드 실패: {e}")
+        return {"loaded": loaded, "failed": failed}
+
+    def status(self) -> dict:
+        return {
+            name: {"loaded": name in self._instances, "load_seconds": round(self.load_times[name], 3) if name in self.load_times else None}
+            for name in self._factories
+        }
@@ -2,9 +2,18 @@ import sys
 import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from utils import preprocess_text, convert_image_to_base64, extract_image_bytes, extract_page_bytes, calculate_image_ratio, preprocess_script
+from utils import preprocess_text, convert_image_to_base64, calculate_placement_ratio, preprocess_script, hash_content
 from fastapi import UploadFile
-from models import VISION_LLM, PAGE_SCRIPT_LLM
+from models import get_model, ImageCategory
+from core.cache import PersistentLRUCache, CACHE_DIR
+from core.token_budget import TokenBudget, count_tokens
+from core.rasterizer import RasterService
+from core.jobs import cancelling_executor
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from collections import deque
+import threading
+import time
+import re
 import fitz
 from pathlib import Path
 import io
@@ -12,44 +21,311 @@ import io
 PDF_DIR = Path("../data/pdf_temp")
 TEXT_DIR = Path("../data/text_temp")
 
+VISION_MAX_WORKERS = 8    # 동시에 실행할 이미지 설명(Vision) 호출 수
+VISION_TIMEOUT = 60       # Vision 호출 1건당 제한 시간(초, 풀에서 실제로 시작한 시점부터) - 클라이언트 timeout은 models.vision_model_params
+VISION_QUEUE_POLL = 0.5   # 호출이 아직 풀에서 대기 중일 때 시작 여부를 다시 확인하는 간격(초)
+PIPELINE_DEPTH = 4        # 대본 생성 중인 페이지보다 앞서 준비할 페이지 수
+
+# 대본 생성 모드: "sequential"은 요약 메모리로 한 페이지씩, "outline"은 덱 개요 기반 병렬 생성
+GENERATION_MODES = ("sequential", "outline")
+# outline 모드의 개요 생성 방식: "llm"은 전체 텍스트 1회 요약, "local"은 슬라이드별 첫 문장 (LLM 호출 없음)
+OUTLINE_SOURCES = ("llm", "local")
+SCRIPT_MAX_WORKERS = 8    # outline 모드에서 동시에 생성할 페이지 대본 수
+OUTLINE_LINE_LENGTH = 80  # local 개요에서 슬라이드별 최대 글자 수
+
+# 대본 프롬프트 구성요소 우선순위 (토큰 예산 초과 시 뒤쪽부터 잘라냄)
+SCRIPT_PROMPT_PRIORITY = ["text", "image_description", "previous_summary", "full_doc"]
+
+# Vision 호출 전 이미지 사전 필터 기준
+MIN_IMAGE_AREA_RATIO = 0.01   # 페이지 면적 대비 배치 면적이 이보다 작으면 제외
+MIN_IMAGE_PIXELS = 48 * 48    # 원본 해상도가 이보다 작으면 아이콘으로 보고 제외
+MIN_PIXEL_STDDEV = 6.0        # 축소 이미지 밝기 표준편차가 이보다 작으면 단색 배경으로 보고 제외
+
+# 이미지 설명 캐시: (디코딩된 이미지 바이트, Vision 프롬프트 버전) 해시 → ImageCategory
+IMAGE_CACHE = PersistentLRUCache(CACHE_DIR / "image_descriptions.db", max_entries=5000)
+
+# 페이지 결과 저장소: (페이지 텍스트 + 이미지 해시, full_document 해시, 대본 프롬프트 버전) 해시 → 대본 + 요약 메모리
+PAGE_STORE = PersistentLRUCache(CACHE_DIR / "page_scripts.db", max_entries=20000)
+
 class ScriptGenerator:
-    def __init__(self, pdf_file: UploadFile, full_document: str):
+    def __init__(
+        self,
+        pdf_file: UploadFile,
+        full_document: str,
+        vision_max_workers: int = VISION_MAX_WORKERS,
+        vision_timeout: float = VISION_TIMEOUT,
+        pipeline_depth: int = PIPELINE_DEPTH,
+        min_image_area_ratio: float = MIN_IMAGE_AREA_RATIO,
+        min_image_pixels: int = MIN_IMAGE_PIXELS,
+        min_pixel_stddev: float = MIN_PIXEL_STDDEV,
+        regenerate_neighbours: bool = False,
+        mode: str = "sequential",
+        outline_source: str = "llm",
+        script_max_workers: int = SCRIPT_MAX_WORKERS
+    ):
+        if mode not in GENERATION_MODES:
+            raise ValueError(f"지원하지 않는 생성 모드입니다: {mode} (지원: {', '.join(GENERATION_MODES)})")
+        if outline_source not in OUTLINE_SOURCES:
+            raise ValueError(f"지원하지 않는 개요 생성 방식입니다: {outline_source} (지원: {', '.join(OUTLINE_SOURCES)})")
+
         self.pdf_file = pdf_file
         self.full_document = full_document
         self.pdf_data = []
-        self.vision_llm = VISION_LLM
-        self.page_script_llm = PAGE_SCRIPT_LLM
+        self.vision_llm = get_model("VISION_LLM")
+        self.page_script_llm = get_model("PAGE_SCRIPT_LLM")
+        self.memory = None   # sequential 모드의 문서별 요약 메모리 (공유 모델의 memory를 쓰지 않아 여러 문서를 동시에 처리)
+        self.vision_max_workers = vision_max_workers
+        self.vision_timeout = vision_timeout
+        self.pipeline_depth = max(1, pipeline_depth)
+        self._doc_lock = threading.Lock()
+        self.image_cache = IMAGE_CACHE
+        self._vision_prompt_version = self.vision_llm.prompt_version
+        self._image_lock = threading.Lock()
+        self._inspect_futures = {}   # xref → 이미지 해시/통계 Future (문서 내 xref 중복 재사용)
+        self._image_jobs = {}        # 캐시 키 → (Future, [시작 시각]) (문서 내 동일 이미지 공유)
+        self._skipped_keys = set()
+        self.min_image_area_ratio = min_image_area_ratio
+        self.min_image_pixels = min_image_pixels
+        self.min_pixel_stddev = min_pixel_stddev
+        self.image_stats = {"images": 0, "vision_calls": 0, "skipped": 0, "cache_hits": 0}
+        self.page_store = PAGE_STORE
+        self._full_document_hash = hash_content(full_document)
+        self._script_prompt_version = self.page_script_llm.prompt_version
+        self.regenerate_neighbours = regenerate_neighbours
+        self.mode = mode
+        self.outline_source = outline_source
+        # 개요 모델은 outline 모드에서만 필요 (sequential 모드에서는 로드하지 않음)
+        self.outline_llm = get_model("OUTLINE_LLM") if mode == "outline" else None
+        self.script_max_workers = script_max_workers
+        self.page_stats = {"generated": 0, "reused": 0}
+        self._stats_lock = threading.Lock()
+        template_tokens = max(
+            count_tokens(self.page_script_llm._get_template(page_type))
+            for page_type in self.page_script_llm.prompt_paths
+        )
+        self.token_budget = TokenBudget(model=getattr(self.page_script_llm.llm, "model", ""), reserve=template_tokens)
         self.pdf_bytes = pdf_file.file.read()
         self.docs = fitz.open(stream=self.pdf_bytes, filetype="pdf")
+        self.raster = RasterService(self.pdf_bytes)
         print(f"[INIT] PDF 로드 완료 ({len(self.docs)} 페이지)")
 
     def process(self):
-        print("[PROCESS] 전체 PDF 처리 시작")
+        for _ in self.iter_pages():
+            pass
+        return self.pdf_data
+
+    def iter_pages(self):
+        """페이지별 결과({page, text, image_description, script})를 완성되는 즉시 순서대로 반환"""
+        print(f"[PROCESS] 전체 PDF 처리 시작 (mode: {self.mode})")
         self._save_data()
+
+        try:
+            if self.mode == "outline":
+                yield from self._iter_pages_outline()
+            else:
+                yield from self._iter_pages_sequential()
+        finally:
+            self.close()  # 중간에 취소/오류가 나도 렌더링용 PDF 사본 정리
+
+        saved = self.image_stats["skipped"]
+        print(f"[IMAGE] 이미지 {self.image_stats['images']}개 중 Vision 호출 {self.image_stats['vision_calls']}회 "
+              f"(사전 필터로 {saved}회, 캐시로 {self.image_stats['cache_hits']}회 절약)")
+        print(f"[PAGE] 대본 생성 {self.page_stats['generated']}페이지, 저장된 대본 재사용 {self.page_stats['reused']}페이지")
+        print(f"[TOKEN] {self.token_budget.summary()}")
+        print("[PROCESS] 전체 완료")
+
+    def close(self):
+        self.raster.close()
+
+    def _iter_pages_sequential(self):
         total_pages = len(self.docs)
 
-        for page_idx, page in enumerate(self.docs):
-            text = preprocess_text(page.get_text())
-            print(f"[TEXT] {text}")
-            image_description = self._image_process(page, text)
-            script = self.generate_script(page_idx, text, image_description, total_pages)
-            script = script.replace("**", "")
-            print(f"[{page_idx + 1} PAGE 원본 대본] {script}")
-            # if page_idx > 0 and page_idx < total_pages - 1:
-            #     script = preprocess_script(script)
-            #     print(f"[{page_idx + 1} PAGE 수정 대본] {script}")
-
-            self.pdf_data.append({
-                "page": page_idx + 1,
+        # 페이지 준비(텍스트 추출 + 이미지 설명)는 worker thread에서 최대 pipeline_depth 페이지만큼 앞서 진행하고,
+        # 대본 생성은 요약 메모리 순서를 지키기 위해 현재 thread에서 순차적으로 진행한다
+        with cancelling_executor(self.vision_max_workers) as vision_executor, \
+                cancelling_executor(self.pipeline_depth + 1) as page_executor:
+            pending = deque()
+            next_idx = 0
+            self.memory = self.page_script_llm.new_memory()
+
+            previous_changed = False
+            # 요약 메모리는 (앞 페이지들의 키 + 대본) 체인 해시로 저장 → 앞쪽 페이지가 하나라도 바뀌면 다른 키가 되어
+            # 바뀌기 전 내용을 요약한 메모리를 복원하지 않음
+            memory_chain = self._full_document_hash
+            for page_idx in range(total_pages):
+                while next_idx < total_pages and next_idx <= page_idx + self.pipeline_depth:
+                    key_future = Future()
+                    pending.append((page_executor.submit(self._prepare_page, next_idx, vision_executor, key_future), key_future))
+                    next_idx += 1
+
+                result_future, _ = pending.popleft()
+                text, image_description, page_key = result_future.result()
+                print(f"[TEXT] {text}")
+
+                cached = self.page_store.get(page_key)
+                changed = cached is None
+                if not changed and self.regenerate_neighbours:
+                    # 바로 앞/뒤 페이지가 바뀌었으면 문맥 연결을 위해 함께 재생성
+                    # (다음 페이지는 키만 기다림 - 텍스트 추출 + 이미지 해시까지, Vision 호출은 기다리지 않음)
+                    next_changed = bool(pending) and self.page_store.get(pending[0][1].result()) is None
+                    if previous_changed or next_changed:
+                        cached = None
+
+                if cached is not None:
+                    # 변경되지 않은 페이지: 저장된 대본 사용 + 다음 페이지를 위해 요약 메모리 복원/갱신
+                    script = cached["script"]
+                    memory_chain = hash_content("memory", memory_chain, page_key, script)
+                    stored_memory = self.page_store.get(memory_chain)
+                    if stored_memory is not None:
+                        self.memory.buffer = stored_memory["memory"]
+                    else:
+                        # 앞쪽 페이지가 바뀐 뒤 처음 실행: 요약만 다시 만들고 다음 실행부터는 복원
+                        self.page_script_llm.remember(page_idx + 1, text, script, self.memory)
+                        self.page_store.set(memory_chain, {"memory": self.memory.buffer})
+                    self.page_stats["reused"] += 1
+                    print(f"[{page_idx + 1} PAGE] 변경 없음 → 저장된 대본 사용")
+                else:
+                    script = self.generate_script(page_idx, text, image_description, total_pages)
+                    script = script.replace("**", "")
+                    self.page_store.set(page_key, {"script": script})
+                    memory_chain = hash_content("memory", memory_chain, page_key, script)
+                    self.page_store.set(memory_chain, {"memory": self.memory.buffer})
+                    self.page_stats["generated"] += 1
+                print(f"[{page_idx + 1} PAGE 원본 대본] {script}")
+                previous_changed = changed
+                # if page_idx > 0 and page_idx < total_pages - 1:
+                #     script = preprocess_script(script)
+                #     print(f"[{page_idx + 1} PAGE 수정 대본] {script}")
+
+                yield self._add_record(page_idx, text, image_description, script)
+
+                # print(f"[{page_idx + 1} PAGE] {script}")
+
+    def _iter_pages_outline(self):
+        """개요 우선 모드: 덱 개요 + 앞뒤 슬라이드 텍스트를 문맥으로 모든 페이지 대본을 병렬 생성"""
+        total_pages = len(self.docs)
+
+        with cancelling_executor(self.vision_max_workers) as vision_executor, \
+                cancelling_executor(self.pipeline_depth + 1) as page_executor:
+            prepared = list(page_executor.map(
+                lambda page_idx: self._prepare_page(page_idx, vision_executor),
+                range(total_pages)
+            ))
+
+        texts = [text for text, _, _ in prepared]
+        outline = self.build_outline(texts)
+        print(f"[OUTLINE] {outline}")
+
+        with cancelling_executor(self.script_max_workers) as script_executor:
+            futures = []
+            for page_idx, (text, image_description, page_key) in enumerate(prepared):
+                previous_text = texts[page_idx - 1] if page_idx > 0 else ""
+                next_text = texts[page_idx + 1] if page_idx < total_pages - 1 else ""
+                context = (
+                    f"발표 개요:\n{outline}\n"
+                    f"이전 슬라이드 텍스트: {previous_text}\n"
+                    f"다음 슬라이드 텍스트: {next_text}"
+                )
+                script_key = hash_content(page_key, "outline", outline, previous_text, next_text)
+                futures.append(script_executor.submit(
+                    self._generate_outline_script, page_idx, text, image_description, context, script_key, total_pages
+                ))
+
+            # 완료 순서와 관계없이 페이지 순서대로 반환
+            for page_idx, future in enumerate(futures):
+                text, image_description, _ = prepared[page_idx]
+                script = future.result()
+                print(f"[{page_idx + 1} PAGE 원본 대본] {script}")
+                yield self._add_record(page_idx, text, image_description, script)
+
+    def build_outline(self, texts):
+        """덱 개요 생성 (outline_source: "llm"은 전체 텍스트 1회 요약, "local"은 슬라이드별 첫 문장)"""
+        if self.outline_source == "local":
+            lines = []
+            for page_idx, text in enumerate(texts):
+                first_sentence = re.split(r'(?<=[.!?])\s', text.strip(), maxsplit=1)[0]
+                lines.append(f"[{page_idx + 1}] {first_sentence[:OUTLINE_LINE_LENGTH]}")
+            return "\n".join(lines)
+
+        outline_key = hash_content("outline", self._full_document_hash, self.outline_llm.prompt_version, *texts)
+        cached = self.page_store.get(outline_key)
+        if cached is not None:
+            return cached["outline"]
+
+        pages = "\n".join(f"[{page_idx + 1}] {text}" for page_idx, text in enumerate(texts))
+        outline = self.outline_llm.invoke({"full_doc": self.full_document, "pages": pages}).strip()
+        self.page_store.set(outline_key, {"outline": outline})
+        return outline
+
+    def _generate_outline_script(self, page_idx, text, image_description, context, page_key, total_pages):
+        cached = self.page_store.get(page_key)
+        if cached is not None:
+            with self._stats_lock:
+                self.page_stats["reused"] += 1
+            return cached["script"]
+
+        inputs = {
+            "page": page_idx + 1,
+            "total_pages": total_pages,
+            **self._fit_prompt_inputs(page_idx, text, image_description, context)
+        }
+        script = self.page_script_llm.invoke_stateless(inputs).replace("**", "")
+        self.page_store.set(page_key, {"script": script})
+        with self._stats_lock:
+            self.page_stats["generated"] += 1
+        return script
+
+    def _fit_prompt_inputs(self, page_idx, text, image_description, previous_summary):
+        """현재 슬라이드 텍스트를 우선으로 프롬프트 구성요소를 모델 토큰 예산에 맞춤"""
+        return self.token_budget.fit(
+            {
                 "text": text,
                 "image_description": image_description,
-                "script": script
-            })
+                "previous_summary": previous_summary,
+                "full_doc": self.full_document,
+            },
+            priority=SCRIPT_PROMPT_PRIORITY,
+            label=f"{page_idx + 1} PAGE"
+        )
 
-            # print(f"[{page_idx + 1} PAGE] {script}")
+    def _add_record(self, page_idx, text, image_description, script):
+        record = {
+            "page": page_idx + 1,
+            "text": text,
+            "image_description": image_description,
+            "script": script
+        }
+        self.pdf_data.append(record)
+        return record
 
-        print("[PROCESS] 전체 완료")
-        return self.pdf_data
+    def _prepare_page(self, page_idx, vision_executor, key_future: Future = None):
+        """
+        페이지 텍스트 추출 및 이미지 설명 (worker thread에서 실행)
+        - key_future가 있으면 이미지 설명을 기다리기 전에 페이지 키부터 알려줌 (이웃 페이지 변경 판단용)
+        """
+        try:
+            # fitz.Document는 thread-safe하지 않으므로 문서 접근은 lock 안에서만 수행
+            with self._doc_lock:
+                page = self.docs.load_page(page_idx)
+                text = preprocess_text(page.get_text())
+                # 페이지 렌더링 없이 배치 영역(rect)으로 면적 비율 계산
+                placements = [
+                    (img[0], calculate_placement_ratio(page.get_image_rects(img[0]), page.rect))
+                    for img in page.get_images(full=True)
+                ]
+
+            jobs, image_keys = self._submit_image_jobs(vision_executor, placements, text)
+            page_type = self.page_script_llm.get_page_type(page_idx + 1, len(self.docs))
+            page_key = hash_content(text, *image_keys, page_type, self._full_document_hash, self._script_prompt_version)
+        except Exception as e:
+            if key_future is not None:
+                key_future.set_exception(e)
+            raise
+        if key_future is not None:
+            key_future.set_result(page_key)
+
+        image_description = self._image_process(jobs)
+        return text, image_description, page_key
 
     def _save_data(self):
         PDF_DIR.mkdir(parents=True, exist_ok=True)
@@ -67,21 +343,95 @@ class ScriptGenerator:
 
         print("[SAVE] 파일 저장 완료")
 
-    def _image_process(self, page, text):
-        images = page.get_images(full=True)
-        page_bytes, page_size = extract_page_bytes(page)
+    def _submit_image_jobs(self, executor, placements, text):
+        """페이지의 이미지를 사전 필터링한 뒤 Vision 호출을 executor에 제출"""
+        jobs = []
+        image_keys = []
+        for xref, image_ratio in placements:
+            self._count("images")
 
-        image_description = []
+            # 1) 배치 면적이 작은 이미지는 디코딩 전에 제외
+            if image_ratio < self.min_image_area_ratio:
+                self._count("skipped")
+                continue
 
-        for img in images:
-            xref = img[0]
-            img_bytes, img_size = extract_image_bytes(self.docs, xref)
-            image_ratio = calculate_image_ratio(img_size, page_size)
+            # 디코딩/해시/픽셀 통계는 프로세스 풀에서 계산 (같은 xref는 한 번만)
+            with self._image_lock:
+                inspect_future = self._inspect_futures.get(xref)
+                if inspect_future is None:
+                    inspect_future = self.raster.submit_inspect_image(xref, salt=self._vision_prompt_version)
+                    self._inspect_futures[xref] = inspect_future
+            info = inspect_future.result()
+            key = info["key"]
+            image_keys.append(key)
 
-            response = self.vision_llm.invoke({
-                "text": text,
-                "image_base64": convert_image_to_base64(img_bytes),
-            })
+            with self._image_lock:
+                if key in self._skipped_keys:
+                    self._count("skipped")
+                    continue
+
+                job = self._image_jobs.get(key)
+                if job is None:
+                    cached = self.image_cache.get(key)
+                    if cached is not None:
+                        self._count("cache_hits")
+                        future = Future()
+                        future.set_result(ImageCategory(**cached["category"]))
+                        started = [time.monotonic()]
+                    else:
+                        # 2) 축소 이미지의 픽셀 통계로 아이콘/장식 이미지 제거
+                        if self._is_decorative(info):
+                            self._skipped_keys.add(key)
+                            self._count("skipped")
+                            continue
+                        self._count("vision_calls")
+                        # 제한 시간은 제출 시점이 아니라 worker가 호출을 시작한 시점부터 계산 (큰 문서에서 풀 대기 시간 제외)
+                        started = [None]
+                        future = executor.submit(self._describe_image, key, xref, text, started)
+                    job = (future, started)
+                    self._image_jobs[key] = job
+                else:
+                    self._count("cache_hits")
+                    print("[IMAGE] 중복 이미지 → 기존 설명 재사용")
+
+            jobs.append((*job, image_ratio))
+        return jobs, image_keys
+
+    def _count(self, name):
+        with self._stats_lock:
+            self.image_stats[name] += 1
+
+    def _is_decorative(self, stats):
+        """작은 아이콘이나 단색에 가까운 배경/장식 이미지 여부"""
+        return (
+            stats["width"] * stats["height"] < self.min_image_pixels
+            or stats["stddev"] < self.min_pixel_stddev
+        )
+
+    def _describe_image(self, key, xref, text, started):
+        """이미지 인코딩(프로세스 풀) + Vision 호출 후 결과를 캐시에 저장 (started[0]에 시작 시각 기록)"""
+        started[0] = time.monotonic()
+        img_bytes, img_size = self.raster.encode_image(xref)
+        response = self.vision_llm.invoke({
+            "text": text,
+            "image_base64": convert_image_to_base64(img_bytes),
+        })
+        self.image_cache.set(key, {"category": response.model_dump()})
+        return response
+
+    def _image_process(self, jobs):
+        image_description = []
+
+        for future, started, image_ratio in jobs:
+            try:
+                response = self._wait_for_description(future, started)
+            except FutureTimeoutError:
+                # 같은 이미지를 쓰는 다른 페이지도 이 Future를 기다리므로 취소하지 않음 (호출은 클라이언트 timeout으로 끝남)
+                print(f"[IMAGE] 이미지 설명 시간 초과 ({self.vision_timeout}s)")
+                continue
+            except Exception as e:
+                print(f"[IMAGE] 이미지 설명 실패: {e}")
+                continue
 
             if response.is_chart or image_ratio > 0.5:
                 image_description.append(response.description)
@@ -89,21 +439,35 @@ class ScriptGenerator:
         print(f"[IMAGE] {len(image_description)}개 중요한 이미지 감지됨")
         return ", ".join(image_description) if image_description else ""
 
+    def _wait_for_description(self, future, started):
+        """호출이 시작된 뒤 vision_timeout까지만 기다림 (풀에서 차례를 기다리는 동안은 제한 시간에 포함하지 않음)"""
+        while not future.done():
+            if started[0] is None:
+                wait = VISION_QUEUE_POLL
+            else:
+                wait = started[0] + self.vision_timeout - time.monotonic()
+                if wait <= 0:
+                    raise FutureTimeoutError()
+            try:
+                return future.result(timeout=wait)
+            except FutureTimeoutError:
+                continue
+        return future.result()
+
     def generate_script(self, page_idx, text, image_description, total_pages):
-        memory_variables = self.page_script_llm.memory.load_memory_variables(inputs={})
+        memory_variables = self.memory.load_memory_variables(inputs={})
         previous_summary = memory_variables.get("history", "")
+        if isinstance(previous_summary, list):  # return_messages=True이면 메시지 목록으로 반환됨
+            previous_summary = "\n".join(message.content for message in previous_summary)
 
         inputs = {
             "page": page_idx + 1,
             "total_pages": total_pages,
-            "text": text,
-            "image_description": image_description,
-            "full_doc": self.full_document,
-            "previous_summary": previous_summary
+            **self._fit_prompt_inputs(page_idx, text, image_description, previous_summary)
         }
 
         # print(f"[SCRIPT] 페이지 {page_idx + 1} 대본 생성")
-        return self.page_script_llm.invoke(inputs)
+        return self.page_script_llm.invoke(inputs, self.memory)
     
 
 # if __name__ == "__main__":
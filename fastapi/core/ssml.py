@@ -0,0 +1,77 @@
+import re
+from typing import Iterable, List, Optional
+
+TOKEN_SPLIT = re.compile(r"(\W+)")      # 단어 / 구분자(공백, 구두점) 교대로 분리
+PHRASE_WORD = re.compile(r"\w+")
+ACRONYM = re.compile(r"[A-Z]{2,}")      # 철자 읽기 대상 대문자 단어 (예: API, HTML)
+
+SPELL_SSML = '<say-as interpret-as="characters">{}</say-as>'
+EMPHASIS_SSML = (
+    '<break time="300ms"/><prosody pitch="+15%" rate="-5%" volume="+3dB">'
+    '<emphasis level="moderate">{}</emphasis></prosody>'
+)
+
+_END = object()   # trie 노드에서 구문 끝 표시
+
+
+class PhraseMatcher:
+    """
+    강조 키워드(여러 단어 구문 포함)를 단어 단위 trie로 컴파일
+    - 요청마다 한 번 만들고, 대본 토큰을 한 번 훑으면서 위치마다 가장 긴 구문을 찾음
+    """
+    def __init__(self, phrases: Iterable[str]):
+        self.root = {}
+        self.size = 0
+        for phrase in phrases:
+            words = PHRASE_WORD.findall(phrase)
+            if not words:
+                continue
+            node = self.root
+            for word in words:
+                node = node.setdefault(word, {})
+            if _END not in node:
+                node[_END] = True
+                self.size += 1
+
+    def match(self, tokens: List[str], start: int) -> Optional[int]:
+        """
+        tokens[start]에서 시작하는 가장 긴 구문의 끝 위치(미포함) 반환, 없으면 None
+        (tokens는 TOKEN_SPLIT 결과: 짝수 위치는 단어, 홀수 위치는 구분자 / 구문 안의 구분자는 공백만 허용)
+        """
+        node = self.root
+        best = None
+        pos = start
+        while pos < len(tokens):
+            node = node.get(tokens[pos])
+            if node is None:
+                break
+            if _END in node:
+                best = pos + 1
+            if pos + 1 >= len(tokens) or not tokens[pos + 1].isspace():
+                break
+            pos += 2
+        return best
+
+
+def build_ssml(text: str, matcher: PhraseMatcher) -> str:
+    """대본 → SSML (강조 구문과 대문자 약어를 한 번의 순회로 변환, 결과는 한 번에 join)"""
+    tokens = TOKEN_SPLIT.split(text)
+    parts = []
+    pos = 0
+    while pos < len(tokens):
+        token = tokens[pos]
+        if pos % 2 == 0 and token:
+            end = matcher.match(tokens, pos)
+            is_acronym = ACRONYM.fullmatch(token) is not None
+            # 한 단어짜리는 기존처럼 약어 철자 읽기가 강조보다 우선
+            if end is not None and (end - pos > 1 or not is_acronym):
+                parts.append(EMPHASIS_SSML.format("".join(tokens[pos:end])))
+                pos = end
+                continue
+            if is_acronym:
+                parts.append(SPELL_SSML.format(token))
+                pos += 1
+                continue
+        parts.append(token)
+        pos += 1
+    return f"<speak>{''.join(parts).strip()}</speak>"
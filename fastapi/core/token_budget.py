@@ -0,0 +1,117 @@
+import math
+import threading
+from typing import Dict, List, Optional
+
+try:
+    import tiktoken
+except ImportError:  # tiktoken이 없으면 바이트 길이 기반 추정치 사용
+    tiktoken = None
+
+# 모델별 프롬프트 입력 토큰 예산 (응답 토큰 제외)
+TOKEN_BUDGETS = {
+    "gemini-2.0-flash": 8000,
+    "gpt-4o": 8000,
+    "gpt-4o-mini": 6000,
+}
+DEFAULT_TOKEN_BUDGET = 6000
+TRUNCATION_MARK = " …"
+
+
+def _encoding():
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        return None
+
+
+_ENCODING = _encoding()
+
+
+def count_tokens(text: str) -> int:
+    """토큰 수 계산 (tiktoken cl100k 기준, 없으면 UTF-8 3바이트당 1토큰으로 추정)"""
+    if not text:
+        return 0
+    if _ENCODING is not None:
+        return len(_ENCODING.encode(text))
+    return math.ceil(len(text.encode("utf-8")) / 3)
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """앞부분을 유지하며 max_tokens 이내로 자르기"""
+    if max_tokens <= 0 or not text:
+        return ""
+    if count_tokens(text) <= max_tokens:
+        return text
+    max_tokens -= count_tokens(TRUNCATION_MARK)
+    if max_tokens <= 0:
+        return ""
+    if _ENCODING is not None:
+        return _ENCODING.decode(_ENCODING.encode(text)[:max_tokens]) + TRUNCATION_MARK
+
+    # 추정 모드: 글자 수 비례로 자른 뒤 예산 안에 들어올 때까지 줄임
+    cut = int(len(text) * max_tokens / count_tokens(text))
+    while cut > 0 and count_tokens(text[:cut]) > max_tokens:
+        cut = int(cut * 0.9)
+    return text[:cut] + TRUNCATION_MARK
+
+
+def get_token_budget(model: str) -> int:
+    model = (model or "").split("/")[-1]  # "models/gemini-2.0-flash" → "gemini-2.0-flash"
+    return TOKEN_BUDGETS.get(model, DEFAULT_TOKEN_BUDGET)
+
+
+class TokenBudget:
+    """프롬프트 구성요소를 우선순위대로 예산 안에 배치하고 호출별 토큰 사용량을 기록"""
+    def __init__(self, model: str, budget: Optional[int] = None, reserve: int = 0):
+        self.model = model
+        self.budget = budget or get_token_budget(model)
+        self.reserve = reserve   # 템플릿 본문 등 구성요소 외 고정 토큰
+        self.usage: List[dict] = []
+        self._lock = threading.Lock()
+
+    def fit(self, components: Dict[str, str], priority: List[str], label: str = "") -> Dict[str, str]:
+        """
+        priority 앞쪽 구성요소부터 예산을 배정하고, 남는 예산이 없으면 뒤쪽 구성요소를 잘라냄
+        (priority에 없는 구성요소는 그대로 둠)
+        """
+        counts = {name: count_tokens(text) for name, text in components.items()}
+        remaining = self.budget - self.reserve - sum(
+            count for name, count in counts.items() if name not in priority
+        )
+
+        fitted = dict(components)
+        trimmed = {}
+        for name in priority:
+            if name not in components:
+                continue
+            allowed = max(remaining, 0)
+            if counts[name] > allowed:
+                fitted[name] = truncate_to_tokens(components[name], allowed)
+                trimmed[name] = counts[name] - count_tokens(fitted[name])
+            remaining -= count_tokens(fitted[name])
+
+        record = {
+            "label": label,
+            "model": self.model,
+            "budget": self.budget,
+            "components": {name: count_tokens(text) for name, text in fitted.items()},
+            "trimmed": trimmed,
+        }
+        record["total"] = sum(record["components"].values()) + self.reserve
+        with self._lock:
+            self.usage.append(record)
+        if trimmed:
+            print(f"[TOKEN] {label} 예산 {self.budget} 초과 → 잘라낸 토큰: {trimmed}")
+        return fitted
+
+    def summary(self) -> dict:
+        with self._lock:
+            return {
+                "model": self.model,
+                "budget": self.budget,
+                "calls": len(self.usage),
+                "prompt_tokens": sum(record["total"] for record in self.usage),
+                "trimmed_calls": sum(1 for record in self.usage if record["trimmed"]),
+            }
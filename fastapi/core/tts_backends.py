@@ -0,0 +1,230 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from abc import ABC, abstractmethod
+from concurrent.futures import as_completed, wait, FIRST_COMPLETED
+from core.jobs import cancelling_executor
+from google.api_core import exceptions as google_exceptions
+from utils import to_pcm16_wav
+import threading
+import random
+import html
+import json
+import time
+import re
+
+TTS_REQUESTS_PER_SECOND = 5.0   # 음성(voice)별 초당 최대 요청 수
+TTS_MAX_RETRIES = 4
+TTS_BACKOFF_BASE = 1.0          # 재시도 대기 시간 기준(초), 시도마다 2배
+GOOGLE_MAX_SSML_BYTES = 4800    # 요청당 SSML 최대 바이트 (Google TTS 제한 5000바이트에 여유를 둠)
+
+ZONOS_URL = os.getenv("ZONOS_GRADIO_URL", "http://localhost:7860")
+ZONOS_API_NAME = "/generate_audio"
+ZONOS_MAX_INFLIGHT = 4          # Gradio 큐에 동시에 넣어 둘 요청 수
+ZONOS_MAX_SSML_BYTES = 900      # Zonos는 한 번에 ~30초까지만 생성하므로 짧게 나눔
+ZONOS_TIMEOUT = 180             # 결과를 하나도 받지 못한 채 기다릴 최대 시간(초)
+
+# code/JS/zonos_client.py의 generate_audio 입력값 (text 자리는 None)
+ZONOS_PARAMS = [
+    "Zyphra/Zonos-v0.1-transformer",            # model_choice
+    None,                                       # text
+    "ko",                                       # language
+    None,                                       # speaker_audio
+    None,                                       # prefix_audio
+    1.0, 0.05, 0.05, 0.05, 0.05, 0.05, 0.1, 0.2,  # emotion sliders
+    0.78,                                       # vq_single
+    24000,                                      # fmax
+    45.0,                                       # pitch_std
+    15.0,                                       # speaking_rate
+    4.0,                                        # dnsmos
+    False,                                      # speaker_noised
+    2.0,                                        # cfg_scale
+    0,                                          # top_p
+    0,                                          # top_k
+    0,                                          # min_p
+    0.5, 0.4, 0.0,                              # linear, confidence, quadratic
+    42,                                         # seed
+    False,                                      # randomize_seed
+    ["emotion"],                                # unconditional_keys
+]
+ZONOS_TEXT_INDEX = 1
+
+RETRYABLE_TTS_ERRORS = (
+    google_exceptions.ResourceExhausted,
+    google_exceptions.TooManyRequests,
+    google_exceptions.ServiceUnavailable,
+    google_exceptions.DeadlineExceeded,
+)
+
+
+class RateLimiter:
+    """요청 간 최소 간격을 보장하는 단순 속도 제한기 (thread-safe)"""
+    def __init__(self, rate_per_second: float):
+        self.interval = 1.0 / rate_per_second
+        self._next_time = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            now = time.monotonic()
+            wait = self._next_time - now
+            self._next_time = max(now, self._next_time) + self.interval
+        if wait > 0:
+            time.sleep(wait)
+
+
+_rate_limiters = {}
+_rate_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(voice_name: str) -> RateLimiter:
+    """같은 음성을 쓰는 모든 요청이 하나의 속도 제한을 공유"""
+    with _rate_limiters_lock:
+        if voice_name not in _rate_limiters:
+            _rate_limiters[voice_name] = RateLimiter(TTS_REQUESTS_PER_SECOND)
+        return _rate_limiters[voice_name]
+
+
+class TTSBackend(ABC):
+    """
+    TTS 백엔드 공통 인터페이스
+    - 입력은 SSML 조각 (max_input_bytes 이하로 잘라서 전달됨)
+    - 출력은 encoding에 맞는 오디오 bytes (LINEAR16이면 16bit PCM WAV)
+    """
+    name = "base"
+    supported_encodings = ("LINEAR16",)
+    max_input_bytes = GOOGLE_MAX_SSML_BYTES
+
+    @abstractmethod
+    def config_signature(self, encoding: str) -> str:
+        """백엔드 + 음성 + 출력 설정 식별자 (오디오 캐시 키에 포함)"""
+
+    @abstractmethod
+    def synthesize(self, ssml: str, encoding: str) -> bytes:
+        """SSML 조각 하나 → 오디오 bytes"""
+
+    def iter_synthesize(self, inputs: list[str], encoding: str, max_workers: int):
+        """
+        여러 조각을 한 번에 요청 → 끝나는 순서대로 (index, 오디오 bytes 또는 예외) 생성
+        (호출 측이 중간에 멈추면(작업 취소 등) 대기 중인 조각은 요청하지 않음)
+        """
+        with cancelling_executor(max_workers) as executor:
+            futures = {executor.submit(self.synthesize, ssml, encoding): i for i, ssml in enumerate(inputs)}
+            for future in as_completed(futures):
+                error = future.exception()
+                yield futures[future], error if error is not None else future.result()
+
+
+class GoogleTTSBackend(TTSBackend):
+    """Google Cloud TTS (음성별 속도 제한 + 할당량/일시 오류 시 지수 백오프 재시도)"""
+    name = "google"
+    supported_encodings = ("LINEAR16", "MP3", "OGG_OPUS")
+    max_input_bytes = GOOGLE_MAX_SSML_BYTES
+
+    def __init__(self, tts_model):
+        self.tts_model = tts_model
+        self.rate_limiter = get_rate_limiter(tts_model.voice.name)
+
+    def config_signature(self, encoding: str) -> str:
+        return self.tts_model.config_signature(encoding)
+
+    def synthesize(self, ssml: str, encoding: str) -> bytes:
+        for attempt in range(TTS_MAX_RETRIES + 1):
+            self.rate_limiter.acquire()
+            try:
+                return self.tts_model._response(ssml, encoding).audio_content
+            except RETRYABLE_TTS_ERRORS as e:
+                if attempt == TTS_MAX_RETRIES:
+                    raise
+                delay = TTS_BACKOFF_BASE * (2 ** attempt) + random.uniform(0, TTS_BACKOFF_BASE)
+                print(f"⏳ TTS 할당량/일시 오류 → {delay:.1f}초 후 재시도 ({attempt + 1}/{TTS_MAX_RETRIES}): {e}")
+                time.sleep(delay)
+
+
+class ZonosTTSBackend(TTSBackend):
+    """
+    자체 호스팅 Zonos 모델 (Gradio 앱, code/JS/zonos_client.py 참고)
+    - gradio_client.Client는 프로세스에서 하나만 만들어 재사용
+    - 조각들을 Gradio 큐에 최대 ZONOS_MAX_INFLIGHT개씩 비동기로 제출(submit)하고 끝나는 대로 수거
+    - 결과 파일은 16bit PCM WAV로 변환 (Google LINEAR16과 같은 형식)
+    """
+    name = "zonos"
+    supported_encodings = ("LINEAR16",)
+    max_input_bytes = ZONOS_MAX_SSML_BYTES
+
+    _clients = {}
+    _clients_lock = threading.Lock()
+
+    def __init__(self, url: str = ZONOS_URL, params: list = None):
+        self.url = url
+        self.params = list(params or ZONOS_PARAMS)
+
+    @property
+    def client(self):
+        with self._clients_lock:
+            if self.url not in self._clients:
+                from gradio_client import Client  # 선택 의존성: Zonos 백엔드를 쓸 때만 필요
+                print(f"[ZONOS] Gradio 클라이언트 연결: {self.url}")
+                self._clients[self.url] = Client(self.url, verbose=False)
+            return self._clients[self.url]
+
+    def config_signature(self, encoding: str) -> str:
+        params = self.params[:ZONOS_TEXT_INDEX] + self.params[ZONOS_TEXT_INDEX + 1:]
+        return f"zonos|{self.url}|{json.dumps(params)}|{encoding}"
+
+    @staticmethod
+    def ssml_to_text(ssml: str) -> str:
+        """Zonos는 SSML을 지원하지 않으므로 태그를 지운 일반 텍스트로 변환"""
+        text = re.sub(r"<[^>]+>", " ", ssml)
+        return re.sub(r"\s+", " ", html.unescape(text)).strip()
+
+    def _submit(self, ssml: str):
+        params = list(self.params)
+        params[ZONOS_TEXT_INDEX] = self.ssml_to_text(ssml)
+        return self.client.submit(*params, api_name=ZONOS_API_NAME)
+
+    def _read_result(self, result) -> bytes:
+        audio_path = result[0] if isinstance(result, (list, tuple)) else result
+        with open(audio_path, "rb") as f:
+            return to_pcm16_wav(f.read())
+
+    def synthesize(self, ssml: str, encoding: str) -> bytes:
+        return self._read_result(self._submit(ssml).result(timeout=ZONOS_TIMEOUT))
+
+    def iter_synthesize(self, inputs: list[str], encoding: str, max_workers: int):
+        pending = list(enumerate(inputs))
+        running = {}
+        try:
+            while pending or running:
+                while pending and len(running) < ZONOS_MAX_INFLIGHT:
+                    index, ssml = pending.pop(0)
+                    running[self._submit(ssml)] = index
+                done, _ = wait(list(running), timeout=ZONOS_TIMEOUT, return_when=FIRST_COMPLETED)
+                if not done:
+                    # ZONOS_TIMEOUT 동안 하나도 끝나지 않으면 서버가 멈춘 것으로 보고 나머지를 모두 실패 처리
+                    error = TimeoutError(f"Zonos 응답 대기 시간({ZONOS_TIMEOUT}초)을 초과했습니다.")
+                    for job, index in list(running.items()):
+                        yield index, error
+                    for index, _ in pending:
+                        yield index, error
+                    return
+                for job in done:
+                    index = running.pop(job)
+                    try:
+                        yield index, self._read_result(job.result())
+                    except Exception as e:
+                        yield index, e
+        finally:
+            # 시간 초과 또는 호출 측 중단(작업 취소 등): Gradio 큐에 남은 요청 취소
+            for job in running:
+                job.cancel()
+
+
+def get_tts_backend(gender: str) -> TTSBackend:
+    """MAN → Google 남성, ZONOS → 자체 호스팅 Zonos, 그 외 → Google 여성 (기존 동작과 동일)"""
+    voice = (gender or "MAN").upper()
+    if voice == "ZONOS":
+        return ZonosTTSBackend()
+    from models import get_model  # Google TTS 클라이언트는 Google 백엔드를 처음 쓸 때 생성
+    return GoogleTTSBackend(get_model("MAN_TTS" if voice == "MAN" else "WOMAN_TTS"))
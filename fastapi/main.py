@@ -1,6 +1,11 @@
+import time
+_startup_begin = time.perf_counter()
+
 from fastapi import FastAPI
 from routes import router
+from models import MODEL_REGISTRY
 from fastapi.staticfiles import StaticFiles
+import threading
 import os
 
 app = FastAPI()
@@ -8,4 +13,18 @@ app.include_router(router)
 
 # 이미지 저장 경로
 STATIC_IMAGE_DIR = r"..\data\temp_images"
-app.mount("/static", StaticFiles(directory=STATIC_IMAGE_DIR), name="static")
\ No newline at end of file
+app.mount("/static", StaticFiles(directory=STATIC_IMAGE_DIR), name="static")
+
+# 모델은 첫 사용 시 로드 (WARMUP_MODELS="VISION_LLM,PAGE_SCRIPT_LLM" 또는 "all"이면 시작 후 백그라운드에서 미리 로드)
+WARMUP_MODELS = os.getenv("WARMUP_MODELS", "")
+
+app.state.startup_seconds = round(time.perf_counter() - _startup_begin, 3)
+print(f"🚀 서버 import 완료 ({app.state.startup_seconds:.3f}초)")
+
+
+@app.on_event("startup")
+async def warmup_models():
+    if not WARMUP_MODELS:
+        return
+    names = None if WARMUP_MODELS == "all" else [name.strip() for name in WARMUP_MODELS.split(",") if name.strip()]
+    threading.Thread(target=MODEL_REGISTRY.warmup, args=(names,), daemon=True, name="warmup").start()
@@ -1,29 +1,28 @@
 from langchain.memory import ConversationSummaryMemory
-from langchain.chains import ConversationChain
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.messages import HumanMessage
 from langchain_openai import ChatOpenAI
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.runnables.history import RunnableWithMessageHistory
+from langchain_core.runnables import RunnableLambda, RunnableParallel
 from langchain.memory.chat_message_histories import ChatMessageHistory
 from langchain_core.chat_history import BaseChatMessageHistory
 from pydantic import BaseModel, Field
 from pathlib import Path
-from typing import Optional, List
+from typing import Optional, List, AsyncIterator
 from langchain_core.output_parsers import PydanticOutputParser, StrOutputParser
 from dotenv import load_dotenv
 from langchain.vectorstores import Chroma
 from langchain.embeddings import OpenAIEmbeddings
 from google.cloud import texttospeech_v1 as tts
-from langchain.storage import InMemoryStore
-from langchain.retrievers import ParentDocumentRetriever
-from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain.tools.ddg_search import DuckDuckGoSearchRun
-from langchain.tools import Tool
 from langchain_core.documents import Document
 from langchain_core.prompts import ChatPromptTemplate
 from langchain.agents import initialize_agent, AgentType
+from core.registry import LazyRegistry
+from core.knowledge_index import open_knowledge_retriever, KNOWLEDGE_INDEX_DIR
 
+import hashlib
 import os
 
 load_dotenv("../.env")
@@ -56,14 +55,13 @@ gemini_params = {
     "retry_delay": 10,
     "cache": False
 }
-# tool 추가
-ddg_search = DuckDuckGoSearchRun()
-search_tool = Tool(
-    name="duckduckgo_search",
-    func=ddg_search.run,
-    description="사용자의 질문과 관련된 정보를 웹에서 검색할 수 있는 도구입니다."
-)
-
+# Vision 호출은 페이지 준비를 막지 않도록 클라이언트 자체 제한 시간/재시도를 짧게
+# (요청 20초 × 최대 2회 + 재시도 대기 10초 = 50초 < script_generate.VISION_TIMEOUT)
+vision_model_params = {
+    **gemini_params,
+    "request_timeout": 20,
+    "max_retries": 1,
+}
 class GPTModel():
     def __init__(self, prompt_path, output_parser, model_params, use_memory=False):
         self.prompt_path = prompt_path
@@ -76,9 +74,7 @@ class GPTModel():
     def _make_chain(self):
         if self.use_memory:
             self.memory = ConversationSummaryMemory(llm=self.llm, return_messages=True)
-            return ConversationChain(llm=self.llm, memory=self.memory)
-        else:
-            return self.llm | self.output_parser
+        return self.llm | self.output_parser
 
     def _get_template(self):
         prompt_abs_path = Path(__file__).parent / self.prompt_path
@@ -89,13 +85,15 @@ class GPTModel():
     def _set_prompt(self, **inputs):
         pass
 
+    @property
+    def prompt_version(self) -> str:
+        """프롬프트 템플릿 + 모델 이름 기반 버전 해시 (캐시 키에 사용)"""
+        content = self._get_template() + str(getattr(self.llm, "model", ""))
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()[:16]
+
     def invoke(self, inputs):
         prompt = self._set_prompt(inputs)
-        if self.use_memory:
-            response = self.chain.run(prompt)
-        else:
-            response = self.chain.invoke(prompt)
-        return response
+        return self.chain.invoke(prompt)
 
 class ImageDescriptAI(GPTModel):
     def __init__(self, prompt_path, output_parser, model_params, use_memory=False):
@@ -129,20 +127,60 @@ class PageScriptAI(GPTModel):
             template = f.read()
         return template
 
+    @staticmethod
+    def get_page_type(page_idx, total_pages):
+        if page_idx == 1:
+            return "head"
+        elif page_idx == total_pages:
+            return "end"
+        return "body"
+
+    @property
+    def prompt_version(self) -> str:
+        """head/body/end 템플릿 전체 + 모델 이름 기반 버전 해시"""
+        content = "".join(self._get_template(page_type) for page_type in sorted(self.prompt_paths))
+        content += str(getattr(self.llm, "model", ""))
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()[:16]
+
     def _set_prompt(self, inputs):
         page_idx = inputs.get("page", 1)
         total_pages = inputs.get("total_pages", 1)
-
-        if page_idx == 1:
-            page_type = "head"
-        elif page_idx == total_pages:
-            page_type = "end"
-        else:
-            page_type = "body"
+        page_type = self.get_page_type(page_idx, total_pages)
 
         prompt = self._get_template(page_type).format(**inputs)
         return prompt
 
+    def new_memory(self) -> ConversationSummaryMemory:
+        """문서별 요약 메모리 (모델 인스턴스는 공유하므로 문서마다 따로 만들어 동시에 여러 문서를 처리)"""
+        return ConversationSummaryMemory(llm=self.llm, return_messages=True)
+
+    def invoke(self, inputs, memory: Optional[ConversationSummaryMemory] = None):
+        """
+        대본 생성 후 요약 메모리 갱신
+        - 직전 요약은 호출 측이 토큰 예산에 맞춰 {previous_summary}로 넣으므로 메모리를 프롬프트에 다시 붙이지 않는다
+        """
+        response = self.invoke_stateless(inputs)
+        self.remember(inputs.get("page", ""), inputs.get("text", ""), response, memory)
+        return response
+
+    def remember(self, page, text, script, memory: Optional[ConversationSummaryMemory] = None):
+        """요약 메모리(기본은 모델 공유 메모리)에 (슬라이드 텍스트, 대본) 반영 (저장된 대본을 재사용할 때도 호출)"""
+        memory = memory or self.memory
+        if memory is not None:
+            memory.save_context({"input": f"[{page} 페이지 슬라이드] {text}"}, {"output": script})
+
+    def invoke_stateless(self, inputs):
+        """요약 메모리를 거치지 않는 호출 (여러 페이지 병렬 생성용)"""
+        prompt = self._set_prompt(inputs)
+        return self.chain.invoke(prompt)
+
+class OutlineAI(GPTModel):
+    def __init__(self, prompt_path, output_parser, model_params, use_memory=False):
+        super().__init__(prompt_path, output_parser, model_params, use_memory)
+
+    def _set_prompt(self, inputs):
+        return self._get_template().format(**inputs)
+
 class ImageCategory(BaseModel):
     is_chart: bool = Field(..., description="데이터 관련 이미지 여부 (True/False)")  
     description: str = Field("", description="이미지에 대한 설명")
@@ -150,6 +188,8 @@ class ImageCategory(BaseModel):
 class ChatRequest(BaseModel):
     question: str
     session_id: str
+    timeout: Optional[float] = None   # 답변 생성 제한 시간(초), 없으면 서버 기본값
+    use_cache: bool = True            # False면 답변 캐시를 조회/저장하지 않음 (부하 테스트에서 매 질문 체인 실행)
 
 class ChatResponse(BaseModel):
     answer: str
@@ -161,6 +201,7 @@ class PresentationState(BaseModel):
 class PageScript(BaseModel):
     page: int
     script: str
+    text: Optional[str] = None   # 슬라이드 원문 텍스트 (deck 검색 인덱스에 포함)
 
 class QAEnableRequest(BaseModel):
     full_document: str
@@ -176,51 +217,12 @@ class Chatbot:
         self.chat_history_store = {}
         self.prompt_template: Optional[ChatPromptTemplate] = None
         self.chain = None
+        self.qa_chain = None
+        self.deck_index = None   # 현재 발표자료의 슬라이드 검색 인덱스 (ChatbotService가 설정)
 
     def _init_retriever(self, db_path):
-        # ParentDocumentRetriever 설정
-        parent_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=500,
-            chunk_overlap=250,
-            separators=['==================================================', '---.*?---', '===.*?===']
-        )
-        child_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=300,
-            chunk_overlap=100
-        )
-
-        vectorstore = Chroma(
-            persist_directory=db_path,
-            embedding_function=self.embeddings
-        )
-        parent_store = InMemoryStore()
-
-        # 🔹 텍스트 파일 로드 및 분할
-        text_paths = [
-            "../data/txt/wikidocs_01.txt",
-            "../data/txt/wikidocs_02.txt",
-            "../data/txt/wikidocs_03.txt"
-        ]
-        documents = []
-
-        for path in text_paths:
-            abs_path = os.path.abspath(os.path.join(os.path.dirname(__file__), path))
-            if os.path.exists(abs_path):
-                with open(abs_path, "r", encoding="utf-8") as f:
-                    raw_text = f.read()
-                    splits = parent_splitter.create_documents([raw_text])
-                    documents.extend(splits)
-
-        # 🔹 문서를 docstore에 저장 (InMemoryStore는 key-value 형태)
-        parent_store.mset([(str(i), doc) for i, doc in enumerate(documents)])
-
-        return ParentDocumentRetriever(
-            vectorstore=vectorstore,
-            docstore=parent_store,
-            child_splitter=child_splitter,
-            parent_splitter=parent_splitter,
-            search_kwargs={"k": 5} 
-        )
+        # 미리 빌드된 지식 인덱스(Chroma 자식 청크 + 디스크 부모 docstore)를 열기만 함 (core/knowledge_index.py)
+        return open_knowledge_retriever(self.embeddings, db_path)
 
     def get_template(self, system_context: str) -> ChatPromptTemplate:
         from string import Template
@@ -241,16 +243,29 @@ class Chatbot:
         def retrieve_or_search(question: str):
             docs = self.retriever.get_relevant_documents(question)
             if not docs:
-                web_result = ddg_search.run(question)
+                web_result = get_model("WEB_SEARCH").run(question)
                 return [Document(page_content=web_result)]
             return docs
 
+        async def aretrieve_or_search(x):
+            # ainvoke 경로: 지식 검색 / 웹 검색을 이벤트 루프를 막지 않고 실행
+            docs = await self.retriever.aget_relevant_documents(x["question"])
+            if not docs:
+                web_result = await get_model("WEB_SEARCH").arun(x["question"])
+                return [Document(page_content=web_result)]
+            return docs
+
+        async def aretrieve_slides(x):
+            return await self.aretrieve_slides(x["question"])
+
+        # sync/async 구현을 모두 두어 invoke와 ainvoke 모두 지원 (ainvoke에서는 두 검색이 동시에 실행됨)
         self.chain = (
-            {
-                "question": lambda x: x["question"],
-                "documents": lambda x: retrieve_or_search(x["question"]),
-                "chat_history": lambda x: self.format_chat_history(x.get("chat_history", []))
-            }
+            RunnableParallel(
+                question=lambda x: x["question"],
+                documents=RunnableLambda(lambda x: retrieve_or_search(x["question"]), afunc=aretrieve_or_search),
+                slides=RunnableLambda(lambda x: self.retrieve_slides(x["question"]), afunc=aretrieve_slides),
+                chat_history=lambda x: self.format_chat_history(x.get("chat_history", []))
+            )
             | self.prompt_template
             | self.llm
             | StrOutputParser()
@@ -262,6 +277,17 @@ class Chatbot:
             history_messages_key="chat_history"
         )
 
+    def retrieve_slides(self, question: str) -> str:
+        """질문과 관련된 슬라이드만 "[슬라이드 N]" 번호와 함께 반환"""
+        if self.deck_index is None:
+            return "(등록된 발표 자료가 없습니다)"
+        return self.deck_index.format_context(question)
+
+    async def aretrieve_slides(self, question: str) -> str:
+        if self.deck_index is None:
+            return "(등록된 발표 자료가 없습니다)"
+        return await self.deck_index.aformat_context(question)
+
     def invoke(self, question: str, session_id: str) -> str:
         if not self.qa_chain:
             return "체인이 준비되지 않았습니다. system_context를 먼저 설정해주세요."
@@ -273,6 +299,37 @@ class Chatbot:
         except Exception as e:
             return f"오류 발생: {str(e)}"
 
+    async def ainvoke(self, question: str, session_id: str, raise_errors: bool = False) -> str:
+        """invoke의 비동기 버전 (검색 + OpenAI 호출 모두 await, 취소되면 대화 기록에 남기지 않음)"""
+        if not self.qa_chain:
+            return "체인이 준비되지 않았습니다. system_context를 먼저 설정해주세요."
+        try:
+            return await self.qa_chain.ainvoke(
+                {"question": question},
+                config={"configurable": {"session_id": session_id}}
+            )
+        except Exception as e:
+            if raise_errors:
+                raise
+            return f"오류 발생: {str(e)}"
+
+    async def astream(self, question: str, session_id: str) -> AsyncIterator[str]:
+        """
+        답변 토큰을 생성되는 대로 yield
+        - 대화 기록은 스트림이 끝까지 완료된 뒤에 (질문, 전체 답변)으로 한 번만 추가
+        - 중간에 취소/오류가 나면 기록에 남기지 않음
+        """
+        if not self.chain:
+            yield "체인이 준비되지 않았습니다. system_context를 먼저 설정해주세요."
+            return
+        history = self.get_chat_history(session_id)
+        chunks = []
+        async for token in self.chain.astream({"question": question, "chat_history": list(history.messages)}):
+            chunks.append(token)
+            yield token
+        history.add_user_message(question)
+        history.add_ai_message("".join(chunks))
+
     def get_chat_history(self, session_id: str) -> BaseChatMessageHistory:
         if session_id not in self.chat_history_store:
             self.chat_history_store[session_id] = ChatMessageHistory()
@@ -301,27 +358,42 @@ class TTS_LLM:
             language_code="ko-KR",
             name=voice_name
         )
-        self.audio_config = tts.AudioConfig(audio_encoding=tts.AudioEncoding.LINEAR16)
-    
-    def _response(self, text: str):
+        # 인코딩별 오디오 설정 (LINEAR16 = WAV, MP3, OGG_OPUS)
+        self.audio_configs = {
+            encoding: tts.AudioConfig(audio_encoding=tts.AudioEncoding[encoding])
+            for encoding in ("LINEAR16", "MP3", "OGG_OPUS")
+        }
+        self.audio_config = self.audio_configs["LINEAR16"]
+
+    def config_signature(self, encoding: str = "LINEAR16") -> str:
+        """음성 + 오디오 설정 식별자 (오디오 캐시 키에 포함)"""
+        return f"{tts.VoiceSelectionParams.to_json(self.voice)}|{tts.AudioConfig.to_json(self.audio_configs[encoding])}"
+
+    def _response(self, text: str, encoding: str = "LINEAR16"):
         response = self.client.synthesize_speech(
             input=tts.SynthesisInput(ssml=text),
             voice=self.voice,
-            audio_config=self.audio_config
+            audio_config=self.audio_configs[encoding]
         )
         return response
 
-MAN_TTS = TTS_LLM(voice_name="ko-KR-Wavenet-C")
-WOMAN_TTS = TTS_LLM(voice_name="ko-KR-Wavenet-A")
+# ---------------------------------------------------------------------------
+# 모델 / 클라이언트는 import 시점이 아니라 처음 사용할 때 생성 (get_model 또는 /warmup)
+# ---------------------------------------------------------------------------
+
+MODEL_REGISTRY = LazyRegistry(label="MODEL")
+
+MODEL_REGISTRY.register("MAN_TTS", lambda: TTS_LLM(voice_name="ko-KR-Wavenet-C"))
+MODEL_REGISTRY.register("WOMAN_TTS", lambda: TTS_LLM(voice_name="ko-KR-Wavenet-A"))
 
-VISION_LLM  = ImageDescriptAI(
+MODEL_REGISTRY.register("VISION_LLM", lambda: ImageDescriptAI(
     prompt_path="prompts/image_script.prompt",
     output_parser=PydanticOutputParser(pydantic_object=ImageCategory),
-    model_params=gemini_params,
+    model_params=vision_model_params,
     use_memory=False
-)
+))
 
-PAGE_SCRIPT_LLM = PageScriptAI(
+MODEL_REGISTRY.register("PAGE_SCRIPT_LLM", lambda: PageScriptAI(
     prompt_paths={
         "head": "prompts/head_script.prompt",
         "body": "prompts/body_script.prompt",
@@ -330,11 +402,33 @@ PAGE_SCRIPT_LLM = PageScriptAI(
     output_parser=StrOutputParser(),
     model_params=gemini_params,
     use_memory=True
-)
+))
+
+MODEL_REGISTRY.register("OUTLINE_LLM", lambda: OutlineAI(
+    prompt_path="prompts/outline_script.prompt",
+    output_parser=StrOutputParser(),
+    model_params=gemini_params,
+    use_memory=False
+))
 
-CHATBOT_LLM = Chatbot(
+# 지식 검색 결과가 없을 때만 쓰는 웹 검색 도구 (챗봇 체인이 처음 웹 검색을 할 때 생성)
+MODEL_REGISTRY.register("WEB_SEARCH", lambda: DuckDuckGoSearchRun())
+
+MODEL_REGISTRY.register("CHATBOT_LLM", lambda: Chatbot(
     prompt_path="prompts/chatbot.prompt",
     output_parser=StrOutputParser(),
     model_params=chat_model_params,
-    db_path=os.path.join(os.path.dirname(__file__), "../../data/db/chromadb/split_knowledge")
-)
\ No newline at end of file
+    db_path=KNOWLEDGE_INDEX_DIR
+))
+
+
+def get_model(name: str):
+    """등록된 모델을 처음 호출할 때 한 번만 생성해서 반환 (thread-safe)"""
+    return MODEL_REGISTRY.get(name)
+
+
+def __getattr__(name):
+    # 기존 `from models import VISION_LLM` 형태도 동작하도록 (단, import 시점에 생성됨)
+    if name in MODEL_REGISTRY:
+        return get_model(name)
+    raise AttributeError(f"module 'models' has no attribute '{name}'")
@@ -1,28 +1,107 @@
-from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Body
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Body, Request
 from typing import List, Optional, Dict, Union
-from fastapi.responses import JSONResponse, StreamingResponse
-from core.chatbot_qa import ChatbotService
+from contextlib import closing
+from concurrent.futures import wait as wait_futures
+from fastapi.responses import JSONResponse, StreamingResponse, Response
+from fastapi.concurrency import run_in_threadpool
+from core.chatbot_qa import ChatbotService, CHAT_TIMEOUT_MESSAGE
 from models import ChatRequest, ChatResponse
-from utils import export_pdf_with_audio_to_pptx, export_pptx_with_wavs_as_zip
+from utils import export_pdf_with_audio_to_pptx, export_pptx_with_wavs_as_zip, AUDIO_FORMATS, AUDIO_MIME_TYPES
 from core.TTS_tunning import TTSEngine
-from core.script_generate import ScriptGenerator
-from models import QAEnableRequest
+from core.script_generate import ScriptGenerator, GENERATION_MODES, OUTLINE_SOURCES
+from core.jobs import JobManager, JobQueueFull, JobCancelled
+from core.audio_cache import get_audio_cache
+from models import QAEnableRequest, MODEL_REGISTRY
+import asyncio
+import json
+import queue
+import time
+import re
 
 router = APIRouter()
 chatbot_service = ChatbotService()
+job_manager = JobManager()
 
 @router.post("/generate-script")
 async def generate_script(
     file: UploadFile = File(...),
-    full_document: str = Form(...)
+    full_document: str = Form(...),
+    regenerate_neighbours: bool = Form(False),
+    mode: str = Form("sequential"),
+    outline_source: str = Form("llm")
 ):
+    _validate_generation_options(mode, outline_source)
     try:
-        script_generator = ScriptGenerator(file, full_document)
-        script_data = script_generator.process()
+        script_generator = ScriptGenerator(file, full_document, regenerate_neighbours=regenerate_neighbours,
+                                           mode=mode, outline_source=outline_source)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    try:
+        script_data = await _run_job("generate-script", _script_job(script_generator), cleanup=script_generator.close)
         return JSONResponse(content=script_data, status_code=200)
+    except HTTPException:
+        raise   # 작업 큐가 가득 찬 경우 429
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/generate-script/stream")
+async def generate_script_stream(
+    file: UploadFile = File(...),
+    full_document: str = Form(...),
+    regenerate_neighbours: bool = Form(False),
+    mode: str = Form("sequential"),
+    outline_source: str = Form("llm")
+):
+    """
+    페이지 대본이 완성될 때마다 NDJSON 한 줄씩 전송
+    - {"event": "page", "data": {page, text, image_description, script}}
+    - {"event": "summary", "data": {total_pages, elapsed, image_stats, page_stats, token_usage}}
+    - {"event": "error", "data": {detail}}
+    """
+    _validate_generation_options(mode, outline_source)
+    try:
+        script_generator = ScriptGenerator(file, full_document, regenerate_neighbours=regenerate_neighbours,
+                                           mode=mode, outline_source=outline_source)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+    # 생성은 작업 큐(동시 실행/대기 수 제한)에서 실행하고, 응답은 완성된 페이지를 큐에서 꺼내 전송
+    records = queue.Queue()
+    job = _admit_job("generate-script", _script_job(script_generator, on_record=records.put), cleanup=script_generator.close)
+
+    def event_stream():
+        start = time.perf_counter()
+        try:
+            while True:
+                try:
+                    record = records.get(timeout=JOB_STREAM_POLL_SECONDS)
+                except queue.Empty:
+                    if job.finished and records.empty():
+                        break   # 실행되기 전에 취소된 작업
+                    continue
+                if record is None:
+                    break
+                yield json.dumps({"event": "page", "data": record}, ensure_ascii=False) + "\n"
+            wait_futures([job.future])   # 마지막 페이지를 보낸 뒤 작업 상태가 확정될 때까지 대기
+            if job.status != "completed":
+                raise job.exception or JobCancelled(f"작업 {job.id}이(가) 취소되었습니다.")
+            summary = {
+                "total_pages": len(script_generator.pdf_data),
+                "elapsed": round(time.perf_counter() - start, 2),
+                "image_stats": script_generator.image_stats,
+                "page_stats": script_generator.page_stats,
+                "token_usage": script_generator.token_budget.summary()
+            }
+            yield json.dumps({"event": "summary", "data": summary}, ensure_ascii=False) + "\n"
+        except Exception as e:
+            print(f"❌ 스크립트 스트리밍 중 예외 발생: {e}")
+            yield json.dumps({"event": "error", "data": {"detail": str(e)}}, ensure_ascii=False) + "\n"
+        finally:
+            job_manager.cancel(job.id)   # 클라이언트 연결이 끊겨 중간에 닫힌 경우 남은 생성 중단 (완료된 작업은 무시)
+
+    # 동기 generator는 StreamingResponse가 threadpool에서 순회하므로 이벤트 루프를 막지 않는다
+    return StreamingResponse(event_stream(), media_type="application/x-ndjson")
+
 
 # @router.post("/chatpdf")
 # async def chat_with_pdf(r):
@@ -33,7 +112,8 @@ async def generate_script(
 async def enable_qa(payload: QAEnableRequest):
     full_document = payload.full_document
     script_data = [s.model_dump() for s in payload.script_data]  # dict로 변환
-    chatbot_service.update_context(full_document, script_data)
+    # deck 임베딩은 blocking 작업이므로 스레드풀에서 실행 (다른 /chat 요청을 막지 않도록)
+    await run_in_threadpool(chatbot_service.update_context, full_document, script_data)
     chatbot_service.set_presentation_complete()
     return {"status": "success"}
 
@@ -45,38 +125,149 @@ async def enable_qa(payload: QAEnableRequest):
 #     except Exception as e:
 #         raise HTTPException(status_code=500, detail=str(e))
 
+# 답변 생성 중 클라이언트 연결 종료를 확인하는 간격(초)
+DISCONNECT_POLL_SECONDS = 0.5
+
+
+async def _cancel_on_disconnect(http_request: Request, coro):
+    """coro를 실행하다가 클라이언트 연결이 끊기면 취소 → (완료 여부, 결과)"""
+    task = asyncio.ensure_future(coro)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=DISCONNECT_POLL_SECONDS)
+            if done:
+                return True, task.result()
+            if await http_request.is_disconnected():
+                print("🔌 클라이언트 연결 종료 → 답변 생성 취소")
+                return False, None
+    finally:
+        if not task.done():
+            task.cancel()
+
+
 @router.post("/chat", response_model=ChatResponse)
-async def chat(request: ChatRequest):
+async def chat(request: ChatRequest, http_request: Request):
     """챗봇 질문에 대한 답변을 생성합니다."""
     chatbot_service.set_presentation_complete()
     try:
-        answer = await chatbot_service.process_qa_request(
+        completed, answer = await _cancel_on_disconnect(http_request, chatbot_service.process_qa_request(
             request.question,
-            request.session_id
-        )
-        return ChatResponse(answer=answer)
+            request.session_id,
+            timeout=request.timeout,
+            use_cache=request.use_cache
+        ))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    if not completed:
+        return Response(status_code=499)   # 응답을 받을 클라이언트가 없음 (nginx 관례의 499)
+    return ChatResponse(answer=answer)
     
+@router.get("/chat/cache")
+async def chat_cache_stats():
+    """의미 기반 답변 캐시 통계 (히트율, 절약한 답변 생성 시간)"""
+    return chatbot_service.get_cache_stats()
+
+@router.post("/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """
+    챗봇 답변을 토큰이 생성되는 대로 NDJSON 한 줄씩 전송
+    - {"event": "token", "data": {"text"}}
+    - {"event": "done", "data": {"answer", "first_token_seconds", "elapsed"}}
+    - {"event": "error", "data": {"detail"}}
+    클라이언트 연결이 끊기면 StreamingResponse가 generator를 취소하므로 답변 생성도 중단되고 대화 기록에 남지 않음
+    """
+    chatbot_service.set_presentation_complete()
+
+    async def event_stream():
+        start = time.perf_counter()
+        first_token_seconds = None
+        chunks = []
+        try:
+            async for token in chatbot_service.stream_qa_request(request.question, request.session_id, timeout=request.timeout, use_cache=request.use_cache):
+                if first_token_seconds is None:
+                    first_token_seconds = round(time.perf_counter() - start, 3)
+                chunks.append(token)
+                yield json.dumps({"event": "token", "data": {"text": token}}, ensure_ascii=False) + "\n"
+            summary = {
+                "answer": "".join(chunks),
+                "first_token_seconds": first_token_seconds,
+                "elapsed": round(time.perf_counter() - start, 3)
+            }
+            yield json.dumps({"event": "done", "data": summary}, ensure_ascii=False) + "\n"
+        except asyncio.TimeoutError:
+            yield json.dumps({"event": "error", "data": {"detail": CHAT_TIMEOUT_MESSAGE}}, ensure_ascii=False) + "\n"
+        except Exception as e:
+            print(f"❌ 챗봇 스트리밍 중 예외 발생: {e}")
+            yield json.dumps({"event": "error", "data": {"detail": str(e)}}, ensure_ascii=False) + "\n"
+
+    # 프록시(nginx)가 응답을 모아서 보내지 않도록 버퍼링 비활성화
+    return StreamingResponse(event_stream(), media_type="application/x-ndjson",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 @router.post("/generate-audio")
 async def generate_audio(data: Dict[str, Union[Dict[str, str], List[str], str]]):
+    audio_encoding = _get_audio_encoding(data)
     try:
         scripts = data["scripts"]
         keywords = data["keywords"]
         gender = data.get("gender", "MAN")  # 기본값은 MAN으로 설정
         print("📥 /generate-audio 요청 도착")
-        print(f"▶️ scripts: {len(scripts)}, keywords: {keywords}, gender: {gender}")
+        print(f"▶️ scripts: {len(scripts)}, keywords: {keywords}, gender: {gender}, encoding: {audio_encoding}")
 
-        tts_engine = TTSEngine(gender=gender)  # 성별 파라미터 전달
-        tts_engine.clear_audio_dir()          # 기존 WAV 제거
-        result = tts_engine.synthesize_pages(pages=scripts, keywords=keywords)  # 음성 생성
+        result = await _run_job("generate-audio", lambda job: _synthesize_audio(
+            scripts, keywords, gender, audio_encoding, progress_callback=job.update_progress))
         print("✅ 음성 생성 완료")
 
         return result
+    except HTTPException:
+        raise   # 작업 큐가 가득 찬 경우 429
+    except ValueError as e:  # 음성 백엔드가 지원하지 않는 인코딩 등 잘못된 요청
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         print(f"❌ TTS 생성 중 예외 발생: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/audio/{key}")
+async def get_audio(key: str, request: Request):
+    """
+    페이지 음성 파일 전송 (/generate-audio가 반환한 핸들의 key)
+    - 내용 해시가 key이므로 ETag로 쓰고 장기 캐시 허용
+    - Range 요청(bytes=start-end)은 206 부분 응답
+    """
+    if not AUDIO_KEY_PATTERN.fullmatch(key):
+        raise HTTPException(status_code=400, detail="잘못된 오디오 키입니다.")
+    audio_cache = get_audio_cache()
+    path = audio_cache.path(key)
+    if not path.exists():
+        raise HTTPException(status_code=404, detail="오디오를 찾을 수 없습니다.")
+
+    etag = f'"{key}"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": AUDIO_CACHE_CONTROL,
+        "Accept-Ranges": "bytes",
+    }
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+
+    file_size = path.stat().st_size
+    byte_range = _parse_range(request.headers.get("range"), file_size)
+    if byte_range is None:
+        start, end, status_code = 0, file_size - 1, 200
+    elif byte_range == "invalid":
+        return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{file_size}"})
+    else:
+        (start, end), status_code = byte_range, 206
+        headers["Content-Range"] = f"bytes {start}-{end}/{file_size}"
+    headers["Content-Length"] = str(end - start + 1)
+
+    return StreamingResponse(
+        _iter_file(path, start, end - start + 1),
+        status_code=status_code,
+        media_type=AUDIO_MIME_TYPES[key.rsplit(".", 1)[-1]],
+        headers=headers
+    )
+
     
     
 @router.post("/export-presentation")
@@ -89,13 +280,249 @@ async def export_presentation(
     """
     try:
         pdf_bytes = await file.read()
-        pptx_bytes = export_pdf_with_audio_to_pptx(pdf_bytes, wav_dir)
-        zip_bytes = export_pptx_with_wavs_as_zip(pptx_bytes, wav_dir)
+        zip_bytes = await run_in_threadpool(_export_bundle, pdf_bytes, wav_dir)
 
         return StreamingResponse(
             iter([zip_bytes]),
             media_type="application/zip",
             headers={"Content-Disposition": "attachment; filename=presentation_bundle.zip"}
         )
+    except ValueError as e:
+        # 예: OGG 음성을 PPTX용 WAV로 변환할 수 없음 (soundfile 없음) → MP3/LINEAR16으로 다시 생성 필요
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+AUDIO_KEY_PATTERN = re.compile(r"[0-9a-f]{64}\.(" + "|".join(AUDIO_MIME_TYPES) + ")")
+AUDIO_CACHE_CONTROL = "public, max-age=31536000, immutable"
+AUDIO_READ_BLOCK = 64 * 1024
+
+def _parse_range(range_header, file_size):
+    """
+    단일 Range 헤더 → (start, end) / 없거나 해석 불가하면 None (전체 200 응답) / 시작이 파일 끝을 넘으면 "invalid" (416)
+    - bytes=50-10처럼 끝이 시작보다 앞선 범위는 잘못된 range-spec이므로 무시 (RFC 9110 14.1.1)
+    """
+    if not range_header:
+        return None
+    match = re.fullmatch(r"bytes=(\d*)-(\d*)", range_header.strip())
+    if not match or match.group(1) == match.group(2) == "":
+        return None  # 여러 구간 등 지원하지 않는 형식은 전체 응답
+    if match.group(1) == "":
+        # 끝에서부터 N바이트 (bytes=-N)
+        length = int(match.group(2))
+        if length == 0:
+            return "invalid"
+        return max(file_size - length, 0), file_size - 1
+    start = int(match.group(1))
+    if match.group(2) and int(match.group(2)) < start:
+        return None
+    if start >= file_size:
+        return "invalid"
+    end = int(match.group(2)) if match.group(2) else file_size - 1
+    return start, min(end, file_size - 1)
+
+def _iter_file(path, start, length):
+    with open(path, "rb") as f:
+        f.seek(start)
+        while length > 0:
+            block = f.read(min(AUDIO_READ_BLOCK, length))
+            if not block:
+                break
+            length -= len(block)
+            yield block
+
+def _validate_generation_options(mode, outline_source):
+    """대본 생성 mode / outline_source 검사 (잘못된 값은 500이 아니라 400)"""
+    if mode not in GENERATION_MODES:
+        raise HTTPException(status_code=400, detail=f"지원하지 않는 mode입니다. 가능: {', '.join(GENERATION_MODES)}")
+    if outline_source not in OUTLINE_SOURCES:
+        raise HTTPException(status_code=400, detail=f"지원하지 않는 outline_source입니다. 가능: {', '.join(OUTLINE_SOURCES)}")
+
+def _get_audio_encoding(data):
+    """요청의 audio_encoding (LINEAR16 / MP3 / OGG_OPUS, 기본 LINEAR16)"""
+    audio_encoding = str(data.get("audio_encoding", "LINEAR16")).upper()
+    if audio_encoding not in AUDIO_FORMATS:
+        raise HTTPException(status_code=400, detail=f"지원하지 않는 audio_encoding입니다. 가능: {', '.join(AUDIO_FORMATS)}")
+    return audio_encoding
+
+def _synthesize_audio(scripts, keywords, gender, audio_encoding="LINEAR16", progress_callback=None):
+    tts_engine = TTSEngine(gender=gender, audio_encoding=audio_encoding)  # 성별 / 출력 인코딩 전달
+    return tts_engine.synthesize_pages(pages=scripts, keywords=keywords, progress_callback=progress_callback)  # 음성 생성
+
+def _export_bundle(pdf_bytes, wav_dir, progress_callback=None):
+    pptx_bytes = export_pdf_with_audio_to_pptx(pdf_bytes, wav_dir)
+    if progress_callback:
+        progress_callback(1, 2)
+    zip_bytes = export_pptx_with_wavs_as_zip(pptx_bytes, wav_dir)
+    if progress_callback:
+        progress_callback(2, 2)
+    return zip_bytes
+
+@router.get("/warmup")
+async def warmup_status(request: Request):
+    """서버 시작 소요 시간 + 모델별 로드 여부/소요 시간"""
+    return {
+        "startup_seconds": getattr(request.app.state, "startup_seconds", None),
+        "models": MODEL_REGISTRY.status(),
+    }
+
+@router.post("/warmup")
+async def warmup(data: Optional[Dict[str, List[str]]] = Body(None)):
+    """
+    모델 미리 로드 (선택 사항, 배포 직후 첫 요청 지연을 없앨 때 사용)
+    - body {"models": ["VISION_LLM", ...]} 생략 시 전체
+    """
+    names = (data or {}).get("models")
+    unknown = [name for name in names or [] if name not in MODEL_REGISTRY]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"등록되지 않은 모델: {', '.join(unknown)}")
+    return await run_in_threadpool(MODEL_REGISTRY.warmup, names)
+
+# ---------------------------------------------------------------------------
+# 백그라운드 작업: 접수 즉시 job_id 반환 → 상태/진행률/결과 조회 및 취소
+# ---------------------------------------------------------------------------
+
+# 스트리밍 응답이 작업 큐에서 다음 페이지를 기다리며 작업 종료 여부를 확인하는 간격(초)
+JOB_STREAM_POLL_SECONDS = 0.5
+
+def _admit_job(kind: str, fn, cleanup=None):
+    """
+    작업 큐에 접수 (동시 실행 + 대기 수를 넘으면 429)
+    - cleanup은 접수가 거절되거나 작업이 끝나면(실행 전 취소 포함) 한 번 호출
+    """
+    try:
+        job = job_manager.submit(kind, fn)
+    except JobQueueFull as e:
+        if cleanup:
+            cleanup()
+        raise HTTPException(status_code=429, detail=str(e))
+    if cleanup:
+        job.future.add_done_callback(lambda _: cleanup())
+    return job
+
+def _submit_job(kind: str, fn, cleanup=None):
+    job = _admit_job(kind, fn, cleanup)
+    return JSONResponse(content=job.to_dict(), status_code=202)
+
+async def _run_job(kind: str, fn, cleanup=None):
+    """
+    결과를 바로 돌려주는 기존 경로도 같은 작업 큐를 거쳐 실행하고 완료를 기다림
+    - 실패하면 작업 함수의 예외를 그대로 다시 발생 (라우트의 기존 오류 처리 유지)
+    - 요청이 취소되면(클라이언트 연결 종료) 작업도 취소
+    """
+    job = _admit_job(kind, fn, cleanup)
+    try:
+        await asyncio.wrap_future(job.future)
+    except asyncio.CancelledError:
+        if job.status != "cancelled":
+            # 요청 자체가 취소됨 (DELETE /jobs/{id}로 취소된 경우는 아래에서 JobCancelled)
+            job_manager.cancel(job.id)
+            raise
+    if job.status != "completed":
+        raise job.exception or JobCancelled(f"작업 {job.id}이(가) 취소되었습니다.")
+    return job.result
+
+def _script_job(script_generator, on_record=None):
+    """대본 생성 작업 함수 (페이지마다 진행률 갱신, on_record가 있으면 완성된 페이지 전달 후 끝에 None)"""
+    def run(job):
+        total_pages = len(script_generator.docs)
+        job.update_progress(0, total_pages)
+        try:
+            # 취소 시(JobCancelled) 제너레이터를 바로 닫아 대기 중인 Vision/대본 생성 작업을 취소
+            with closing(script_generator.iter_pages()) as records:
+                for record in records:
+                    if on_record:
+                        on_record(record)
+                    job.update_progress(record["page"], total_pages)
+        finally:
+            if on_record:
+                on_record(None)
+        return script_generator.pdf_data
+    return run
+
+@router.post("/jobs/generate-script")
+async def submit_generate_script(
+    file: UploadFile = File(...),
+    full_document: str = Form(...),
+    regenerate_neighbours: bool = Form(False),
+    mode: str = Form("sequential"),
+    outline_source: str = Form("llm")
+):
+    """대본 생성 작업 접수"""
+    _validate_generation_options(mode, outline_source)
+    try:
+        script_generator = ScriptGenerator(file, full_document, regenerate_neighbours=regenerate_neighbours,
+                                           mode=mode, outline_source=outline_source)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    return _submit_job("generate-script", _script_job(script_generator), cleanup=script_generator.close)
+
+@router.post("/jobs/generate-audio")
+async def submit_generate_audio(data: Dict[str, Union[Dict[str, str], List[str], str]]):
+    """음성 생성 작업 접수"""
+    scripts = data["scripts"]
+    keywords = data["keywords"]
+    gender = data.get("gender", "MAN")
+    audio_encoding = _get_audio_encoding(data)
+
+    def run(job):
+        job.update_progress(0, len(scripts))
+        return _synthesize_audio(scripts, keywords, gender, audio_encoding, progress_callback=job.update_progress)
+
+    return _submit_job("generate-audio", run)
+
+@router.post("/jobs/export-presentation")
+async def submit_export_presentation(
+    file: UploadFile = File(...),
+    wav_dir: str = Form(...)
+):
+    """PPTX + WAV ZIP 생성 작업 접수"""
+    pdf_bytes = await file.read()
+
+    def run(job):
+        job.update_progress(0, 2)
+        return _export_bundle(pdf_bytes, wav_dir, progress_callback=job.update_progress)
+
+    return _submit_job("export-presentation", run)
+
+@router.get("/jobs/stats")
+async def get_job_stats():
+    """작업 대기열 현황"""
+    return job_manager.stats()
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """작업 상태 및 진행률 조회"""
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="작업을 찾을 수 없습니다.")
+    return job.to_dict()
+
+@router.get("/jobs/{job_id}/result")
+async def get_job_result(job_id: str):
+    """완료된 작업 결과 조회 (ZIP 결과는 파일로 전송)"""
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="작업을 찾을 수 없습니다.")
+    if job.status == "failed":
+        raise HTTPException(status_code=500, detail=job.error)
+    if job.status != "completed":
+        raise HTTPException(status_code=409, detail=f"작업이 완료되지 않았습니다. (status: {job.status})")
+
+    if isinstance(job.result, bytes):
+        return StreamingResponse(
+            iter([job.result]),
+            media_type="application/zip",
+            headers={"Content-Disposition": "attachment; filename=presentation_bundle.zip"}
+        )
+    return JSONResponse(content=job.result, status_code=200)
+
+@router.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    """작업 취소"""
+    job = job_manager.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="작업을 찾을 수 없습니다.")
+    return job.to_dict()
@@ -0,0 +1,104 @@
+"""
+/chat 동시 요청 부하 테스트
+
+세션 수(동시 사용자)를 늘려가며 같은 서버(uvicorn worker 1개)에 질문을 보내고
+처리량(질문/초)과 지연 시간(p50/p95)을 출력한다.
+Q&A 경로가 비동기로 동작하면 세션 수에 비례해 처리량이 늘고, 이벤트 루프를 막으면 처리량이 1세션과 비슷하게 고정된다.
+질문마다 세션/순번 꼬리표를 붙이고 기본으로 답변 캐시를 끄므로(use_cache=False) 모든 요청이 실제 체인을 실행한다.
+답변 캐시의 효과를 측정하려면 --use-cache를 준다.
+
+실행 (fastapi 디렉터리에서, 서버 실행 후):
+    uvicorn main:app --workers 1
+    python scripts/chat_load_test.py --enable --sessions 1 2 4 8 16 --questions 3
+    python scripts/chat_load_test.py --sessions 1 2 4 8 16 --questions 3 --use-cache
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+QUESTIONS = [
+    "이 발표의 핵심 내용을 요약해 주세요.",
+    "두 번째 슬라이드에서 말한 내용은 무엇인가요?",
+    "발표에서 소개한 방법의 한계는 무엇인가요?",
+]
+
+SAMPLE_DECK = {
+    "full_document": "이 발표는 검색 증강 생성(RAG) 기반 발표 도우미의 구조와 성능 개선 과정을 다룹니다.",
+    "script_data": [
+        {"page": 0, "script": "첫 번째 슬라이드에서는 발표 도우미의 전체 구조를 소개합니다.", "text": "시스템 구조"},
+        {"page": 1, "script": "두 번째 슬라이드에서는 슬라이드별 검색 방식과 토큰 절감 효과를 설명합니다.", "text": "슬라이드 검색"},
+        {"page": 2, "script": "세 번째 슬라이드에서는 비동기 처리와 남은 한계를 정리합니다.", "text": "비동기 처리와 한계"},
+    ],
+}
+
+
+async def run_session(client: httpx.AsyncClient, api_url: str, session_id: str, questions: int, use_cache: bool,
+                      latencies: list, errors: list):
+    for i in range(questions):
+        start = time.perf_counter()
+        try:
+            res = await client.post(f"{api_url}/chat", json={
+                # 요청마다 다른 질문 (같은 질문이 반복되어 캐시 히트만 측정하는 것을 방지)
+                "question": f"{QUESTIONS[i % len(QUESTIONS)]} (세션 {session_id}, 질문 {i + 1})",
+                "session_id": session_id,
+                "use_cache": use_cache
+            })
+            res.raise_for_status()
+            latencies.append(time.perf_counter() - start)
+        except Exception as e:
+            errors.append(str(e))
+
+
+async def run_level(api_url: str, sessions: int, questions: int, timeout: float, use_cache: bool) -> dict:
+    latencies, errors = [], []
+    async with httpx.AsyncClient(timeout=timeout, limits=httpx.Limits(max_connections=sessions)) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(
+            run_session(client, api_url, f"load-{sessions}-{i}", questions, use_cache, latencies, errors)
+            for i in range(sessions)
+        ))
+        elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "sessions": sessions,
+        "completed": len(latencies),
+        "errors": len(errors),
+        "seconds": elapsed,
+        "throughput": len(latencies) / elapsed if elapsed else 0.0,
+        "p50": statistics.median(latencies) if latencies else 0.0,
+        "p95": latencies[int(len(latencies) * 0.95) - 1] if latencies else 0.0,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--api-url", default="http://localhost:8000")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--questions", type=int, default=3)     # 세션당 질문 수
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--enable", action="store_true", help="테스트 전에 샘플 발표자료로 /qa/enable 호출")
+    parser.add_argument("--use-cache", action="store_true", help="서버 답변 캐시를 사용 (기본은 캐시를 끄고 체인 처리량만 측정)")
+    args = parser.parse_args()
+
+    if args.enable:
+        async with httpx.AsyncClient(timeout=args.timeout) as client:
+            (await client.post(f"{args.api_url}/qa/enable", json=SAMPLE_DECK)).raise_for_status()
+        print("✅ 샘플 발표자료 등록 완료")
+
+    results = []
+    for sessions in args.sessions:
+        result = await run_level(args.api_url, sessions, args.questions, args.timeout, args.use_cache)
+        results.append(result)
+        print(f"세션 {sessions:3d}: {result['completed']:4d}개 완료 / 오류 {result['errors']:3d} | "
+              f"{result['throughput']:6.2f} 질문/초 | p50 {result['p50']:6.2f}초 | p95 {result['p95']:6.2f}초")
+
+    base = results[0]["throughput"]
+    if base:
+        print("처리량 배율 (첫 단계 대비): " + ", ".join(f"{r['sessions']}세션 {r['throughput'] / base:.1f}x" for r in results))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,93 @@
+"""
+ZonosTTSBackend 배치 클라이언트 점검 (가짜 Zonos 서버 대상)
+
+scripts/fake_zonos_server.py 앱을 같은 프로세스에서 띄우고 iter_synthesize 결과를 확인한다.
+- 순서/매핑: 모든 index가 정확히 한 번 나오고, 각 오디오 길이가 그 index 입력 텍스트 길이와 맞는지
+- 오류 매핑: [FAIL] 조각만 예외로 돌아오고 나머지는 정상인지
+- 시간 초과: 응답이 없으면 남은 모든 index가 TimeoutError로 돌아오는지
+
+실행 (fastapi 디렉터리에서, gradio + gradio_client 필요):
+    python scripts/check_zonos_backend.py --inputs 10
+"""
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import argparse
+import io
+import wave
+
+from core import tts_backends
+from core.tts_backends import ZonosTTSBackend
+from fake_zonos_server import build_app, SECONDS_PER_CHAR
+
+FAIL_INDEX = 3
+
+
+def wav_seconds(audio: bytes) -> float:
+    with wave.open(io.BytesIO(audio), "rb") as wav:
+        return wav.getnframes() / wav.getframerate()
+
+
+def collect(backend: ZonosTTSBackend, inputs: list) -> dict:
+    """iter_synthesize 결과 → {index: 오디오 bytes 또는 예외} (index 중복이면 실패)"""
+    results = {}
+    for index, result in backend.iter_synthesize(inputs, "LINEAR16", max_workers=tts_backends.ZONOS_MAX_INFLIGHT):
+        assert index not in results, f"index {index}가 두 번 반환됨"
+        results[index] = result
+    assert set(results) == set(range(len(inputs))), f"누락된 index: {sorted(set(range(len(inputs))) - set(results))}"
+    return results
+
+
+def check_ordering_and_errors(backend: ZonosTTSBackend, count: int):
+    # 입력마다 길이를 다르게 해서 오디오 길이로 어떤 입력의 결과인지 구분
+    inputs = [f"<speak>{'가' * (5 + 4 * i)}</speak>" for i in range(count)]
+    inputs[FAIL_INDEX] = "<speak>[FAIL] 실패해야 하는 조각</speak>"
+    results = collect(backend, inputs)
+
+    for index, result in results.items():
+        if index == FAIL_INDEX:
+            assert isinstance(result, Exception), f"index {index}: 예외가 아니라 {type(result).__name__} 반환"
+            continue
+        assert not isinstance(result, Exception), f"index {index}: 예상하지 못한 오류 {result}"
+        expected = len(ZonosTTSBackend.ssml_to_text(inputs[index])) * SECONDS_PER_CHAR
+        actual = wav_seconds(result)
+        assert abs(actual - expected) < 0.01, f"index {index}: 오디오 {actual:.2f}초, 입력 기준 {expected:.2f}초 (다른 입력의 결과)"
+    print(f"✅ 순서/오류 매핑: {count}개 조각, index {FAIL_INDEX}만 실패")
+
+
+def check_timeout(backend: ZonosTTSBackend, count: int):
+    original = tts_backends.ZONOS_TIMEOUT
+    tts_backends.ZONOS_TIMEOUT = 1
+    try:
+        results = collect(backend, [f"<speak>[SLOW] 느린 조각 {i}</speak>" for i in range(count)])
+    finally:
+        tts_backends.ZONOS_TIMEOUT = original
+    assert all(isinstance(result, TimeoutError) for result in results.values()), "TimeoutError가 아닌 결과가 있음"
+    print(f"✅ 시간 초과: {count}개 조각 모두 TimeoutError")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=7861)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--inputs", type=int, default=10)
+    args = parser.parse_args()
+
+    app = build_app(args.latency)
+    app.queue(default_concurrency_limit=tts_backends.ZONOS_MAX_INFLIGHT)
+    app.launch(server_port=args.port, prevent_thread_lock=True, quiet=True)
+    try:
+        backend = ZonosTTSBackend(url=f"http://127.0.0.1:{args.port}")
+        check_ordering_and_errors(backend, args.inputs)
+        check_timeout(backend, tts_backends.ZONOS_MAX_INFLIGHT + 2)
+    except AssertionError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    finally:
+        app.close()
+
+
+if __name__ == "__main__":
+    main()
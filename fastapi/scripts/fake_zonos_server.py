@@ -0,0 +1,98 @@
+"""
+Zonos Gradio 앱 대역(stand-in) 서버
+
+실제 Zonos 모델 없이 ZonosTTSBackend를 오프라인으로 확인하기 위한 가짜 Gradio 앱.
+code/JS/zonos_client.py와 같은 /generate_audio API(입력 29개, 출력 (오디오 파일, seed))를 열고,
+텍스트 길이에 비례한 사인파 WAV를 돌려준다.
+텍스트에 [FAIL]이 있으면 오류를, [SLOW]가 있으면 SLOW_SECONDS만큼 더 늦게 응답한다 (scripts/check_zonos_backend.py에서 사용).
+
+실행 (fastapi 디렉터리에서, gradio 필요):
+    python scripts/fake_zonos_server.py --port 7860 --latency 0.5
+    ZONOS_GRADIO_URL=http://localhost:7860 uvicorn main:app
+이후 /generate-audio에 "gender": "ZONOS"로 요청
+"""
+import argparse
+import math
+import struct
+import tempfile
+import time
+import wave
+
+import gradio as gr
+
+SAMPLE_RATE = 44100           # Zonos 출력 샘플레이트
+SECONDS_PER_CHAR = 0.06       # 한국어 낭독 속도 근사값
+SLOW_SECONDS = 5              # [SLOW] 요청의 추가 지연(초)
+
+
+def synthesize_tone(text: str, sample_rate: int = SAMPLE_RATE) -> str:
+    """텍스트 길이만큼의 440Hz 사인파 WAV 파일 경로"""
+    frames = int(max(len(text), 1) * SECONDS_PER_CHAR * sample_rate)
+    samples = (int(8000 * math.sin(2 * math.pi * 440 * i / sample_rate)) for i in range(frames))
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as tmp:
+        with wave.open(tmp, "wb") as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(2)
+            wav.setframerate(sample_rate)
+            wav.writeframes(b"".join(struct.pack("<h", sample) for sample in samples))
+        return tmp.name
+
+
+def build_app(latency: float):
+    def generate_audio(model_choice, text, language, speaker_audio, prefix_audio,
+                       e1, e2, e3, e4, e5, e6, e7, e8, vq_single, fmax, pitch_std, speaking_rate,
+                       dnsmos, speaker_noised, cfg_scale, top_p, top_k, min_p,
+                       linear, confidence, quadratic, seed, randomize_seed, unconditional_keys):
+        time.sleep(latency)  # 모델 추론 시간 흉내
+        if "[FAIL]" in text:
+            raise gr.Error("fake zonos: 요청된 실패")
+        if "[SLOW]" in text:
+            time.sleep(SLOW_SECONDS)
+        print(f"[FAKE ZONOS] {language} {len(text)}자 → {len(text) * SECONDS_PER_CHAR:.1f}초")
+        return synthesize_tone(text), seed
+
+    with gr.Blocks() as app:
+        inputs = [
+            gr.Textbox(label="model_choice"),
+            gr.Textbox(label="text"),
+            gr.Textbox(label="language"),
+            gr.Audio(label="speaker_audio", type="filepath"),
+            gr.Audio(label="prefix_audio", type="filepath"),
+            *[gr.Number(label=f"emotion_{i}") for i in range(1, 9)],
+            gr.Number(label="vq_single"),
+            gr.Number(label="fmax"),
+            gr.Number(label="pitch_std"),
+            gr.Number(label="speaking_rate"),
+            gr.Number(label="dnsmos"),
+            gr.Checkbox(label="speaker_noised"),
+            gr.Number(label="cfg_scale"),
+            gr.Number(label="top_p"),
+            gr.Number(label="top_k"),
+            gr.Number(label="min_p"),
+            gr.Number(label="linear"),
+            gr.Number(label="confidence"),
+            gr.Number(label="quadratic"),
+            gr.Number(label="seed"),
+            gr.Checkbox(label="randomize_seed"),
+            gr.CheckboxGroup(["emotion", "speaker"], label="unconditional_keys"),
+        ]
+        outputs = [gr.Audio(label="output", type="filepath"), gr.Number(label="seed")]
+        button = gr.Button("Generate")
+        button.click(generate_audio, inputs=inputs, outputs=outputs, api_name="generate_audio")
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=7860)
+    parser.add_argument("--latency", type=float, default=0.5)   # 요청당 지연(초)
+    parser.add_argument("--concurrency", type=int, default=4)   # 동시에 처리할 요청 수
+    args = parser.parse_args()
+
+    app = build_app(args.latency)
+    app.queue(default_concurrency_limit=args.concurrency)
+    app.launch(server_port=args.port)
+
+
+if __name__ == "__main__":
+    main()
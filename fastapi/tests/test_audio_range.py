@@ -0,0 +1,27 @@
+from routes import _parse_range
+
+
+def test_no_header_serves_full_file():
+    assert _parse_range(None, 100) is None
+
+
+def test_simple_and_open_ended_ranges():
+    assert _parse_range("bytes=0-9", 100) == (0, 9)
+    assert _parse_range("bytes=90-", 100) == (90, 99)
+    assert _parse_range("bytes=90-500", 100) == (90, 99)
+
+
+def test_suffix_range():
+    assert _parse_range("bytes=-10", 100) == (90, 99)
+    assert _parse_range("bytes=-500", 100) == (0, 99)
+
+
+def test_inverted_range_is_ignored():
+    # RFC 9110: 잘못된 range-spec은 무시하고 전체 200 응답
+    assert _parse_range("bytes=50-10", 100) is None
+
+
+def test_unsatisfiable_range():
+    assert _parse_range("bytes=100-", 100) == "invalid"
+    assert _parse_range("bytes=200-300", 100) == "invalid"
+    assert _parse_range("bytes=-0", 100) == "invalid"
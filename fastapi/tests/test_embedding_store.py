@@ -0,0 +1,50 @@
+import threading
+
+import numpy as np
+
+from core.embedding_store import EmbeddingStore
+
+
+def fake_embed(tokens):
+    """토큰마다 구분되는 2차원 벡터"""
+    return [[float(ord(token[0])), float(len(token))] for token in tokens]
+
+
+def test_concurrent_duplicate_miss_does_not_orphan_row(tmp_path):
+    store = EmbeddingStore("test-model", directory=tmp_path, max_entries=8)
+    barrier = threading.Barrier(2)
+
+    def slow_embed(tokens):
+        barrier.wait(timeout=5)   # 두 thread가 모두 "c"를 미스로 본 뒤에 저장하도록
+        return fake_embed(tokens)
+
+    threads = [threading.Thread(target=store.embed, args=(["c"], slow_embed)) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    store.embed(["d"], fake_embed)
+    assert np.array_equal(store.get("c"), np.array(fake_embed(["c"])[0], dtype=np.float32))
+    assert np.array_equal(store.get("d"), np.array(fake_embed(["d"])[0], dtype=np.float32))
+    assert sorted(row for row, _ in store._rows.values()) == [0, 1]
+
+
+def test_eviction_reuses_least_recently_used_row(tmp_path):
+    store = EmbeddingStore("test-model", directory=tmp_path, max_entries=2)
+    store.embed(["a", "b"], fake_embed)
+    store.get("a")
+    store.embed(["c"], fake_embed)
+
+    assert store.get("b") is None
+    assert np.array_equal(store.get("a"), np.array(fake_embed(["a"])[0], dtype=np.float32))
+    assert np.array_equal(store.get("c"), np.array(fake_embed(["c"])[0], dtype=np.float32))
+
+
+def test_reload_continues_after_used_rows(tmp_path):
+    EmbeddingStore("test-model", directory=tmp_path, max_entries=4).embed(["a", "b"], fake_embed)
+    store = EmbeddingStore("test-model", directory=tmp_path, max_entries=4)
+    store.embed(["c"], fake_embed)
+
+    assert np.array_equal(store.get("a"), np.array(fake_embed(["a"])[0], dtype=np.float32))
+    assert np.array_equal(store.get("c"), np.array(fake_embed(["c"])[0], dtype=np.float32))
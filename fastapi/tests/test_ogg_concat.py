@@ -0,0 +1,68 @@
+import struct
+
+import pytest
+
+from utils import concat_ogg_opus, _ogg_pages, _ogg_crc, _OGG_HEADER
+
+PRE_SKIP = 312
+
+
+def make_page(serial, sequence, granule, packets, flags=0):
+    lacing = bytearray()
+    for packet in packets:
+        lacing += bytes([255] * (len(packet) // 255) + [len(packet) % 255])
+    header = bytearray(_OGG_HEADER.pack(b"OggS", 0, flags, granule, serial, sequence, 0, len(lacing)))
+    page = header + lacing + b"".join(packets)
+    struct.pack_into("<I", page, 22, _ogg_crc(page))
+    return bytes(page)
+
+
+def make_stream(serial, granules, pre_skip=PRE_SKIP):
+    """OpusHead / OpusTags 헤더 페이지 + 오디오 페이지(페이지별 granule)"""
+    head = b"OpusHead" + bytes([1, 1]) + struct.pack("<HIhB", pre_skip, 48000, 0, 0)
+    tags = b"OpusTags" + struct.pack("<I", 0) + struct.pack("<I", 0)
+    pages = [make_page(serial, 0, 0, [head], flags=0x02), make_page(serial, 1, 0, [tags])]
+    for index, granule in enumerate(granules):
+        flags = 0x04 if index == len(granules) - 1 else 0
+        pages.append(make_page(serial, 2 + index, granule, [bytes([index]) * 20], flags=flags))
+    return b"".join(pages)
+
+
+def parse(stream):
+    pages, pos = [], 0
+    for flags, granule, lacing, body in _ogg_pages(stream):
+        header = _OGG_HEADER.unpack_from(stream, pos)
+        page = bytearray(stream[pos:pos + 27 + len(lacing) + len(body)])
+        struct.pack_into("<I", page, 22, 0)
+        assert _ogg_crc(page) == header[6]
+        pages.append({"flags": flags, "granule": granule, "serial": header[4], "sequence": header[5], "body": body})
+        pos += len(page)
+    return pages
+
+
+def test_concat_rebases_granules_by_pre_skip():
+    first = make_stream(1, [PRE_SKIP + 960, PRE_SKIP + 1920])
+    second = make_stream(2, [PRE_SKIP + 960, PRE_SKIP + 2880])
+    pages = parse(concat_ogg_opus([first, second]))
+
+    # 두 번째 스트림의 헤더 페이지는 제거되고 serial / 순번 / BOS / EOS가 하나의 스트림으로 정리됨
+    assert len(pages) == 2 + 2 + 2
+    assert {page["serial"] for page in pages} == {1}
+    assert [page["sequence"] for page in pages] == list(range(len(pages)))
+    assert [bool(page["flags"] & 0x02) for page in pages] == [True] + [False] * 5
+    assert [bool(page["flags"] & 0x04) for page in pages] == [False] * 5 + [True]
+
+    audio_granules = [page["granule"] for page in pages[2:]]
+    assert audio_granules == sorted(audio_granules)
+    # 두 번째 스트림은 첫 스트림 재생이 끝난 위치(1920)부터 이어짐 (자기 pre-skip 제외)
+    assert audio_granules == [PRE_SKIP + 960, PRE_SKIP + 1920, PRE_SKIP + 1920 + 960, PRE_SKIP + 1920 + 2880]
+    # 전체 재생 길이 = 각 스트림 재생 길이의 합
+    assert audio_granules[-1] - PRE_SKIP == 1920 + 2880
+
+
+def test_concat_rejects_mismatched_channels():
+    mono = make_stream(1, [PRE_SKIP + 960])
+    stereo = bytearray(make_stream(2, [PRE_SKIP + 960]))
+    stereo[27 + 1 + 9] = 2   # OpusHead 채널 수
+    with pytest.raises(ValueError):
+        concat_ogg_opus([mono, bytes(stereo)])
@@ -0,0 +1,90 @@
+from concurrent.futures import Future
+
+from core.script_generate import ScriptGenerator
+
+
+class FakeMemory:
+    def __init__(self):
+        self.buffer = ""
+
+
+class FakePageScriptAI:
+    """remember()는 요약 대신 (페이지, 텍스트)를 이어 붙여서 어떤 페이지들이 요약됐는지 확인"""
+    def __init__(self):
+        self.remember_calls = []
+
+    def new_memory(self):
+        return FakeMemory()
+
+    def remember(self, page, text, script, memory=None):
+        self.remember_calls.append(page)
+        memory.buffer += f"{page}:{text}|"
+
+
+class FakePageStore(dict):
+    def set(self, key, value):
+        self[key] = value
+
+
+def make_generator(texts, page_store, llm):
+    generator = ScriptGenerator.__new__(ScriptGenerator)
+    generator.docs = texts
+    generator.pipeline_depth = 2
+    generator.vision_max_workers = 1
+    generator.regenerate_neighbours = False
+    generator.page_store = page_store
+    generator.page_script_llm = llm
+    generator.page_stats = {"generated": 0, "reused": 0}
+    generator.pdf_data = []
+    generator._full_document_hash = "doc"
+
+    def prepare_page(page_idx, vision_executor, key_future: Future = None):
+        text = texts[page_idx]
+        if key_future is not None:
+            key_future.set_result(f"key-{text}")
+        return text, "", f"key-{text}"
+
+    def generate_script(page_idx, text, image_description, total_pages):
+        generator.memory_before.append(generator.memory.buffer)
+        llm.remember(page_idx + 1, text, f"script {text}", generator.memory)
+        return f"script {text}"
+
+    generator.memory_before = []
+    generator._prepare_page = prepare_page
+    generator.generate_script = generate_script
+    return generator
+
+
+def run(texts, page_store):
+    llm = FakePageScriptAI()
+    generator = make_generator(texts, page_store, llm)
+    records = list(generator._iter_pages_sequential())
+    return generator, llm, records
+
+
+def test_unchanged_deck_restores_memory_without_llm_calls():
+    page_store = FakePageStore()
+    run(["A", "B", "C"], page_store)
+    generator, llm, records = run(["A", "B", "C"], page_store)
+
+    assert generator.page_stats == {"generated": 0, "reused": 3}
+    assert llm.remember_calls == []
+    assert generator.memory.buffer == "1:A|2:B|3:C|"
+    assert [record["script"] for record in records] == ["script A", "script B", "script C"]
+
+
+def test_edited_middle_page_does_not_restore_stale_memory():
+    page_store = FakePageStore()
+    run(["A", "B", "C"], page_store)
+
+    generator, llm, _ = run(["A", "B2", "C"], page_store)
+    assert generator.page_stats == {"generated": 1, "reused": 2}
+    # B2는 A까지의 요약으로 생성되고, C의 요약은 예전 B가 아니라 B2 기준으로 다시 만듦
+    assert generator.memory_before == ["1:A|"]
+    assert llm.remember_calls == [2, 3]
+    assert generator.memory.buffer == "1:A|2:B2|3:C|"
+
+    # 같은 자료를 다시 처리하면 새 체인의 메모리를 그대로 복원
+    generator, llm, _ = run(["A", "B2", "C"], page_store)
+    assert llm.remember_calls == []
+    assert generator.memory.buffer == "1:A|2:B2|3:C|"
@@ -0,0 +1,42 @@
+import re
+import xml.etree.ElementTree as ET
+
+from core.TTS_tunning import TTSEngine
+
+
+def split(ssml, max_bytes):
+    engine = TTSEngine.__new__(TTSEngine)
+    return engine.split_ssml(ssml, max_bytes=max_bytes)
+
+
+def plain_text(chunks):
+    return "".join(re.sub(r"<[^>]+>", "", chunk) for chunk in chunks)
+
+
+def assert_valid(chunks, max_bytes):
+    for chunk in chunks:
+        assert len(chunk.encode("utf-8")) <= max_bytes
+        ET.fromstring(chunk)
+
+
+def test_long_run_without_spaces_is_split_at_character_boundaries():
+    run = "가나다라마바사아자차" * 30   # 공백 없는 900바이트
+    ssml = f"<speak>앞 문장입니다. {run} 뒤 문장입니다.</speak>"
+    chunks = split(ssml, 200)
+    assert len(chunks) > 1
+    assert_valid(chunks, 200)
+    assert run in plain_text(chunks)
+
+
+def test_long_run_inside_tag_is_closed_and_reopened():
+    run = "x" * 500
+    ssml = f'<speak>시작 <emphasis level="moderate">{run}</emphasis> 끝</speak>'
+    chunks = split(ssml, 120)
+    assert_valid(chunks, 120)
+    assert plain_text(chunks).replace(" ", "") == f"시작{run}끝"
+    assert all('<emphasis level="moderate">' in chunk for chunk in chunks if "x" in chunk)
+
+
+def test_short_ssml_is_not_split():
+    ssml = "<speak>짧은 문장입니다.</speak>"
+    assert split(ssml, 200) == [ssml]
@@ -12,16 +12,29 @@ from pptx.util import Inches
 from typing import Optional
 import tempfile, zipfile
 import base64
+import struct
+import numpy as np
 import fitz
 import io
 import os
 import uuid
 
+# 기존 호출 측(from utils import ...) 호환을 위해 다시 내보냄
+from core.image_ops import optimize_image, extract_raw_image_bytes, hash_content, image_pixel_stats
+
 PDF_DIR = Path(r"..\data\save_pdf")
 txt_DIR = Path(r"..\data\save_txt")
 IMAGE_DIR = Path(r"..\data\temp_images")
 AUDIO_DIR = Path("../data/audio")
 
+# TTS 출력 인코딩 → (파일 확장자, MIME 타입)
+AUDIO_FORMATS = {
+    "LINEAR16": ("wav", "audio/wav"),
+    "MP3": ("mp3", "audio/mpeg"),
+    "OGG_OPUS": ("ogg", "audio/ogg"),
+}
+AUDIO_MIME_TYPES = {extension: mime_type for extension, mime_type in AUDIO_FORMATS.values()}
+
 def preprocess_text(text: str, max_length: int = 2000) -> str:
     """텍스트 전처리 및 길이 제한"""
     # 불필요한 공백 제거
@@ -38,29 +51,12 @@ def convert_image_to_base64(image_bytes: bytes) -> str:
     return base64.b64encode(image_bytes).decode('utf-8')
 
 
-def optimize_image(image_bytes: bytes, max_size: int = 800, quality: int = 50) -> bytes:
-    """
-    이미지 크기 리사이즈 + JPEG 압축
-    """
-    img = Image.open(BytesIO(image_bytes)).convert("RGB")
-    if img.width > max_size or img.height > max_size:
-        ratio = max_size / max(img.width, img.height)
-        new_size = (int(img.width * ratio), int(img.height * ratio))
-        img = img.resize(new_size, Image.Resampling.LANCZOS)
-    
-    output = BytesIO()
-    img.save(output, format="JPEG", quality=quality, optimize=True)
-    return output.getvalue(), img.size
-
 def extract_image_bytes(doc, xref):
     """
     PDF에서 이미지 바이트 데이터와 사이즈를 추출
     """
-    pix = fitz.Pixmap(doc, xref)
-    if pix.n > 4:  # CMYK → RGB 변환
-        pix = fitz.Pixmap(fitz.csRGB, pix)
-    img_bytes = pix.tobytes()
-    
+    img_bytes = extract_raw_image_bytes(doc, xref)
+
     return optimize_image(img_bytes)
 
 def extract_page_bytes(page):
@@ -81,6 +77,37 @@ def calculate_image_ratio(image_size, page_size):
 
     return image_area / page_area
 
+def calculate_placement_ratio(image_rects, page_rect):
+    """
+    이미지 배치 영역(rect 목록)이 페이지에서 차지하는 비율 계산 (렌더링 불필요)
+    """
+    page_area = page_rect.width * page_rect.height
+    if page_area <= 0:
+        return 0.0
+    placed_area = sum(abs(rect & page_rect) for rect in image_rects)  # 페이지 밖 영역은 잘라냄
+
+    return min(placed_area / page_area, 1.0)
+
+def top_k_similar(candidates: List[str], candidate_embeddings, query_embeddings, top_k: int = 10) -> List[str]:
+    """
+    각 후보의 (쿼리들과의 최대 코사인 유사도) 기준 상위 top_k 후보 반환
+    - 정규화된 행렬 곱 1회로 전체 유사도를 계산하고 argpartition으로 상위 k개만 정렬
+    """
+    if not candidates or len(query_embeddings) == 0 or top_k <= 0:
+        return []
+
+    candidate_matrix = np.asarray(candidate_embeddings, dtype=np.float32)
+    query_matrix = np.asarray(query_embeddings, dtype=np.float32)
+    candidate_matrix /= np.linalg.norm(candidate_matrix, axis=1, keepdims=True) + 1e-12
+    query_matrix /= np.linalg.norm(query_matrix, axis=1, keepdims=True) + 1e-12
+
+    scores = (candidate_matrix @ query_matrix.T).max(axis=1)
+    k = min(top_k, len(candidates))
+    top_idx = np.argpartition(-scores, k - 1)[:k]
+    top_idx = top_idx[np.argsort(-scores[top_idx], kind="stable")]
+
+    return [candidates[i] for i in top_idx]
+
 def preprocess_script(script: str) -> str:
     """
     대본 전처리
@@ -96,46 +123,232 @@ def clear_audio_dir(audio_dir: Path):
     for file in audio_dir.glob("*.wav"):
         file.unlink()
 
+def _wav_layout(wav: bytes):
+    """WAV(RIFF) 헤더에서 fmt 본문과 PCM data 구간(시작, 길이)을 찾음 (샘플은 읽지 않음)"""
+    if wav[:4] != b"RIFF" or wav[8:12] != b"WAVE":
+        raise ValueError("WAV(RIFF) 형식이 아닙니다.")
+    fmt = None
+    pos = 12
+    while pos + 8 <= len(wav):
+        chunk_id = wav[pos:pos + 4]
+        size = struct.unpack_from("<I", wav, pos + 4)[0]
+        body = pos + 8
+        if chunk_id == b"fmt ":
+            fmt = bytes(wav[body:body + 16])
+        elif chunk_id == b"data":
+            if fmt is None:
+                raise ValueError("fmt 청크가 data 청크보다 뒤에 있습니다.")
+            return fmt, body, min(size, len(wav) - body)
+        pos = body + size + (size & 1)  # 청크는 2바이트 단위로 정렬
+    raise ValueError("WAV data 청크를 찾을 수 없습니다.")
+
+def concat_wav(wavs: List[bytes]) -> bytes:
+    """
+    같은 형식의 WAV(LINEAR16 등)들을 하나로 이어 붙임
+    - PCM 샘플은 디코딩하지 않고, 미리 할당한 버퍼에 data 구간을 그대로 복사
+    - 반환값은 bytearray (bytes로 다시 복사하지 않음)
+    """
+    if len(wavs) == 1:
+        return wavs[0]
+    layouts = [_wav_layout(wav) for wav in wavs]
+    fmt = layouts[0][0]
+    if any(layout[0] != fmt for layout in layouts):
+        raise ValueError("오디오 형식(fmt)이 서로 다른 WAV는 이어 붙일 수 없습니다.")
+
+    data_size = sum(length for _, _, length in layouts)
+    header = struct.pack("<4sI4s4sI", b"RIFF", 36 + data_size, b"WAVE", b"fmt ", 16) + fmt \
+        + struct.pack("<4sI", b"data", data_size)
+    buffer = bytearray(len(header) + data_size)
+    view = memoryview(buffer)
+    view[:len(header)] = header
+    pos = len(header)
+    for wav, (_, start, length) in zip(wavs, layouts):
+        view[pos:pos + length] = memoryview(wav)[start:start + length]
+        pos += length
+    return buffer
+
+def _ogg_crc_table():
+    table = []
+    for i in range(256):
+        crc = i << 24
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x04C11DB7) if crc & 0x80000000 else (crc << 1)
+        table.append(crc & 0xFFFFFFFF)
+    return table
+
+_OGG_CRC_TABLE = _ogg_crc_table()
+_OGG_HEADER = struct.Struct("<4sBBqIII B")   # capture, version, flags, granule, serial, sequence, crc, segments
+
+def _ogg_crc(page: bytes) -> int:
+    """Ogg 페이지 CRC (다항식 0x04C11DB7, 초기값 0, 반사/최종 XOR 없음)"""
+    crc = 0
+    table = _OGG_CRC_TABLE
+    for byte in page:
+        crc = ((crc << 8) & 0xFFFFFFFF) ^ table[(crc >> 24) ^ byte]
+    return crc
+
+def _ogg_pages(stream: bytes):
+    """Ogg 스트림 → [(flags, granule, 세그먼트 테이블, 본문), ...]"""
+    pages = []
+    pos = 0
+    while pos < len(stream):
+        if stream[pos:pos + 4] != b"OggS":
+            raise ValueError("Ogg 페이지 형식이 아닙니다.")
+        _, _, flags, granule, _, _, _, segment_count = _OGG_HEADER.unpack_from(stream, pos)
+        lacing = stream[pos + 27:pos + 27 + segment_count]
+        body_start = pos + 27 + segment_count
+        body_end = body_start + sum(lacing)
+        pages.append((flags, granule, bytes(lacing), stream[body_start:body_end]))
+        pos = body_end
+    return pages
+
+def concat_ogg_opus(streams: List[bytes]) -> bytes:
+    """
+    Ogg Opus 스트림들을 하나의 논리 스트림으로 재구성 (chained stream은 브라우저에서 재생이 불안정)
+    - 첫 스트림의 헤더(OpusHead, OpusTags) 페이지만 남기고 나머지 스트림은 오디오 페이지만 이어 붙임
+    - serial / 페이지 순번 / granule position을 이어지도록 고치고 CRC를 다시 계산 (Opus 패킷은 디코딩하지 않음)
+    - granule은 pre-skip을 포함한 샘플 수이므로 뒤 스트림은 자기 pre-skip을 빼고 이어 붙임
+      (재생 위치 = granule - 첫 스트림 pre-skip, 전체 길이 = 각 스트림 재생 길이의 합)
+    """
+    if len(streams) == 1:
+        return streams[0]
+    output = bytearray()
+    serial = None
+    sequence = 0
+    granule_offset = 0
+    previous_granule = 0   # 출력 granule은 줄어들지 않도록 유지
+    for stream_index, stream in enumerate(streams):
+        pages = _ogg_pages(stream)
+        if not pages or not pages[0][3].startswith(b"OpusHead"):
+            raise ValueError("Ogg Opus 스트림이 아닙니다.")
+        if serial is None:
+            serial = _OGG_HEADER.unpack_from(stream, 0)[4]
+            head = pages[0][3]
+        elif pages[0][3][9] != head[9] or pages[0][3][12:16] != head[12:16]:
+            raise ValueError("채널 수/샘플레이트가 서로 다른 Opus 스트림은 이어 붙일 수 없습니다.")
+
+        # 헤더 패킷 2개(OpusHead, OpusTags)가 끝나는 페이지까지가 헤더 페이지 (오디오는 새 페이지에서 시작)
+        header_pages = 0
+        completed = 0
+        while completed < 2 and header_pages < len(pages):
+            completed += sum(1 for value in pages[header_pages][2] if value < 255)
+            header_pages += 1
+
+        # OpusHead의 pre-skip (바이트 10~11, 48kHz 샘플 수)
+        pre_skip = struct.unpack_from("<H", pages[0][3], 10)[0] if stream_index > 0 else 0
+        last_granule = 0
+        is_last_stream = stream_index == len(streams) - 1
+        for page_index, (flags, granule, lacing, body) in enumerate(pages):
+            if stream_index > 0 and page_index < header_pages:
+                continue
+            flags &= ~0x02                      # BOS는 첫 페이지만
+            if stream_index == 0 and page_index == 0:
+                flags |= 0x02
+            if not (is_last_stream and page_index == len(pages) - 1):
+                flags &= ~0x04                  # EOS는 마지막 페이지만
+            if granule != -1:                   # -1: 이 페이지에서 끝나는 패킷 없음
+                last_granule = granule
+                if page_index >= header_pages:  # 헤더 페이지의 granule은 0으로 유지
+                    granule = max(granule - pre_skip + granule_offset, previous_granule)
+                    previous_granule = granule
+            header = bytearray(_OGG_HEADER.pack(b"OggS", 0, flags, granule, serial, sequence, 0, len(lacing)))
+            page = header + lacing + body
+            struct.pack_into("<I", page, 22, _ogg_crc(page))
+            output += page
+            sequence += 1
+        # 다음 스트림의 granule은 지금까지 재생한 샘플 수(48kHz 기준, 첫 스트림은 pre-skip 포함)만큼 뒤로
+        granule_offset += last_granule - pre_skip
+    return bytes(output)
+
+def to_pcm16_wav(audio: bytes) -> bytes:
+    """
+    임의 형식 오디오 → 16bit PCM WAV (LINEAR16과 같은 형식)
+    - 이미 16bit PCM WAV면 그대로 반환, 그 외(float WAV, FLAC, MP3 등)는 soundfile로 변환
+    """
+    if audio[:4] == b"RIFF":
+        fmt, _, _ = _wav_layout(audio)
+        audio_format, _, _, _, _, bits_per_sample = struct.unpack("<HHIIHH", fmt)
+        if audio_format == 1 and bits_per_sample == 16:
+            return audio
+    try:
+        import soundfile as sf
+    except ImportError:
+        raise ValueError("16bit PCM WAV가 아닌 오디오를 변환하려면 soundfile 패키지가 필요합니다.")
+    data, sample_rate = sf.read(io.BytesIO(audio), dtype="int16")
+    output = io.BytesIO()
+    sf.write(output, data, sample_rate, format="WAV", subtype="PCM_16")
+    return output.getvalue()
+
+def concat_audio(chunks: List[bytes], encoding: str = "LINEAR16") -> bytes:
+    """
+    조각별 합성 결과를 하나의 오디오로 연결
+    - LINEAR16: WAV 헤더를 하나로 합치고 PCM만 이어 붙임
+    - MP3: 프레임 단위 스트림이라 그대로 이어 붙임
+    - OGG_OPUS: 하나의 Ogg 논리 스트림으로 다시 묶음 (오디오 패킷은 그대로)
+    """
+    if encoding == "LINEAR16":
+        return concat_wav(chunks)
+    if encoding == "OGG_OPUS":
+        return concat_ogg_opus(chunks)
+    if len(chunks) == 1:
+        return chunks[0]
+    return b"".join(chunks)
+
+def find_page_audio(audio_dir: str, page_index: int) -> Optional[str]:
+    """page_{n}.<확장자> 음성 파일 경로 (지원하는 인코딩 중 먼저 찾은 것)"""
+    for extension in AUDIO_MIME_TYPES:
+        audio_path = os.path.join(audio_dir, f"page_{page_index}.{extension}")
+        if os.path.exists(audio_path):
+            return audio_path
+    return None
+
 def export_pdf_with_audio_to_pptx(pdf_bytes: bytes, wav_dir: str) -> bytes:
     """
-    PDF 파일을 PPTX로 변환하고, 각 페이지에 대응되는 오디오(WAV)를 삽입하여 반환.
+    PDF 파일을 PPTX로 변환하고, 각 페이지에 대응되는 오디오(WAV/MP3/OGG)를 삽입하여 반환.
 
     Parameters:
     - pdf_bytes: Streamlit에서 업로드한 PDF의 byte stream
-    - wav_dir: 페이지별 WAV 파일이 저장된 디렉터리 (파일명: page_0.wav, page_1.wav, ...)
+    - wav_dir: 페이지별 음성 파일이 저장된 디렉터리 (파일명: page_0.wav 또는 page_0.mp3, page_0.ogg, ...)
 
     Returns:
     - PPTX byte stream (다운로드용)
     """
-    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
-    ppt = Presentation()
-
-    for page_index in range(len(doc)):
-        page = doc.load_page(page_index)
+    from core.rasterizer import RasterService  # rasterizer가 utils를 import하므로 함수 안에서 import
 
-        # 📷 PDF 페이지 → 이미지로 렌더링
-        image_path = os.path.join(tempfile.gettempdir(), f"slide_{page_index}.png")
-        page.get_pixmap(matrix=fitz.Matrix(2, 2)).save(image_path)
+    # 📷 PDF 페이지 → 이미지로 렌더링 (프로세스 풀에서 병렬 처리)
+    with RasterService(pdf_bytes) as raster:
+        page_images = raster.render_pages(zoom=2)
+    ppt = Presentation()
 
+    for page_index, (page_png, _) in enumerate(page_images):
         # 🎞️ 새 슬라이드 추가 + 이미지 삽입
         slide = ppt.slides.add_slide(ppt.slide_layouts[6])
-        slide.shapes.add_picture(image_path, Inches(0), Inches(0), width=Inches(10), height=Inches(7.5))
+        slide.shapes.add_picture(BytesIO(page_png), Inches(0), Inches(0), width=Inches(10), height=Inches(7.5))
 
-        # 🔈 오디오 삽입
-        audio_path = os.path.join(wav_dir, f"page_{page_index}.wav")
-        if os.path.exists(audio_path):
+        # 🔈 오디오 삽입 (WAV/MP3/OGG 중 생성된 형식 그대로, MIME 타입은 확장자 기준)
+        audio_path = find_page_audio(wav_dir, page_index)
+        if audio_path:
+            audio_file, mime_type = audio_path, AUDIO_MIME_TYPES[audio_path.rsplit(".", 1)[-1]]
+            if mime_type == "audio/ogg":
+                # PowerPoint는 Ogg를 재생하지 못하므로 WAV로 변환해서 삽입 (ZIP에는 원본 OGG 그대로)
+                with open(audio_path, "rb") as f:
+                    try:
+                        audio_file, mime_type = BytesIO(to_pcm16_wav(f.read())), "audio/wav"
+                    except ValueError as e:
+                        raise ValueError(f"Slide {page_index+1}: OGG 음성을 PPTX용 WAV로 변환하지 못했습니다 ({e}) "
+                                         f"→ MP3 또는 LINEAR16으로 음성을 다시 생성하세요.")
             try:
                 slide.shapes.add_movie(
-                audio_path,
+                audio_file,
                 left=Inches(9), top=Inches(6.5),  
                 width=Inches(1), height=Inches(1),
-                mime_type='audio/wav'
+                mime_type=mime_type
             )
                 print(f"✅ Slide {page_index+1}: 오디오 삽입 완료")
             except Exception as e:
                 print(f"⚠️ Slide {page_index+1}: 오디오 삽입 실패 → {e}")
         else:
-            print(f"⚠️ Slide {page_index+1}: WAV 파일 없음 → {audio_path}")
+            print(f"⚠️ Slide {page_index+1}: 음성 파일 없음 → {wav_dir}/page_{page_index}.*")
 
     # 💾 결과 임시 파일로 저장 후 byte 반환
     with tempfile.NamedTemporaryFile(delete=False, suffix=".pptx") as tmp:
@@ -144,15 +357,16 @@ def export_pdf_with_audio_to_pptx(pdf_bytes: bytes, wav_dir: str) -> bytes:
         return tmp.read()
     
 def export_pptx_with_wavs_as_zip(pptx_bytes: bytes, wav_dir: str) -> bytes:
-    """PPTX 파일과 WAV 파일들을 하나의 ZIP으로 묶어 반환"""
+    """PPTX 파일과 페이지 음성 파일들(WAV/MP3/OGG)을 하나의 ZIP으로 묶어 반환"""
     with tempfile.NamedTemporaryFile(delete=False, suffix=".zip") as tmp_zip:
         with zipfile.ZipFile(tmp_zip.name, 'w') as zipf:
             # PPTX 파일 추가
             zipf.writestr("presentation.pptx", pptx_bytes)
             
-            # WAV 파일들 추가
+            # 음성 파일들 추가 (WAV PCM도 압축 효과가 거의 없으므로 모두 압축 없이 저장)
             for filename in os.listdir(wav_dir):
-                if filename.endswith(".wav"):
+                extension = filename.rsplit(".", 1)[-1]
+                if extension in AUDIO_MIME_TYPES:
                     filepath = os.path.join(wav_dir, filename)
                     zipf.write(filepath, arcname=os.path.join("audio", filename))
 
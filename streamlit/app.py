@@ -3,14 +3,35 @@ import requests
 import fitz
 from PIL import Image
 import base64
+import json
 from matplotlib import font_manager as fm
 import os
 
 API_URL = "http://localhost:8000"
+# 브라우저에서 접근 가능한 API 주소 (설정하면 브라우저가 /audio/{key}를 직접 Range 요청으로 재생, 없으면 Streamlit 서버가 받아서 전달)
+AUDIO_PUBLIC_URL = os.getenv("AUDIO_PUBLIC_URL", "").rstrip("/")
+AUDIO_CACHE_ENTRIES = 4   # 클라이언트 메모리에 보관할 슬라이드 음성 수
 
 VOICE_OPTIONS = {
     "♀️ 여성 모델": "WOMAN",
     "♂️ 남성 모델": "MAN",
+    "🖥️ 자체 호스팅 모델 (Zonos)": "ZONOS",
+}
+
+AUDIO_ENCODING_OPTIONS = {
+    "🎧 MP3 (용량 작음, PowerPoint 호환)": "MP3",
+    "🎧 OGG Opus (용량 가장 작음)": "OGG_OPUS",
+    "🎧 WAV (무압축 원본)": "LINEAR16",
+}
+
+GENERATION_MODE_OPTIONS = {
+    "📖 순차 생성 (앞 슬라이드 요약 반영)": "sequential",
+    "⚡ 개요 기반 병렬 생성 (긴 발표자료용)": "outline",
+}
+
+OUTLINE_SOURCE_OPTIONS = {
+    "🤖 LLM 요약 개요 (더 자연스러움)": "llm",
+    "📝 슬라이드 첫 문장 개요 (더 빠름)": "local",
 }
 
 def get_korean_font():
@@ -29,6 +50,63 @@ def convert_pdf_page_to_image(pdf_bytes, page_num):
     img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
     return img
 
+def stream_scripts(pdf_bytes, full_document, total_pages, mode="sequential", outline_source="llm"):
+    """/generate-script/stream 응답을 읽으며 st.session_state.scripts를 페이지 단위로 채움"""
+    files = {"file": ("document.pdf", pdf_bytes, "application/pdf")}
+    data = {"full_document": full_document, "mode": mode, "outline_source": outline_source}
+    progress = st.progress(0.0, text="스크립트 생성 준비 중...")
+    st.session_state.scripts = []
+
+    with requests.post(f"{API_URL}/generate-script/stream", files=files, data=data, stream=True) as response:
+        if response.status_code != 200:
+            raise RuntimeError(f"API 오류: {response.text}")
+
+        for line in response.iter_lines(decode_unicode=True):
+            if not line:
+                continue
+            message = json.loads(line)
+            if message["event"] == "page":
+                st.session_state.scripts.append(message["data"])
+                done = len(st.session_state.scripts)
+                progress.progress(min(done / max(total_pages, 1), 1.0), text=f"스크립트 생성 중... ({done}/{total_pages})")
+            elif message["event"] == "summary":
+                progress.progress(1.0, text=f"스크립트 생성 완료 ({message['data']['elapsed']}초)")
+            elif message["event"] == "error":
+                st.session_state.scripts = []  # 일부만 생성된 대본은 버리고 다음 실행에서 다시 생성
+                raise RuntimeError(f"API 오류: {message['data']['detail']}")
+
+    return st.session_state.scripts
+
+@st.cache_data(max_entries=AUDIO_CACHE_ENTRIES, show_spinner=False)
+def fetch_audio(url):
+    """오디오 URL은 내용 해시 기반이라 URL이 같으면 내용도 같음 → 최근 몇 장만 메모리에 보관"""
+    res = requests.get(f"{API_URL}{url}")
+    res.raise_for_status()
+    return res.content
+
+def get_page_audio(page_num):
+    """슬라이드를 볼 때 해당 페이지 음성만 가져옴 → (bytes 또는 브라우저용 URL, MIME 타입)"""
+    handle = st.session_state.tts_audios.get(str(page_num)) if isinstance(st.session_state.tts_audios, dict) else None
+    if not handle:
+        return None
+    mime_type = handle.get("mime_type", "audio/wav")
+    if AUDIO_PUBLIC_URL:
+        return f"{AUDIO_PUBLIC_URL}{handle['url']}", mime_type
+    try:
+        return fetch_audio(handle["url"]), mime_type
+    except Exception as e:
+        st.warning(f"음성 파일을 불러오지 못했습니다: {e}")
+        return None
+
+def store_tts_result(result):
+    """/generate-audio 응답 저장 ({"audios": {page: 핸들}, "failed": {...}}), 실패한 페이지는 경고로 표시"""
+    st.session_state.tts_audios = result.get("audios", {})
+    failed = result.get("failed", {})
+    if failed:
+        pages = ", ".join(str(int(page) + 1) for page in failed)
+        st.warning(f"⚠️ 일부 슬라이드의 음성 생성에 실패했습니다: {pages}")
+    return failed
+
 def initialize_session_state():
     defaults = {
         "app_page": "home",
@@ -45,6 +123,9 @@ def initialize_session_state():
         "keywords": [],
         "chat_history": [],
         "selected_voice": "ko-KR-Wavenet-E",
+        "generation_mode": "sequential",
+        "outline_source": "llm",
+        "audio_encoding": "MP3",
     }
     for key, value in defaults.items():
         if key not in st.session_state:
@@ -105,6 +186,64 @@ def set_background(image_path):
     """
     st.markdown(background_style, unsafe_allow_html=True)
 
+def user_bubble_html(text):
+    """사용자 메시지 (오른쪽 정렬)"""
+    return f"""
+    <div style="text-align: right; margin: 10px 0;">
+        <div style="
+            display: inline-block;
+            background-color: #d1e7dd;
+            color: black;
+            padding: 10px 15px;
+            border-radius: 15px;
+            border-bottom-right-radius: 0;
+            max-width: 70%;
+            font-size: 0.95rem;
+        ">
+            {text}
+        </div>
+    </div>
+    """
+
+def bot_bubble_html(text):
+    """챗봇 메시지 (왼쪽 정렬, '챗봇' 라벨 포함)"""
+    return f"""
+    <div style="text-align: left; margin: 10px 0;">
+        <div style="font-size: 0.90rem; color: #000000; margin-left: 5px; margin-bottom: 3px;">AI 오인용</div>
+        <div style="
+            display: inline-block;
+            background-color: #ffffff;
+            color: black;
+            padding: 10px 15px;
+            border-radius: 15px;
+            border-bottom-left-radius: 0;
+            max-width: 70%;
+            font-size: 0.95rem;
+        ">
+            {text}
+        </div>
+    </div>
+    """
+
+def stream_chat_answer(question, session_id):
+    """/chat/stream의 NDJSON 이벤트를 읽어 답변 토큰을 도착하는 대로 yield"""
+    with requests.post(
+        f"{API_URL}/chat/stream",
+        json={"question": question, "session_id": session_id},
+        stream=True
+    ) as response:
+        if response.status_code != 200:
+            raise RuntimeError(f"API 오류: {response.text}")
+
+        for line in response.iter_lines(decode_unicode=True):
+            if not line:
+                continue
+            message = json.loads(line)
+            if message["event"] == "token":
+                yield message["data"]["text"]
+            elif message["event"] == "error":
+                raise RuntimeError(message["data"]["detail"])
+
 def show_chat_interface():
     if st.session_state.app_page == "presentation" and st.session_state.current_page != 1:
         with st.sidebar:
@@ -123,61 +262,29 @@ def show_chat_interface():
 
             # 이전 질문-답변 출력
             for chat in st.session_state.chat_history:
-                # 사용자 메시지 (오른쪽 정렬)
-                st.markdown(f"""
-                <div style="text-align: right; margin: 10px 0;">
-                    <div style="
-                        display: inline-block;
-                        background-color: #d1e7dd;
-                        color: black;
-                        padding: 10px 15px;
-                        border-radius: 15px;
-                        border-bottom-right-radius: 0;
-                        max-width: 70%;
-                        font-size: 0.95rem;
-                    ">
-                        {chat['question']}
-                    </div>
-                </div>
-                """, unsafe_allow_html=True)
-
-                # 챗봇 메시지 (왼쪽 정렬, '챗봇' 라벨 포함)
-                st.markdown(f"""
-                <div style="text-align: left; margin: 10px 0;">
-                    <div style="font-size: 0.90rem; color: #000000; margin-left: 5px; margin-bottom: 3px;">AI 오인용</div>
-                    <div style="
-                        display: inline-block;
-                        background-color: #ffffff;
-                        color: black;
-                        padding: 10px 15px;
-                        border-radius: 15px;
-                        border-bottom-left-radius: 0;
-                        max-width: 70%;
-                        font-size: 0.95rem;
-                    ">
-                        {chat['answer']}
-                    </div>
-                </div>
-                """, unsafe_allow_html=True)
+                st.markdown(user_bubble_html(chat['question']), unsafe_allow_html=True)
+                st.markdown(bot_bubble_html(chat['answer']), unsafe_allow_html=True)
 
             # 질문 입력
             user_question = st.chat_input("질문을 입력하세요")
             if user_question:
+                st.markdown(user_bubble_html(user_question), unsafe_allow_html=True)
+                answer_placeholder = st.empty()
+                answer_placeholder.markdown(bot_bubble_html("생각 중입니다..."), unsafe_allow_html=True)
                 try:
-                    with st.spinner("생각 중입니다..."):
-                        response = requests.post(
-                            f"{API_URL}/chat",
-                            json={"question": user_question, "session_id": "streamlit_session"}
-                        )
-                    if response.status_code == 200:
-                        st.session_state.chat_history.append({
-                            "question": user_question,
-                            "answer": response.json()["answer"]
-                        })
-                        st.rerun()
-                    else:
-                        st.error("답변 생성 중 오류가 발생했습니다.")
+                    # 토큰이 도착할 때마다 같은 자리(placeholder)에 지금까지의 답변을 다시 그림
+                    answer = ""
+                    for token in stream_chat_answer(user_question, "streamlit_session"):
+                        answer += token
+                        answer_placeholder.markdown(bot_bubble_html(answer + "▌"), unsafe_allow_html=True)
+                    answer_placeholder.markdown(bot_bubble_html(answer), unsafe_allow_html=True)
+                    st.session_state.chat_history.append({
+                        "question": user_question,
+                        "answer": answer
+                    })
+                    st.rerun()
                 except Exception as e:
+                    answer_placeholder.empty()
                     st.error(f"오류 발생: {str(e)}")
 
 def render_home_page():
@@ -289,6 +396,20 @@ def render_presentation_workflow():
             st.markdown("<div style='margin-bottom: 10px; font-size: 1.2rem; font-weight: bold;'>🎙️ TTS 목소리 선택</div>", unsafe_allow_html=True)
             st.session_state.selected_voice = st.selectbox("", options=list(VOICE_OPTIONS.values()),
                                                            format_func=lambda x: [k for k, v in VOICE_OPTIONS.items() if v == x][0])
+            # Zonos는 WAV(LINEAR16) 출력만 지원
+            encoding_options = ["LINEAR16"] if st.session_state.selected_voice == "ZONOS" else list(AUDIO_ENCODING_OPTIONS.values())
+            st.session_state.audio_encoding = st.selectbox("", options=encoding_options,
+                                                           format_func=lambda x: [k for k, v in AUDIO_ENCODING_OPTIONS.items() if v == x][0])
+            st.markdown("</div>", unsafe_allow_html=True)
+
+            # 🧭 대본 생성 방식
+            st.markdown("<div class='container-box'>", unsafe_allow_html=True)
+            st.markdown("<div style='margin-bottom: 10px; font-size: 1.2rem; font-weight: bold;'>🧭 대본 생성 방식</div>", unsafe_allow_html=True)
+            st.session_state.generation_mode = st.selectbox("", options=list(GENERATION_MODE_OPTIONS.values()),
+                                                            format_func=lambda x: [k for k, v in GENERATION_MODE_OPTIONS.items() if v == x][0])
+            if st.session_state.generation_mode == "outline":
+                st.session_state.outline_source = st.selectbox("개요 생성 방식", options=list(OUTLINE_SOURCE_OPTIONS.values()),
+                                                               format_func=lambda x: [k for k, v in OUTLINE_SOURCE_OPTIONS.items() if v == x][0])
             st.markdown("</div>", unsafe_allow_html=True)
 
             # ✔️ 키워드
@@ -348,14 +469,18 @@ def render_presentation_workflow():
         if not st.session_state.scripts:
             with st.spinner("스크립트와 음성 생성 중..."):
                 try:
-                    files = {"file": ("document.pdf", st.session_state.pdf_bytes, "application/pdf")}
-                    data = {"full_document": st.session_state.full_document}
-                    response = requests.post(f"{API_URL}/generate-script", files=files, data=data)
-                    if response.status_code == 200:
-                        st.session_state.scripts = response.json() 
-                        
+                    scripts = stream_scripts(
+                        st.session_state.pdf_bytes,
+                        st.session_state.full_document,
+                        st.session_state.total_pages,
+                        mode=st.session_state.generation_mode,
+                        outline_source=st.session_state.outline_source
+                    )
+                    if scripts:
                         # 🎯 Q&A 활성화 요청
-                        script_data = [{"page": i, "script": s if isinstance(s, str) else s.get("script", "")}
+                        script_data = [{"page": i,
+                                        "script": s if isinstance(s, str) else s.get("script", ""),
+                                        "text": None if isinstance(s, str) else s.get("text")}
                                     for i, s in enumerate(st.session_state.scripts)]
                         enable_res = requests.post(f"{API_URL}/qa/enable", json={
                             "full_document": st.session_state.full_document,
@@ -367,10 +492,11 @@ def render_presentation_workflow():
                         audio_res = requests.post(f"{API_URL}/generate-audio", json={
                             "scripts": {str(i): s if isinstance(s, str) else s.get("script", "") for i, s in enumerate(st.session_state.scripts)},
                             "keywords": st.session_state.keywords,
-                            "gender": gender  # 명시적으로 전달
+                            "gender": gender,  # 명시적으로 전달
+                            "audio_encoding": st.session_state.audio_encoding
                         })
                         if audio_res.status_code == 200:
-                            st.session_state.tts_audios = audio_res.json()
+                            store_tts_result(audio_res.json())
                             st.markdown("""
                             <style>
                             .success-highlight {
@@ -389,7 +515,7 @@ def render_presentation_workflow():
                         else:
                             st.error(f"TTS 생성 오류: {audio_res.text}")
                     else:
-                        st.error(f"API 오류: {response.text}")
+                        st.error("API 오류: 생성된 스크립트가 없습니다.")
                 except Exception as e:
                     st.error(f"스크립트 생성 실패: {str(e)}")
 
@@ -409,9 +535,9 @@ def render_presentation_workflow():
                 st.session_state.scripts[page_num] = edited_script
                 st.success("❗스크립트가 수정되었습니다!")
 
-            audio_b64 = st.session_state.tts_audios.get(str(page_num)) if isinstance(st.session_state.tts_audios, dict) else None
-            if audio_b64:
-                st.audio(base64.b64decode(audio_b64), format="audio/wav")
+            page_audio = get_page_audio(page_num)
+            if page_audio:
+                st.audio(page_audio[0], format=page_audio[1])
 
             col1, col2, col3 = st.columns([2.5, 4.5, 2.5])
             with col1:
@@ -439,12 +565,13 @@ def render_presentation_workflow():
                                         for i, s in enumerate(st.session_state.scripts)
                                     },
                                     "keywords": st.session_state.keywords,
-                                    "gender": st.session_state.selected_voice
+                                    "gender": st.session_state.selected_voice,
+                                    "audio_encoding": st.session_state.audio_encoding
                                 })
                                 if response.status_code == 200:
-                                    st.session_state.tts_audios = response.json()
-                                    st.success("수정된 음성이 생성되었습니다.")
-                                    st.rerun()
+                                    if not store_tts_result(response.json()):
+                                        st.success("수정된 음성이 생성되었습니다.")
+                                        st.rerun()
                         except Exception as e:
                             st.error(f"오류 발생: {str(e)}")
 
@@ -541,9 +668,9 @@ def render_presentation_mode():
 
     st.image(convert_pdf_page_to_image(st.session_state.pdf_bytes, page_num), use_container_width=True)
 
-    audio_b64 = st.session_state.tts_audios.get(str(page_num)) if isinstance(st.session_state.tts_audios, dict) else None
-    if audio_b64:
-        st.audio(base64.b64decode(audio_b64), format="audio/wav")
+    page_audio = get_page_audio(page_num)
+    if page_audio:
+        st.audio(page_audio[0], format=page_audio[1])
 
     # 버튼 영역 (div 감싸지 않음)
     col1, spacer, col2 = st.columns([1.5, 4, 1.5])